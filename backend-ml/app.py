@@ -1,29 +1,60 @@
+import io
 import os
+import json
+import time
 import uuid
 import bcrypt
+import contextlib
 import google.generativeai as genai
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Request, Response, request, jsonify, send_from_directory, g
 from flask_cors import CORS
 from flask_jwt_extended import (
     JWTManager, create_access_token, create_refresh_token,
     jwt_required, get_jwt_identity, get_jwt
 )
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 from flask import jsonify
 
 # Import modules
-from src.inference import predict_skin_disease, get_model_info
+from src.inference import (
+    predict_skin_disease, predict_skin_disease_batch, get_model_info,
+    start_model_loading, is_model_ready, get_model_status, count_forwarded_images
+)
 from src.utils import allowed_file
+from src.image_io import decode_image_bytes, InvalidImageError, create_persister
+from src.jobs import JobManager, JobQueueFull
+from src.write_behind import WriteBehindFull
+from src.metrics import (
+    stage_timer, register_gauge, render_metrics,
+    start_request_timing, finish_request_timing, server_timing_header,
+    STAGE_DECODE, STAGE_UPLOAD_SAVE, STAGE_SAVE_DIAGNOSIS
+)
+from src.profiling import RequestProfiler
+from src.json_provider import OrjsonProvider, orjson_available
+from src.history_export import EXPORT_FORMATS, encode_export
+from src.admission import (
+    AdmissionController, AdmissionRejected, socket_disconnect_probe,
+    LANE_AUTHENTICATED, LANE_ANONYMOUS, REJECT_DEADLINE, REJECT_DISCONNECTED
+)
 from src.config import (
     UPLOAD_FOLDER, CONFIDENCE_THRESHOLD, 
-    DISEASE_INFO, DEFAULT_DISEASE_INFO, CLASS_NAMES
+    DISEASE_INFO, DEFAULT_DISEASE_INFO, CLASS_NAMES,
+    BATCH_PREDICT_MAX_FILES, BATCH_PREDICT_MAX_CONTENT_LENGTH,
+    MODEL_LOAD_IN_BACKGROUND, PERSIST_UPLOADS, PERSIST_UPLOADS_ASYNC,
+    JOBS_WORKERS, JOBS_MAX_QUEUE, JOBS_TTL_SECONDS, JOBS_MAX_STORED, JOBS_SSE_HEARTBEAT_SECONDS,
+    ADMISSION_ENABLED, ADMISSION_CAPACITY, ADMISSION_BUDGET_MS, ADMISSION_ANONYMOUS_BUDGET_MS,
+    ADMISSION_QUEUE_TIMEOUT_MS, SERVER_TIMING_ENABLED, PROFILE_ADMIN_TOKEN, PROFILE_SAMPLE_RATE,
+    PROFILE_DIR, PROFILE_MAX_PROFILES, PROFILE_TORCH_TRACE, JSON_ORJSON_ENABLED
 )
 from src.database import (
     create_user, get_user_by_email, get_user_by_id,
-    save_diagnosis, get_user_history, get_diagnosis_by_id,
-    delete_diagnosis, delete_all_user_history, get_user_statistics
+    save_diagnosis, save_diagnoses_bulk, get_user_history, get_diagnosis_by_id,
+    delete_diagnosis, delete_all_user_history, get_user_statistics, get_pool_stats,
+    diagnosis_writer, queue_diagnosis, get_write_behind_stats, iter_user_history,
+    get_diagnosis_by_write_id, is_diagnosis_pending
 )
 
 # Load environment variables
@@ -60,9 +91,20 @@ else:
 # FLASK APP INITIALIZATION
 # =============================================================================
 
+class InMemoryRequest(Request):
+    """Request yang menyimpan file upload di memori (bukan SpooledTemporaryFile di disk)"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Ukuran sudah dibatasi MAX_CONTENT_LENGTH
+        return io.BytesIO()
+
+
 app = Flask(__name__)
+app.request_class = InMemoryRequest
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Max 16MB
+if JSON_ORJSON_ENABLED and orjson_available():
+    app.json = OrjsonProvider(app)
 
 # JWT Configuration
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'skincheck-secret-key-change-in-production')
@@ -71,6 +113,45 @@ app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
 
 jwt = JWTManager(app)
 
+# Penyimpanan file upload asli (asinkron, di luar jalur request)
+upload_persister = create_persister(UPLOAD_FOLDER, enabled=PERSIST_UPLOADS, asynchronous=PERSIST_UPLOADS_ASYNC)
+
+# Job prediksi asinkron (POST /predict/jobs)
+prediction_jobs = JobManager(
+    workers=JOBS_WORKERS,
+    max_queue=JOBS_MAX_QUEUE,
+    ttl_seconds=JOBS_TTL_SECONDS,
+    max_jobs=JOBS_MAX_STORED
+)
+
+# Admission control di depan inferensi (None jika ADMISSION_ENABLED=false)
+admission = AdmissionController(
+    capacity=ADMISSION_CAPACITY,
+    budgets_ms={LANE_AUTHENTICATED: ADMISSION_BUDGET_MS, LANE_ANONYMOUS: ADMISSION_ANONYMOUS_BUDGET_MS}
+) if ADMISSION_ENABLED else None
+
+# Profiling per request (opt-in lewat header admin / sampling)
+request_profiler = RequestProfiler(
+    PROFILE_DIR,
+    max_profiles=PROFILE_MAX_PROFILES,
+    sample_rate=PROFILE_SAMPLE_RATE,
+    admin_token=PROFILE_ADMIN_TOKEN,
+    torch_trace=PROFILE_TORCH_TRACE
+)
+
+# Gauge /metrics untuk antrian di level aplikasi
+register_gauge("skincheck_jobs_queue_depth", "Job prediksi asinkron yang menunggu worker",
+               lambda: prediction_jobs.stats()["queue_depth"])
+if admission is not None:
+    register_gauge("skincheck_admission_in_flight", "Gambar yang sedang diproses (admission control)",
+                   lambda: admission.stats()["in_flight"])
+    register_gauge("skincheck_admission_queued", "Gambar yang menunggu slot admission per lane",
+                   lambda: {(lane,): count for lane, count in admission.stats()["queued"].items()},
+                   labels=("lane",))
+
+# Muat model AI (default di background; /health langsung aktif, /ready setelah warm-up)
+start_model_loading(background=MODEL_LOAD_IN_BACKGROUND)
+
 # Configure CORS
 CORS(app, resources={
     r"/api/*": {
@@ -87,6 +168,51 @@ CORS(app, resources={
     }
 })
 
+# =============================================================================
+# REQUEST TIMING / PROFILING
+# =============================================================================
+
+# Endpoint yang mendapat header Server-Timing dan boleh diprofile
+TIMED_PATH_PREFIXES = ('/predict', '/history')
+
+
+@app.before_request
+def start_request_observability():
+    """Mulai kumpulkan durasi tahap (Server-Timing) dan profiling opsional"""
+    if not request.path.startswith(TIMED_PATH_PREFIXES):
+        return
+    g.request_started = time.perf_counter()
+    if SERVER_TIMING_ENABLED:
+        g.timing_token = start_request_timing()
+    if request_profiler.enabled and request_profiler.should_profile(request.headers):
+        g.profile_session = request_profiler.start(request.endpoint)
+
+
+@app.after_request
+def finish_request_observability(response):
+    """Tambahkan header Server-Timing; tulis profil (id di header X-Profile-Id)"""
+    token = g.pop('timing_token', None)
+    if token is not None:
+        timings = finish_request_timing(token)
+        response.headers['Server-Timing'] = server_timing_header(
+            timings, time.perf_counter() - g.request_started
+        )
+    session = g.pop('profile_session', None)
+    if session is not None:
+        response.headers['X-Profile-Id'] = session.stop()
+    return response
+
+
+@app.teardown_request
+def cleanup_request_observability(error=None):
+    """Pastikan profiler & pengumpul timing berhenti walau after_request tidak jalan"""
+    token = g.pop('timing_token', None)
+    if token is not None:
+        finish_request_timing(token)
+    session = g.pop('profile_session', None)
+    if session is not None:
+        session.stop()
+
 # =============================================================================
 # AUTH ENDPOINTS
 # =============================================================================
@@ -269,15 +395,40 @@ def health_check():
 @app.route('/model-info', methods=['GET'])
 def model_info():
     """Get model information"""
+    pool_stats = get_pool_stats()
+    write_behind_stats = get_write_behind_stats()
     return jsonify({
         "status": "success",
-        "data": get_model_info()
+        "data": {
+            **get_model_info(),
+            "jobs": prediction_jobs.stats(),
+            "admission": {"enabled": True, **admission.stats()} if admission else {"enabled": False},
+            "db_pool": {"enabled": True, **pool_stats} if pool_stats else {"enabled": False},
+            "write_behind": {"enabled": True, **write_behind_stats} if write_behind_stats else {"enabled": False}
+        }
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Metrik format teks Prometheus (latency per tahap, DB, outcome prediksi, antrian)"""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
 @app.route("/health", methods=["GET"])
 def health():
+    """Liveness: proses hidup dan bisa menjawab request"""
     return jsonify({"status":"healthy"}), 200
 
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness: model sudah dimuat dan warm-up selesai"""
+    status = get_model_status()
+    if not status["ready"]:
+        return jsonify({"status": "not_ready", "model": status}), 503
+    return jsonify({"status": "ready", "model": status}), 200
+
 @app.route('/classes', methods=['GET'])
 def get_classes():
     """Get list of all disease classes"""
@@ -289,10 +440,216 @@ def get_classes():
 
 #endpoint prediksi penyakit kulit
 
+def _invalid_image_message(error):
+    """Pesan error untuk upload yang bukan JPEG/PNG valid"""
+    if error.unsupported_format:
+        return "Format file tidak didukung. Silakan unggah JPEG/PNG. Aplikasi klien akan mencoba mengonversi otomatis jika perlu."
+    return "File bukan gambar yang valid atau rusak"
+
+
+def _persist_upload(original_filename, data):
+    """Jadwalkan penyimpanan file asli; None jika PERSIST_UPLOADS dimatikan"""
+    if upload_persister is None:
+        return None
+    filename = f"{uuid.uuid4()}_{secure_filename(original_filename)}"
+    with stage_timer(STAGE_UPLOAD_SAVE):
+        upload_persister.save(filename, data)
+    return filename
+
+
+def _decode_upload(data):
+    """decode_image_bytes + metrik tahap decode (melempar InvalidImageError)"""
+    with stage_timer(STAGE_DECODE):
+        return decode_image_bytes(data)
+
+
+def _model_not_ready_response():
+    """503 + Retry-After selama model masih dimuat / warm-up"""
+    response = jsonify({
+        "status": "error",
+        "message": "Model AI sedang dimuat, silakan coba lagi sebentar lagi",
+        "model_state": get_model_status()["state"]
+    })
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
+
+def _request_lane(user_id):
+    """Lane admission: user login diprioritaskan di atas pemanggil anonim"""
+    return LANE_AUTHENTICATED if user_id else LANE_ANONYMOUS
+
+
+@contextlib.contextmanager
+def _metered(admitted):
+    """
+    Blok inferensi di slot admission `admitted`; waktu layanan dicatat per gambar yang
+    benar-benar di-forward (cache hit dan input yang ditolak tidak dihitung)
+    """
+    with admitted as slot, count_forwarded_images() as forwarded:
+        try:
+            yield slot
+        finally:
+            slot.set_work(forwarded.images)
+
+
+def _admit_inference(cost=1):
+    """
+    Slot admission untuk request ini (context manager). Melempar AdmissionRejected
+    jika server terlalu sibuk, deadline lewat, atau klien sudah memutus koneksi.
+    """
+    if admission is None:
+        return contextlib.nullcontext()
+    timeout_ms = ADMISSION_QUEUE_TIMEOUT_MS
+    try:
+        timeout_ms = min(timeout_ms, float(request.headers.get('X-Request-Deadline-Ms', timeout_ms)))
+    except ValueError:
+        pass
+    return _metered(admission.admit(
+        _request_lane(get_jwt_identity()),
+        cost=cost,
+        deadline=time.monotonic() + timeout_ms / 1000.0,
+        is_disconnected=socket_disconnect_probe(request.environ)
+    ))
+
+
+def _admission_rejected_response(error):
+    """503 + Retry-After untuk request yang ditolak / dibuang admission control"""
+    if error.reason == REJECT_DISCONNECTED:
+        print("Request dibuang dari antrian: klien sudah memutus koneksi")
+    messages = {
+        REJECT_DEADLINE: "Waktu tunggu antrian AI habis, silakan coba lagi",
+        REJECT_DISCONNECTED: "Koneksi klien terputus",
+    }
+    response = jsonify({
+        "status": "error",
+        "message": messages.get(error.reason, "Server AI sedang sibuk, silakan coba lagi sebentar lagi"),
+        "reason": error.reason
+    })
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+
+def _prediction_error_payload(result):
+    """Payload error untuk hasil not_skin / low_confidence (None jika bukan error validasi)"""
+    error_type = result.get('error')
+    if error_type == 'not_skin':
+        return {
+            "status": "error",
+            "error_type": error_type,
+            "message": result.get('message', 'Gambar bukan foto kulit'),
+            "reason": result.get('reason', ''),
+            "suggestion": result.get('suggestion', 'Upload foto kulit yang jelas')
+        }
+    elif error_type == 'low_confidence':
+        return {
+            "status": "error",
+            "error_type": error_type,
+            "message": result.get('message', 'Hasil tidak dapat dipercaya'),
+            "reason": result.get('reason', ''),
+            "suggestion": result.get('suggestion', 'Upload foto dengan kualitas lebih baik'),
+            "top_3": result.get('top_3', [])
+        }
+    return None
+
+
+def _prediction_payload(result, filename):
+    """Payload hasil prediksi sukses (format compatible dengan frontend)"""
+    condition = result['prediction']
+    confidence = result['confidence']
+    disease_data = DISEASE_INFO.get(condition, DEFAULT_DISEASE_INFO)
+    
+    prediction_data = {
+        "label": condition,
+        "confidence": confidence,
+        "confidence_percent": round(confidence * 100, 1),
+        "severity": disease_data.get('severity', 'unknown'),
+        "description": disease_data.get('description', '')
+    }
+    
+    return {
+        "prediction": prediction_data,
+        "top_3_predictions": result.get('top_3', []),
+        "image_filename": filename
+    }
+
+
+def _run_prediction(image, filename, user_id, on_stage=None):
+    """
+    Prediksi satu gambar yang sudah didecode + simpan riwayat jika user login.
+    Mengembalikan (payload JSON, status HTTP); dipakai /predict dan job asinkron.
+    """
+    result = predict_skin_disease(image, on_stage=on_stage)
+    
+    if result is None:
+        return {
+            "status": "error",
+            "message": "Gagal memproses gambar"
+        }, 500
+    
+    if result.get('error') == 'server_busy':
+        return {
+            "status": "error",
+            "message": result.get('message', 'Server AI sedang sibuk, silakan coba lagi sebentar lagi')
+        }, 503
+    
+    if on_stage is not None and result.get('error') != 'not_skin':
+        on_stage("inferred")
+    
+    # Check for validation errors (not skin / low confidence)
+    error_payload = _prediction_error_payload(result)
+    if error_payload:
+        return error_payload, 400
+    
+    condition = result['prediction']
+    confidence = result['confidence']
+    disease_data = DISEASE_INFO.get(condition, DEFAULT_DISEASE_INFO)
+    response_data = _prediction_payload(result, filename)
+    
+    # Save to database if user is logged in
+    if user_id:
+        diagnosis = dict(
+            user_id=int(user_id),
+            condition=condition,
+            confidence=confidence,
+            severity=disease_data.get('severity'),
+            image_filename=filename,
+            top_3_predictions=result.get('top_3', []),
+            class_index=result.get('class_index')
+        )
+        with stage_timer(STAGE_SAVE_DIAGNOSIS):
+            pending_id = None
+            if diagnosis_writer is not None:
+                try:
+                    # Write-behind: ID database belum ada, riwayat muncul setelah flush
+                    pending_id = queue_diagnosis(**diagnosis)
+                except WriteBehindFull as e:
+                    print(f"⚠️ Write-behind penuh ({e}); simpan sinkron")
+            diagnosis_id = save_diagnosis(**diagnosis) if pending_id is None else None
+        response_data['diagnosis_id'] = diagnosis_id
+        if pending_id is not None:
+            response_data['pending_id'] = pending_id
+        response_data['saved'] = True
+        if on_stage is not None:
+            on_stage("saved")
+    else:
+        response_data['saved'] = False
+    
+    # Add warning if confidence is low
+    if confidence < CONFIDENCE_THRESHOLD:
+        response_data['warning'] = f"Tingkat kepercayaan AI rendah ({confidence*100:.1f}%). Hasil mungkin kurang akurat."
+    
+    return {
+        "status": "success",
+        **response_data
+    }, 200
+
+
 @app.route('/predict', methods=['POST'])
 @jwt_required(optional=True)  # Optional: bisa dengan atau tanpa login
 def predict():
     """Prediksi penyakit kulit dari gambar"""
+    if not is_model_ready():
+        return _model_not_ready_response()
     try:
         # Check file
         if 'file' not in request.files:
@@ -309,136 +666,336 @@ def predict():
                 "message": "Tidak ada file yang dipilih"
             }), 400
         
-        # Save file
-        filename = f"{uuid.uuid4()}_{secure_filename(file.filename)}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-        file.save(filepath)
-
-        # Validate actual image content with Pillow (do not rely only on extension/mime)
-        from PIL import Image
+        # Decode langsung dari memori; format divalidasi dari header byte
+        # (do not rely only on extension/mime)
+        data = file.read()
         try:
-            with Image.open(filepath) as img:
-                img_format = (img.format or '').lower()
-        except Exception as e:
-            try:
-                os.remove(filepath)
-            except Exception:
-                pass
-            return jsonify({
-                "status": "error",
-                "message": "File bukan gambar yang valid atau rusak"
-            }), 400
+            # Decode + inferensi hanya berjalan setelah lolos admission control
+            with _admit_inference():
+                try:
+                    image = _decode_upload(data)
+                except InvalidImageError as e:
+                    return jsonify({
+                        "status": "error",
+                        "message": _invalid_image_message(e)
+                    }), 400
+                
+                # Simpan file asli (opsional, asinkron di luar jalur request)
+                filename = _persist_upload(file.filename, data)
+                
+                # Predict (gambar yang sama dipakai untuk validasi kulit & pra-pemrosesan)
+                payload, status_code = _run_prediction(image, filename, get_jwt_identity())
+        except AdmissionRejected as e:
+            return _admission_rejected_response(e)
+        response = jsonify(payload)
+        if status_code == 503:
+            response.headers['Retry-After'] = '2'
+        return response, status_code
+        
+    except RequestEntityTooLarge:
+        raise  # Dijawab handler 413 dengan batas request ini
+    except Exception as e:
+        print(f"Prediction error: {e}")
+        return jsonify({
+            "status": "error",
+            "message": f"Terjadi kesalahan: {str(e)}"
+        }), 500
 
-        if img_format not in ('jpeg', 'jpg', 'png'):
-            try:
-                os.remove(filepath)
-            except Exception:
-                pass
+@app.route('/predict/batch', methods=['POST'])
+@jwt_required(optional=True)
+def predict_batch():
+    """Prediksi banyak gambar sekaligus (satu request multipart, field 'files')"""
+    if not is_model_ready():
+        return _model_not_ready_response()
+    try:
+        # Batas ukuran request khusus endpoint batch (Flask >= 3.1)
+        request.max_content_length = BATCH_PREDICT_MAX_CONTENT_LENGTH
+        files = request.files.getlist('files') or request.files.getlist('file')
+        
+        if not files:
             return jsonify({
                 "status": "error",
-                "message": "Format file tidak didukung. Silakan unggah JPEG/PNG. Aplikasi klien akan mencoba mengonversi otomatis jika perlu."
+                "message": "Tidak ada file dalam request. Gunakan field 'files'."
             }), 400
         
-        # Predict
-        result = predict_skin_disease(filepath)
-        
-        if result is None:
+        if len(files) > BATCH_PREDICT_MAX_FILES:
             return jsonify({
                 "status": "error",
-                "message": "Gagal memproses gambar"
-            }), 500
-        
-        # Check for validation errors (not skin / low confidence)
-        if result.get('error'):
-            error_type = result.get('error')
-            if error_type == 'not_skin':
-                return jsonify({
-                    "status": "error",
-                    "message": result.get('message', 'Gambar bukan foto kulit'),
-                    "reason": result.get('reason', ''),
-                    "suggestion": result.get('suggestion', 'Upload foto kulit yang jelas')
-                }), 400
-            elif error_type == 'low_confidence':
-                return jsonify({
-                    "status": "error",
-                    "message": result.get('message', 'Hasil tidak dapat dipercaya'),
-                    "reason": result.get('reason', ''),
-                    "suggestion": result.get('suggestion', 'Upload foto dengan kualitas lebih baik'),
-                    "top_3": result.get('top_3', [])
-                }), 400
+                "message": f"Maksimal {BATCH_PREDICT_MAX_FILES} gambar per request"
+            }), 400
         
-        # Get disease info
-        condition = result['prediction']
-        confidence = result['confidence']
-        disease_data = DISEASE_INFO.get(condition, DEFAULT_DISEASE_INFO)
+        try:
+            # Decode + forward pass hanya berjalan setelah lolos admission control
+            # (biaya = jumlah gambar)
+            with _admit_inference(cost=len(files)):
+                # 1. Decode & validasi semua gambar langsung dari memori
+                items = []
+                for index, file in enumerate(files):
+                    item = {"index": index, "original_filename": file.filename}
+                    items.append(item)
+                    
+                    if file.filename == '':
+                        item['error'] = {"status": "error", "message": "Tidak ada file yang dipilih"}
+                        continue
+                    
+                    data = file.read()
+                    try:
+                        item['image'] = _decode_upload(data)
+                    except InvalidImageError as e:
+                        item['error'] = {"status": "error", "message": _invalid_image_message(e)}
+                        continue
+                    
+                    # Simpan file asli (opsional, asinkron)
+                    item['image_filename'] = _persist_upload(file.filename, data)
+                
+                valid_items = [item for item in items if 'image' in item]
+                
+                # 2. Satu forward pass untuk semua gambar valid
+                results = predict_skin_disease_batch([item['image'] for item in valid_items])
+        except AdmissionRejected as e:
+            return _admission_rejected_response(e)
         
-
-        # Prepare response (format compatible dengan frontend)
-        prediction_data = {
-            "label": condition,
-            "confidence": confidence,
-            "confidence_percent": round(confidence * 100, 1),
-            "severity": disease_data.get('severity', 'unknown'),
-            "description": disease_data.get('description', '')
-        }
+        # 3. Susun hasil per gambar
+        user_id = get_jwt_identity()
+        to_save = []
+        for item, result in zip(valid_items, results):
+            error_payload = _prediction_error_payload(result)
+            if error_payload:
+                item['error'] = error_payload
+            elif result.get('error') == 'server_busy':
+                item['error'] = {"status": "error", "message": result['message']}
+            elif result.get('error'):
+                item['error'] = {"status": "error", "message": "Gagal memproses gambar"}
+            else:
+                item['result'] = {"status": "success", **_prediction_payload(result, item['image_filename'])}
+                confidence = result['confidence']
+                if confidence < CONFIDENCE_THRESHOLD:
+                    item['result']['warning'] = f"Tingkat kepercayaan AI rendah ({confidence*100:.1f}%). Hasil mungkin kurang akurat."
+                if user_id:
+                    disease_data = DISEASE_INFO.get(result['prediction'], DEFAULT_DISEASE_INFO)
+                    to_save.append((item, {
+                        "user_id": int(user_id),
+                        "condition": result['prediction'],
+                        "confidence": confidence,
+                        "severity": disease_data.get('severity'),
+                        "image_filename": item['image_filename'],
+                        "top_3_predictions": result.get('top_3', []),
+                        "class_index": result.get('class_index')
+                    }))
         
-        response_data = {
-            "prediction": prediction_data,
-            "top_3_predictions": result.get('top_3', []),
-            "image_filename": filename
-        }
+        # 4. Simpan semua diagnosis dalam satu transaksi
+        if to_save:
+            with stage_timer(STAGE_SAVE_DIAGNOSIS):
+                diagnosis_ids = save_diagnoses_bulk([row for _, row in to_save])
+            for (item, _), diagnosis_id in zip(to_save, diagnosis_ids):
+                item['result']['diagnosis_id'] = diagnosis_id
         
-        # Save to database if user is logged in
-        user_id = get_jwt_identity()
-        if user_id:
-            diagnosis_id = save_diagnosis(
-                user_id=int(user_id),
-                condition=condition,
-                confidence=confidence,
-                severity=disease_data.get('severity'),
-                description=disease_data.get('description'),
-                image_filename=filename,
-                top_3_predictions=result.get('top_3', [])
-            )
-            response_data['diagnosis_id'] = diagnosis_id
-            response_data['saved'] = True
-        else:
-            response_data['saved'] = False
-        
-        # Add warning if confidence is low
-        if confidence < CONFIDENCE_THRESHOLD:
-            response_data['warning'] = f"Tingkat kepercayaan AI rendah ({confidence*100:.1f}%). Hasil mungkin kurang akurat."
+        response_items = []
+        for item in items:
+            if 'result' in item:
+                payload = {**item['result'], "saved": bool(user_id)}
+            else:
+                payload = item['error']
+            response_items.append({
+                "index": item['index'],
+                "filename": item['original_filename'],
+                **payload
+            })
         
+        succeeded = sum(1 for item in items if 'result' in item)
         return jsonify({
             "status": "success",
-            **response_data
+            "total": len(items),
+            "succeeded": succeeded,
+            "failed": len(items) - succeeded,
+            "results": response_items
         })
         
+    except RequestEntityTooLarge:
+        raise  # Dijawab handler 413 dengan batas request ini
     except Exception as e:
-        print(f"Prediction error: {e}")
+        print(f"Batch prediction error: {e}")
         return jsonify({
             "status": "error",
             "message": f"Terjadi kesalahan: {str(e)}"
         }), 500
 
+# =============================================================================
+# ASYNC PREDICTION JOBS
+# =============================================================================
+
+def _prediction_job_handler(data, original_filename, user_id):
+    """Handler job: decode -> validasi kulit -> inferensi -> simpan (tiap tahap dilaporkan)"""
+    def handler(job):
+        # Job ikut antrian admission (lane sesuai user) tanpa ditolak karena budget:
+        # job memang dibuat untuk menunggu saat server sibuk
+        admitted = _metered(admission.admit(_request_lane(user_id), enforce_budget=False)) \
+            if admission else contextlib.nullcontext()
+        with admitted:
+            try:
+                image = _decode_upload(data)
+            except InvalidImageError as e:
+                return {"status": "error", "message": _invalid_image_message(e)}, 400
+            job.advance("decoded")
+            filename = _persist_upload(original_filename, data)
+            
+            def on_stage(stage):
+                if stage == "inferred":
+                    # Cache hit: hasil validasi kulit ikut diambil dari cache
+                    job.advance("skin_checked")
+                job.advance(stage)
+            
+            return _run_prediction(image, filename, user_id, on_stage=on_stage)
+    return handler
+
+
+def _job_not_found_response():
+    return jsonify({
+        "status": "error",
+        "message": "Job tidak ditemukan atau sudah kedaluwarsa"
+    }), 404
+
+
+@app.route('/predict/jobs', methods=['POST'])
+@jwt_required(optional=True)
+def create_prediction_job():
+    """Daftarkan prediksi asinkron; langsung mengembalikan job id (202)"""
+    if not is_model_ready():
+        return _model_not_ready_response()
+    
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return jsonify({
+            "status": "error",
+            "message": "Tidak ada file dalam request. Gunakan field 'file'."
+        }), 400
+    
+    user_id = get_jwt_identity()
+    try:
+        job = prediction_jobs.submit(
+            _prediction_job_handler(file.read(), file.filename, user_id),
+            owner=user_id
+        )
+    except JobQueueFull:
+        response = jsonify({
+            "status": "error",
+            "message": "Antrian prediksi penuh, silakan coba lagi sebentar lagi"
+        })
+        response.headers['Retry-After'] = '2'
+        return response, 503
+    
+    response = jsonify({
+        "status": "accepted",
+        "job_id": job.id,
+        "status_url": f"/predict/jobs/{job.id}",
+        "events_url": f"/predict/jobs/{job.id}/events"
+    })
+    response.headers['Location'] = f"/predict/jobs/{job.id}"
+    return response, 202
+
+
+@app.route('/predict/jobs/<job_id>', methods=['GET'])
+@jwt_required(optional=True)
+def get_prediction_job(job_id):
+    """Status job (polling); `result` berisi payload yang sama dengan /predict setelah selesai"""
+    job = prediction_jobs.get(job_id, owner=get_jwt_identity())
+    if job is None:
+        return _job_not_found_response()
+    return jsonify({"status": "success", **job.snapshot()})
+
+
+@app.route('/predict/jobs/<job_id>/events', methods=['GET'])
+@jwt_required(optional=True)
+def stream_prediction_job(job_id):
+    """
+    Server-sent events: `event: stage` untuk tiap tahap baru, lalu `event: done`
+    berisi snapshot akhir. Komentar heartbeat dikirim selama job menunggu.
+    """
+    job = prediction_jobs.get(job_id, owner=get_jwt_identity())
+    if job is None:
+        return _job_not_found_response()
+    
+    def events():
+        version, sent = -1, 0
+        while True:
+            current = job.wait_for_update(version, timeout=JOBS_SSE_HEARTBEAT_SECONDS)
+            if current == version:
+                yield ": heartbeat\n\n"
+                continue
+            version = current
+            snapshot = job.snapshot()
+            for stage in snapshot["stages"][sent:]:
+                yield f"event: stage\ndata: {json.dumps(stage)}\n\n"
+            sent = len(snapshot["stages"])
+            if snapshot["finished_at"] is not None:
+                yield f"event: done\ndata: {json.dumps(snapshot)}\n\n"
+                return
+    
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Nonaktifkan buffering reverse proxy (nginx)
+    })
+
 #histroy endpoint
 
 @app.route('/history', methods=['GET'])
 @jwt_required()
 def get_history():
-    """Ambil riwayat diagnosis user"""
+    """
+    Ambil riwayat diagnosis user.
+    `?after=<next_cursor>` = keyset pagination (tanpa total kecuali `include_total=true`);
+    `?page=` tetap didukung untuk klien lama.
+    """
     user_id = int(get_jwt_identity())
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
+    after = request.args.get('after') or None
+    include_total = request.args.get('include_total')
+    if include_total is not None:
+        include_total = include_total.lower() in ('1', 'true', 'yes')
     
-    result = get_user_history(user_id, page, per_page)
+    try:
+        result = get_user_history(user_id, page, per_page, after=after, include_total=include_total)
+    except ValueError as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
     return jsonify({
         "status": "success",
         **result
     })
 
 
+@app.route('/history/export', methods=['GET'])
+@jwt_required()
+def export_history():
+    """
+    Unduh seluruh riwayat diagnosis user sebagai file, di-stream per chunk (chunked transfer).
+    `?format=ndjson|csv` (default ndjson), `?gzip=true` untuk kompresi gzip.
+    Memori konstan berapa pun panjang riwayat; koneksi MySQL hanya dipinjam per chunk.
+    """
+    user_id = int(get_jwt_identity())
+    fmt = (request.args.get('format') or 'ndjson').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({
+            "status": "error",
+            "message": f"Format tidak didukung. Gunakan: {', '.join(EXPORT_FORMATS)}"
+        }), 400
+    compress = (request.args.get('gzip') or '').lower() in ('1', 'true', 'yes')
+    
+    filename = f"skincheck-history-{datetime.now().strftime('%Y%m%d')}.{fmt}"
+    if compress:
+        filename += '.gz'
+    body = encode_export(iter_user_history(user_id), fmt, app.json.dumps, compress=compress)
+    content_type = 'application/gzip' if compress else EXPORT_FORMATS[fmt]
+    return Response(body, content_type=content_type, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no'  # Nonaktifkan buffering reverse proxy (nginx)
+    })
+
+
 @app.route('/history/stats', methods=['GET'])
 @jwt_required()
 def get_stats():
@@ -470,6 +1027,31 @@ def get_history_detail(diagnosis_id):
     })
 
 
+@app.route('/history/pending/<pending_id>', methods=['GET'])
+@jwt_required()
+def get_pending_diagnosis(pending_id):
+    """
+    Resolve `pending_id` dari /predict (write-behind) menjadi diagnosis tersimpan.
+    200 + data (berisi `id`) setelah flush; 202 jika masih di antrian worker ini; 404 jika tidak ada.
+    """
+    user_id = int(get_jwt_identity())
+    diagnosis = get_diagnosis_by_write_id(pending_id, user_id)
+    if diagnosis:
+        return jsonify({
+            "status": "success",
+            "data": diagnosis
+        })
+    if is_diagnosis_pending(pending_id):
+        return jsonify({
+            "status": "pending",
+            "message": "Diagnosis belum tersimpan, coba lagi sebentar"
+        }), 202
+    return jsonify({
+        "status": "error",
+        "message": "Diagnosis tidak ditemukan (atau belum tersimpan di worker lain)"
+    }), 404
+
+
 @app.route('/history/<int:diagnosis_id>', methods=['DELETE'])
 @jwt_required()
 def delete_history_item(diagnosis_id):
@@ -546,9 +1128,12 @@ def serve_upload(filename):
 
 @app.errorhandler(413)
 def too_large(e):
+    # Batas per request (/predict/batch menaikkannya ke BATCH_PREDICT_MAX_CONTENT_LENGTH)
+    limit_mb = (request.max_content_length or 0) / (1024 * 1024)
+    subject = "Total upload" if request.endpoint == 'predict_batch' else "File"
     return jsonify({
         "status": "error",
-        "message": "File terlalu besar. Maksimal 16MB."
+        "message": f"{subject} terlalu besar. Maksimal {limit_mb:g}MB."
     }), 413
 
 @app.errorhandler(404)
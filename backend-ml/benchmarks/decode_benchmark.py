@@ -0,0 +1,201 @@
+"""
+Benchmark decode gambar upload: decode penuh vs decode draft (JPEG DCT scaling)
+
+Tiap kombinasi (gambar, mode) dijalankan di subprocess baru agar peak RSS
+(VmHWM) tidak tercampur antar pengukuran.
+
+Jalankan dari folder backend-ml:
+    python benchmarks/decode_benchmark.py
+    python benchmarks/decode_benchmark.py --megapixels 2 12 48 --repeats 5
+    python benchmarks/decode_benchmark.py --images path/to/jpegs --output decode.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import statistics
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ("full", "draft")
+
+
+# =============================================================================
+# WORKER (satu gambar, satu mode, proses terpisah)
+# =============================================================================
+
+def _decode(mode, data):
+    from src.image_io import decode_image_bytes
+    if mode == "full":
+        # Jalur lama: decode resolusi penuh
+        return decode_image_bytes(data, min_size=0)
+    return decode_image_bytes(data)
+
+
+def _downstream(image):
+    """Yang dikerjakan setelah decode: piksel validasi kulit + resize prosesor (shortest_edge 256)"""
+    from PIL import Image
+    from src.skin_detector import prepare_skin_pixels
+    rgb = image.convert("RGB")
+    prepare_skin_pixels(rgb)
+    scale = 256 / min(rgb.size)
+    rgb.resize((round(rgb.width * scale), round(rgb.height * scale)), Image.BICUBIC)
+
+
+def peak_rss_kb():
+    """
+    Peak RSS proses ini (KB). VmHWM milik address space baru setelah exec;
+    ru_maxrss di Linux ikut mewarisi puncak proses induk sebelum exec.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_worker(mode, path, repeats):
+    with open(path, "rb") as f:
+        data = f.read()
+    # Import & warm-up modul di luar pengukuran
+    import PIL.JpegImagePlugin  # noqa: F401
+    import src.image_io  # noqa: F401
+    import src.skin_detector  # noqa: F401
+
+    baseline_kb = peak_rss_kb()
+    image = _decode(mode, data)
+    peak_kb = peak_rss_kb()
+    decoded_size = image.size
+    del image
+
+    decode_ms, downstream_ms = [], []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        image = _decode(mode, data)
+        decode_ms.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        _downstream(image)
+        downstream_ms.append((time.perf_counter() - started) * 1000)
+        del image
+
+    print(json.dumps({
+        "decoded_size": decoded_size,
+        "decode_ms": statistics.median(decode_ms),
+        "downstream_ms": statistics.median(downstream_ms),
+        "peak_rss_mb": (peak_kb - baseline_kb) / 1024
+    }))
+
+
+# =============================================================================
+# DRIVER
+# =============================================================================
+
+def make_synthetic_jpegs(megapixels, folder):
+    """JPEG sintetis (noise halus, kualitas 90) dengan rasio 4:3 seperti foto ponsel"""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    paths = []
+    for mp in megapixels:
+        width = int((mp * 1e6 * 4 / 3) ** 0.5)
+        height = int(width * 3 / 4)
+        small = Image.fromarray(rng.integers(60, 230, (48, 64, 3), dtype=np.uint8))
+        path = os.path.join(folder, f"synthetic_{mp}mp.jpg")
+        small.resize((width, height), Image.BICUBIC).save(path, "JPEG", quality=90)
+        paths.append(path)
+    return paths
+
+
+def measure(path, mode, repeats):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", mode, path, "--repeats", str(repeats)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_benchmark(paths, repeats):
+    from PIL import Image
+
+    rows = []
+    for path in paths:
+        with Image.open(path) as image:
+            width, height = image.size
+        megapixels = width * height / 1e6
+        row = {
+            "image": os.path.basename(path),
+            "size": [width, height],
+            "megapixels": round(megapixels, 2),
+            "file_mb": round(os.path.getsize(path) / 1e6, 2)
+        }
+        for mode in MODES:
+            result = measure(path, mode, repeats)
+            row[mode] = {
+                "decoded_size": result["decoded_size"],
+                "decode_ms": round(result["decode_ms"], 2),
+                "downstream_ms": round(result["downstream_ms"], 2),
+                "peak_rss_mb": round(result["peak_rss_mb"], 1),
+                "decode_ms_per_mp": round(result["decode_ms"] / megapixels, 2),
+                "peak_rss_mb_per_mp": round(result["peak_rss_mb"] / megapixels, 2)
+            }
+        row["decode_speedup"] = round(row["full"]["decode_ms"] / row["draft"]["decode_ms"], 2)
+        rows.append(row)
+    return rows
+
+
+def print_table(rows):
+    header = f"{'image':<24}{'MP':>6} | {'mode':<6}{'decoded':>12}{'decode ms':>11}{'ms/MP':>8}{'after ms':>10}{'RSS MB':>9}{'MB/MP':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        for mode in MODES:
+            r = row[mode]
+            decoded = "x".join(str(v) for v in r["decoded_size"])
+            print(f"{row['image']:<24}{row['megapixels']:>6} | {mode:<6}{decoded:>12}{r['decode_ms']:>11}"
+                  f"{r['decode_ms_per_mp']:>8}{r['downstream_ms']:>10}{r['peak_rss_mb']:>9}{r['peak_rss_mb_per_mp']:>8}")
+        print(f"{'':<24}{'':>6} | speedup decode: {row['decode_speedup']}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark decode penuh vs draft JPEG")
+    parser.add_argument("--images", help="Folder berisi JPEG (default: gambar sintetis)")
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[2, 12, 24, 48],
+                        help="Ukuran gambar sintetis (MP)")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Simpan hasil JSON ke file")
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker[0], args.worker[1], args.repeats)
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.images:
+            paths = sorted(
+                os.path.join(args.images, name) for name in os.listdir(args.images)
+                if name.lower().endswith((".jpg", ".jpeg"))
+            )
+        else:
+            print(f"Membuat JPEG sintetis {args.megapixels} MP...")
+            paths = make_synthetic_jpegs(args.megapixels, tmp)
+        rows = run_benchmark(paths, args.repeats)
+
+    print_table(rows)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Hasil disimpan ke {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
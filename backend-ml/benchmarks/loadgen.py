@@ -0,0 +1,484 @@
+"""
+Load generator untuk capacity planning satu replika backend
+
+Menembak backend yang sedang berjalan dengan campuran traffic:
+- predict : POST /predict (upload dari folder gambar atau JPEG sintetis warna kulit),
+            sebagian dengan token user login (riwayat ikut disimpan)
+- history : GET /history (user login)
+- login   : POST /auth/login
+
+Dua mode beban:
+- closed loop (--concurrency N): N klien, masing-masing langsung mengirim request
+  berikutnya setelah jawaban diterima
+- open loop (--rate R): kedatangan Poisson R request/detik, maksimal --concurrency
+  request in-flight; latency diukur dari waktu kedatangan terjadwal sehingga antrian
+  di sisi klien ikut terhitung (tanpa coordinated omission)
+
+Laporan per tahap: throughput, goodput, latency p50/p95/p99/max per endpoint, dan
+rincian kelas hasil (ok, not_skin, low_confidence, 4xx, 503, 5xx, network).
+Dengan --sweep, beban dinaikkan bertahap dan titik saturasi ditentukan: tahap
+terakhir sebelum throughput berhenti naik, error rate melewati batas, atau p99
+melewati SLO.
+
+Jalankan dari folder backend-ml (backend sudah berjalan):
+    python benchmarks/loadgen.py --concurrency 8 --duration 60
+    python benchmarks/loadgen.py --rate 20 --duration 60 --images foto/
+    python benchmarks/loadgen.py --sweep 1 2 4 8 16 32 --duration 30 --register 8 --output load.json
+    python benchmarks/loadgen.py --rate 5 --sweep 5 10 20 40 --slo-ms 2000 --user a@b.com:rahasia
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import random
+import argparse
+import threading
+import statistics
+import http.client
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+ENDPOINTS = ("predict", "history", "login")
+
+# Kelas hasil request
+OK = "ok"
+NOT_SKIN = "not_skin"
+LOW_CONFIDENCE = "low_confidence"
+CLIENT_ERROR = "4xx"
+SHED = "503"          # Ditolak admission control / server sibuk (Retry-After)
+SERVER_ERROR = "5xx"
+NETWORK = "network"   # Timeout / koneksi gagal
+CLASSES = (OK, NOT_SKIN, LOW_CONFIDENCE, CLIENT_ERROR, SHED, SERVER_ERROR, NETWORK)
+FAILURE_CLASSES = (SHED, SERVER_ERROR, NETWORK)
+NETWORK_ERROR_BACKOFF = 0.05  # Detik
+BACKLOG_GRACE = 1.0           # Detik
+
+
+# =============================================================================
+# HTTP
+# =============================================================================
+
+class HttpClient:
+    """Satu koneksi keep-alive per thread; dibuka ulang setelah error"""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._host = parts.hostname
+        self._port = parts.port
+        self._prefix = parts.path.rstrip("/")
+        self._timeout = timeout
+        self._conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        """Kembalikan (status, body bytes); exception jaringan diteruskan"""
+        if self._conn is None:
+            self._conn = self._connection_class(self._host, self._port, timeout=self._timeout)
+        try:
+            self._conn.request(method, self._prefix + path, body=body, headers=headers or {})
+            response = self._conn.getresponse()
+            return response.status, response.read()
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def multipart_body(filename, data, field="file"):
+    boundary = uuid.uuid4().hex
+    content_type = "image/png" if filename.lower().endswith(".png") else "image/jpeg"
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode("utf-8") + data + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def classify(status, body) -> str:
+    if 200 <= status < 300:
+        return OK
+    if status == 503:
+        return SHED
+    if status >= 500:
+        return SERVER_ERROR
+    if status == 400:
+        try:
+            error_type = json.loads(body).get("error_type")
+        except (ValueError, AttributeError):
+            error_type = None
+        if error_type in (NOT_SKIN, LOW_CONFIDENCE):
+            return error_type
+    return CLIENT_ERROR
+
+
+# =============================================================================
+# SKENARIO
+# =============================================================================
+
+class Account:
+    def __init__(self, email, password):
+        self.email = email
+        self.password = password
+        self.token = None
+
+
+class Scenario:
+    """Campuran request berbobot; dibagi ke semua thread (read-only setelah setup)"""
+
+    def __init__(self, mix, uploads, accounts, auth_fraction):
+        self.endpoints = [name for name in ENDPOINTS if mix.get(name, 0) > 0]
+        self.weights = [mix[name] for name in self.endpoints]
+        self.uploads = uploads
+        self.accounts = accounts
+        self.auth_fraction = auth_fraction
+
+    def next_request(self, rng):
+        """(endpoint, method, path, body, headers)"""
+        endpoint = rng.choices(self.endpoints, self.weights)[0]
+        if endpoint == "predict":
+            body, content_type = rng.choice(self.uploads)
+            headers = {"Content-Type": content_type}
+            if self.accounts and rng.random() < self.auth_fraction:
+                headers["Authorization"] = f"Bearer {rng.choice(self.accounts).token}"
+            return endpoint, "POST", "/predict", body, headers
+        account = rng.choice(self.accounts)
+        if endpoint == "history":
+            return endpoint, "GET", "/history?page=1&per_page=10", None, {"Authorization": f"Bearer {account.token}"}
+        body = json.dumps({"email": account.email, "password": account.password}).encode("utf-8")
+        return endpoint, "POST", "/auth/login", body, {"Content-Type": "application/json"}
+
+
+def load_uploads(image_dir, limit):
+    if image_dir:
+        names = sorted(name for name in os.listdir(image_dir) if name.lower().endswith(IMAGE_EXTENSIONS))[:limit]
+        if not names:
+            raise SystemExit(f"❌ Tidak ada gambar di {image_dir}")
+        uploads = []
+        for name in names:
+            with open(os.path.join(image_dir, name), "rb") as f:
+                uploads.append(multipart_body(name, f.read()))
+        return uploads
+    from suite import make_synthetic_image, encode_image
+    return [
+        multipart_body(f"synthetic_{seed}.jpg", encode_image(make_synthetic_image(1280, 960, seed=seed), "jpeg"))
+        for seed in range(4)
+    ]
+
+
+def prepare_accounts(client, users, register, password):
+    """Login akun dari --user, daftarkan --register akun baru; kembalikan list Account ber-token"""
+    accounts = [Account(*spec.split(":", 1)) for spec in users]
+    run_id = uuid.uuid4().hex[:8]
+    for i in range(register):
+        account = Account(f"loadtest_{run_id}_{i}@loadtest.local", password)
+        body = json.dumps({"username": f"loadtest_{run_id}_{i}", "email": account.email,
+                           "password": password, "full_name": "Load Test"}).encode("utf-8")
+        status, response = client.request("POST", "/auth/register", body, {"Content-Type": "application/json"})
+        if status != 201:
+            raise SystemExit(f"❌ Registrasi {account.email} gagal: HTTP {status} {response[:200]!r}")
+        accounts.append(account)
+    for account in accounts:
+        body = json.dumps({"email": account.email, "password": account.password}).encode("utf-8")
+        status, response = client.request("POST", "/auth/login", body, {"Content-Type": "application/json"})
+        if status != 200:
+            raise SystemExit(f"❌ Login {account.email} gagal: HTTP {status} {response[:200]!r}")
+        account.token = json.loads(response)["data"]["access_token"]
+    return accounts
+
+
+# =============================================================================
+# EKSEKUSI BEBAN
+# =============================================================================
+
+def _execute(client, scenario, rng, samples, intended_start=None):
+    endpoint, method, path, body, headers = scenario.next_request(rng)
+    started = time.perf_counter()
+    try:
+        status, response = client.request(method, path, body, headers)
+        outcome = classify(status, response)
+    except Exception:
+        status, outcome = None, NETWORK
+    finished = time.perf_counter()
+    origin = intended_start if intended_start is not None else started
+    samples.append((endpoint, origin, finished - origin, outcome, status))
+    if outcome == NETWORK:
+        time.sleep(NETWORK_ERROR_BACKOFF)  # Server mati / menolak koneksi: jangan spin
+
+
+def run_closed_loop(args, scenario, concurrency, duration):
+    samples = []
+    deadline = time.perf_counter() + duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = HttpClient(args.url, args.timeout)
+        try:
+            while time.perf_counter() < deadline:
+                _execute(client, scenario, rng, samples)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, args=(args.seed + i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, 0
+
+
+def run_open_loop(args, scenario, rate, max_in_flight, duration):
+    samples = []
+    arrivals = queue.Queue()
+    stop = object()
+    begin = time.perf_counter()
+    deadline = begin + duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = HttpClient(args.url, args.timeout)
+        try:
+            while True:
+                intended = arrivals.get()
+                if intended is stop:
+                    return
+                if intended >= deadline:
+                    continue
+                _execute(client, scenario, rng, samples, intended_start=intended)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, args=(args.seed + i,), daemon=True) for i in range(max_in_flight)]
+    for thread in threads:
+        thread.start()
+
+    # Dispatcher: jadwal kedatangan Poisson; tidak menunggu worker yang sibuk
+    rng = random.Random(args.seed)
+    next_arrival = begin
+    while True:
+        next_arrival += rng.expovariate(rate)
+        if next_arrival >= deadline:
+            break
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        arrivals.put(next_arrival)
+
+    # Kedatangan yang sudah menunggu > BACKLOG_GRACE detik tanpa worker bebas saat
+    # durasi habis dihitung sebagai backlog (tanda beban melebihi kapasitas)
+    backlog = 0
+    cutoff = time.perf_counter() - BACKLOG_GRACE
+    while True:
+        try:
+            intended = arrivals.get_nowait()
+        except queue.Empty:
+            break
+        if intended < cutoff:
+            backlog += 1
+    for _ in threads:
+        arrivals.put(stop)
+    for thread in threads:
+        thread.join()
+    return samples, backlog
+
+
+# =============================================================================
+# LAPORAN
+# =============================================================================
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _latency_summary(latencies_ms) -> dict:
+    if not latencies_ms:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None, "mean_ms": None}
+    return {
+        "p50_ms": round(_percentile(latencies_ms, 50), 1),
+        "p95_ms": round(_percentile(latencies_ms, 95), 1),
+        "p99_ms": round(_percentile(latencies_ms, 99), 1),
+        "max_ms": round(max(latencies_ms), 1),
+        "mean_ms": round(statistics.fmean(latencies_ms), 1),
+    }
+
+
+def summarize_stage(samples, measure_from, window, backlog) -> dict:
+    """Statistik sampel yang dimulai setelah warm-up"""
+    measured = [s for s in samples if s[1] >= measure_from]
+    classes = {name: 0 for name in CLASSES}
+    per_endpoint = {}
+    for endpoint, _, latency, outcome, _ in measured:
+        classes[outcome] += 1
+        entry = per_endpoint.setdefault(endpoint, {"latencies": [], "classes": {name: 0 for name in CLASSES}})
+        entry["latencies"].append(latency * 1000)
+        entry["classes"][outcome] += 1
+
+    total = len(measured)
+    failures = sum(classes[name] for name in FAILURE_CLASSES)
+    return {
+        "requests": total,
+        "throughput_rps": round(total / window, 2) if window > 0 else 0.0,
+        "goodput_rps": round(classes[OK] / window, 2) if window > 0 else 0.0,
+        "error_rate": round(failures / total, 4) if total else 0.0,
+        "backlog": backlog,
+        "latency": _latency_summary([s[2] * 1000 for s in measured]),
+        "classes": classes,
+        "endpoints": {
+            endpoint: {
+                "requests": len(entry["latencies"]),
+                "throughput_rps": round(len(entry["latencies"]) / window, 2) if window > 0 else 0.0,
+                **_latency_summary(entry["latencies"]),
+                "classes": {name: count for name, count in entry["classes"].items() if count},
+            }
+            for endpoint, entry in sorted(per_endpoint.items())
+        },
+    }
+
+
+def find_saturation(stages, min_gain, max_error_rate, slo_ms):
+    """
+    Tahap terakhir yang masih sehat: throughput naik >= min_gain dari tahap sebelumnya,
+    error rate <= max_error_rate, dan p99 <= SLO (jika diberikan), tanpa backlog.
+    Kembalikan (indeks tahap sehat terakhir atau None, alasan tahap berikutnya gagal).
+    """
+    last_healthy = None
+    for i, stage in enumerate(stages):
+        summary = stage["summary"]
+        reason = None
+        if summary["error_rate"] > max_error_rate:
+            reason = f"error rate {summary['error_rate']:.1%} > {max_error_rate:.1%}"
+        elif slo_ms is not None and (summary["latency"]["p99_ms"] or 0) > slo_ms:
+            reason = f"p99 {summary['latency']['p99_ms']} ms > SLO {slo_ms} ms"
+        elif summary["backlog"] > 0:
+            reason = f"{summary['backlog']} kedatangan tidak terlayani"
+        elif i > 0:
+            previous = stages[last_healthy]["summary"]["throughput_rps"]
+            if summary["throughput_rps"] < previous * (1 + min_gain):
+                reason = f"throughput {summary['throughput_rps']} rps tidak naik >= {min_gain:.0%} dari {previous} rps"
+        if reason:
+            return last_healthy, f"{stage['load']}: {reason}"
+        last_healthy = i
+    return last_healthy, None
+
+
+def print_stage(stage):
+    summary = stage["summary"]
+    latency = summary["latency"]
+    print(f"\n▶ {stage['load']}: {summary['requests']} request, {summary['throughput_rps']} rps "
+          f"(goodput {summary['goodput_rps']} rps), error rate {summary['error_rate']:.2%}"
+          + (f", backlog {summary['backlog']}" if summary["backlog"] else ""))
+    print(f"  latency p50 {latency['p50_ms']} / p95 {latency['p95_ms']} / p99 {latency['p99_ms']} / max {latency['max_ms']} ms")
+    header = f"  {'endpoint':<10}{'req':>8}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}  kelas"
+    print(header)
+    for endpoint, entry in summary["endpoints"].items():
+        classes = ", ".join(f"{name}={count}" for name, count in entry["classes"].items())
+        print(f"  {endpoint:<10}{entry['requests']:>8}{entry['throughput_rps']:>10}{entry['p50_ms']:>10}"
+              f"{entry['p95_ms']:>10}{entry['p99_ms']:>10}  {classes}")
+
+
+def parse_mix(text) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Endpoint tidak dikenal: {name} (pilihan: {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator backend (throughput, latency, saturasi)")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL backend")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Closed loop: jumlah klien; open loop: maksimal request in-flight")
+    parser.add_argument("--rate", type=float, help="Open loop: kedatangan per detik (Poisson)")
+    parser.add_argument("--sweep", type=float, nargs="+",
+                        help="Naikkan beban bertahap (nilai concurrency, atau rate jika --rate dipakai)")
+    parser.add_argument("--duration", type=float, default=30, help="Detik per tahap (termasuk warm-up)")
+    parser.add_argument("--warmup", type=float, default=5, help="Detik awal tiap tahap yang tidak dihitung")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("predict=70,history=20,login=10"),
+                        help="Bobot endpoint, mis. predict=70,history=20,login=10")
+    parser.add_argument("--images", help="Folder gambar untuk /predict (default: JPEG sintetis)")
+    parser.add_argument("--max-images", type=int, default=50)
+    parser.add_argument("--user", action="append", default=[], metavar="EMAIL:PASSWORD",
+                        help="Akun yang sudah ada untuk traffic login (boleh diulang)")
+    parser.add_argument("--register", type=int, default=0, help="Daftarkan N akun loadtest baru")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--auth-fraction", type=float, default=0.5, help="Porsi /predict dengan token user")
+    parser.add_argument("--timeout", type=float, default=60, help="Timeout per request (detik)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Batas (503 + 5xx + network) / request")
+    parser.add_argument("--min-gain", type=float, default=0.05, help="Kenaikan throughput minimum antar tahap")
+    parser.add_argument("--slo-ms", type=float, help="Batas p99 (ms) untuk titik saturasi")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Simpan hasil JSON ke file")
+    args = parser.parse_args()
+
+    if args.warmup >= args.duration:
+        parser.error("--warmup harus lebih kecil dari --duration")
+    needs_accounts = any(args.mix.get(name, 0) > 0 for name in ("history", "login"))
+    setup_client = HttpClient(args.url, args.timeout)
+    try:
+        accounts = prepare_accounts(setup_client, args.user, args.register, args.password)
+    finally:
+        setup_client.close()
+    if needs_accounts and not accounts:
+        parser.error("Traffic history/login butuh akun: gunakan --user EMAIL:PASSWORD atau --register N")
+    scenario = Scenario(args.mix, load_uploads(args.images, args.max_images), accounts, args.auth_fraction)
+
+    open_loop = args.rate is not None
+    levels = args.sweep or [args.rate if open_loop else args.concurrency]
+    mode = "open" if open_loop else "closed"
+    print(f"Target {args.url}, mode {mode} loop, mix {args.mix}, {len(accounts)} akun, "
+          f"{len(scenario.uploads)} gambar, {args.duration:.0f} s/tahap (warm-up {args.warmup:.0f} s)")
+
+    stages = []
+    for level in levels:
+        started = time.perf_counter()
+        if open_loop:
+            samples, backlog = run_open_loop(args, scenario, level, args.concurrency, args.duration)
+            load = f"rate {level:g}/s"
+        else:
+            samples, backlog = run_closed_loop(args, scenario, int(level), args.duration)
+            load = f"concurrency {int(level)}"
+        window = time.perf_counter() - started - args.warmup
+        stage = {"load": load, "level": level, "summary": summarize_stage(samples, started + args.warmup, window, backlog)}
+        stages.append(stage)
+        print_stage(stage)
+
+    report = {"url": args.url, "mode": mode, "mix": args.mix, "duration": args.duration,
+              "warmup": args.warmup, "stages": stages}
+    if len(stages) > 1:
+        healthy, reason = find_saturation(stages, args.min_gain, args.max_error_rate, args.slo_ms)
+        print("\n" + "=" * 60)
+        if healthy is None:
+            print(f"❌ Sudah jenuh di tahap pertama ({reason})")
+        else:
+            best = stages[healthy]
+            print(f"✅ Beban sehat tertinggi: {best['load']} "
+                  f"({best['summary']['throughput_rps']} rps, p99 {best['summary']['latency']['p99_ms']} ms)")
+            print(f"   Saturasi: {reason}" if reason else "   Belum jenuh pada tahap tertinggi yang diuji")
+        report["saturation"] = {
+            "last_healthy": stages[healthy]["load"] if healthy is not None else None,
+            "throughput_rps": stages[healthy]["summary"]["throughput_rps"] if healthy is not None else None,
+            "reason": reason,
+        }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Hasil disimpan ke {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,670 @@
+"""
+Benchmark suite jalur panas inferensi & persistensi (hasil JSON + mode compare)
+
+Grup yang diukur:
+- skin_check : is_likely_skin_image per ukuran gambar
+- decode     : decode_image_bytes (JPEG & PNG, beberapa ukuran)
+- preprocess : ImagePreprocessor.prepare per ukuran + to_tensor per batch size
+- forward    : forward pass (normalisasi + model + softmax) batch 1/4/16/32
+- predict    : POST /predict end-to-end lewat Flask test client (anonim, tanpa cache)
+- db         : fungsi src/database.py terhadap database lokal
+- render     : satu halaman /history 100 baris: decode baris DB + serialisasi JSON
+               (provider bawaan Flask vs orjson)
+
+Gambar sintetis dibuat deterministik (seed tetap) sehingga hasil antar run bisa
+dibandingkan. Database default adalah stand-in SQLite (file sementara) yang
+meniru antarmuka PyMySQL DictCursor; `--db mysql` memakai server dari MYSQL_*
+(buat database kosong khusus benchmark, data benchmark dihapus di akhir).
+
+Jalankan dari folder backend-ml:
+    python benchmarks/suite.py run --output bench.json
+    python benchmarks/suite.py run --only forward predict --repeats 30
+    python benchmarks/suite.py run --output new.json --baseline bench.json
+    python benchmarks/suite.py compare bench.json new.json --threshold 0.10
+"""
+import os
+import io
+import sys
+import json
+import time
+import uuid
+import datetime
+import re
+import sqlite3
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Harus di-set sebelum src.config di-import: model dimuat sinkron, hasil prediksi
+# tidak di-cache (setiap iterasi benar-benar inferensi), upload tidak ditulis ke disk
+os.environ.setdefault("MODEL_LOAD_IN_BACKGROUND", "false")
+os.environ.setdefault("PREDICTION_CACHE_ENABLED", "false")
+os.environ.setdefault("PERSIST_UPLOADS", "false")
+
+GROUPS = ("skin_check", "decode", "preprocess", "forward", "predict", "db", "render")
+FORMATS = ("jpeg", "png")
+DEFAULT_SIZES = ("640x480", "1920x1440", "4000x3000")
+DEFAULT_BATCH_SIZES = (1, 4, 16, 32)
+
+
+# =============================================================================
+# PENGUKURAN
+# =============================================================================
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples_ms) -> dict:
+    return {
+        "n": len(samples_ms),
+        "median_ms": round(statistics.median(samples_ms), 4),
+        "mean_ms": round(statistics.fmean(samples_ms), 4),
+        "p95_ms": round(_percentile(samples_ms, 95), 4),
+        "min_ms": round(min(samples_ms), 4),
+        "stdev_ms": round(statistics.stdev(samples_ms), 4) if len(samples_ms) > 1 else 0.0,
+    }
+
+
+def measure(fn, repeats, warmup=2, setup=None) -> dict:
+    """
+    Jalankan `fn` (warmup + repeats kali), ukur tiap panggilan.
+    `setup()` (opsional, tidak diukur) dipanggil sebelum setiap panggilan dan
+    hasilnya diteruskan sebagai argumen `fn`.
+    """
+    samples = []
+    for i in range(warmup + repeats):
+        args = (setup(),) if setup is not None else ()
+        started = time.perf_counter()
+        fn(*args)
+        elapsed = (time.perf_counter() - started) * 1000
+        if i >= warmup:
+            samples.append(elapsed)
+    return summarize(samples)
+
+
+def make_synthetic_image(width, height, seed=0):
+    """Gambar bertekstur warna kulit (lolos validasi kulit) tanpa data pasien"""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    base = np.array([205, 150, 125], dtype=np.int16)
+    small = base + rng.integers(-25, 25, (48, 64, 3), dtype=np.int16)
+    small = Image.fromarray(np.clip(small, 0, 255).astype(np.uint8))
+    return small.resize((width, height), Image.BICUBIC)
+
+
+def encode_image(image, fmt) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        image.save(buffer, "JPEG", quality=90)
+    else:
+        image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+# =============================================================================
+# GRUP INFERENSI
+# =============================================================================
+
+def bench_skin_check(images, repeats):
+    from src.image_io import decode_image_bytes
+    from src.inference import is_likely_skin_image
+
+    results = {}
+    for (size, fmt), data in images.items():
+        if fmt != "jpeg":
+            continue  # Validasi kulit bekerja pada gambar hasil decode; format tidak berpengaruh
+        image = decode_image_bytes(data)
+        results[f"skin_check/{size}"] = measure(lambda: is_likely_skin_image(image), repeats)
+    return results
+
+
+def bench_decode(images, repeats):
+    from src.image_io import decode_image_bytes
+
+    results = {}
+    for (size, fmt), data in images.items():
+        results[f"decode/{fmt}_{size}"] = measure(lambda: decode_image_bytes(data), repeats)
+    return results
+
+
+def bench_preprocess(images, batch_sizes, repeats):
+    from src import inference
+    from src.image_io import decode_image_bytes
+
+    results = {}
+    pixels = None
+    for (size, fmt), data in images.items():
+        if fmt != "jpeg":
+            continue
+        image = decode_image_bytes(data)
+        results[f"preprocess/prepare_{size}"] = measure(lambda: inference.preprocessor.prepare(image), repeats)
+        pixels = inference.preprocessor.prepare(image)
+    for batch_size in batch_sizes:
+        arrays = [pixels] * batch_size
+        results[f"preprocess/to_tensor_b{batch_size}"] = measure(
+            lambda: inference.preprocessor.to_tensor(arrays), repeats
+        )
+    return results
+
+
+def bench_forward(images, batch_sizes, repeats):
+    from src import inference
+    from src.image_io import decode_image_bytes
+
+    data = next(data for (_, fmt), data in images.items() if fmt == "jpeg")
+    pixels = inference.preprocessor.prepare(decode_image_bytes(data))
+    results = {}
+    for batch_size in batch_sizes:
+        arrays = [pixels] * batch_size
+        results[f"forward/b{batch_size}"] = measure(lambda: inference._forward_batch(arrays), repeats)
+    return results
+
+
+def bench_predict(images, repeats):
+    import app as flask_app
+
+    client = flask_app.app.test_client()
+    results = {}
+    for (size, fmt), data in images.items():
+        def post():
+            response = client.post(
+                "/predict",
+                data={"file": (io.BytesIO(data), f"bench.{'jpg' if fmt == 'jpeg' else 'png'}")},
+                content_type="multipart/form-data"
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f"/predict {fmt}_{size}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+        results[f"predict/{fmt}_{size}"] = measure(post, repeats)
+    return results
+
+
+# =============================================================================
+# GRUP DATABASE
+# =============================================================================
+
+# Skema setara init_db() dalam dialek SQLite
+SQLITE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(50) UNIQUE NOT NULL,
+    email VARCHAR(100) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    full_name VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE diagnosis_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    class_id SMALLINT NOT NULL,
+    confidence DECIMAL(5,4) NOT NULL,
+    severity TEXT CHECK (severity IN ('low', 'medium', 'high', 'unknown')),
+    top_3 BLOB,
+    image_filename VARCHAR(255),
+    write_id CHAR(32) UNIQUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_history_user_created ON diagnosis_history (user_id, created_at, id);
+CREATE TABLE user_diagnosis_stats (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    severity VARCHAR(20) NOT NULL DEFAULT '',
+    diagnosis_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, severity)
+);
+"""
+
+
+class _SqliteCursor:
+    """Cursor SQLite dengan antarmuka PyMySQL DictCursor (placeholder %s, baris dict)"""
+
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+
+    @staticmethod
+    def _translate(sql):
+        """Dialek MySQL yang dipakai src/database.py -> SQLite"""
+        sql = re.sub(r"SELECT column_name AS name FROM information_schema\.columns\s+"
+                     r"WHERE table_schema = DATABASE\(\) AND table_name = %s",
+                     "SELECT name FROM pragma_table_info(%s)", sql)
+        sql = sql.replace("%s", "?").replace(" FOR UPDATE", "")
+        sql = sql.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET")
+        return re.sub(r"\bVALUES\((\w+)\)", r"excluded.\1", sql)
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(self._translate(sql), tuple(params or ()))
+        return self._cursor.rowcount
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(self._translate(sql), [tuple(p) for p in seq_of_params])
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return dict(row) if row is not None else None
+
+    def fetchall(self):
+        return [dict(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return (dict(row) for row in self._cursor)
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class _SqliteConnection:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.create_function(
+            "FROM_UNIXTIME", 1,
+            lambda ts: datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+        )
+
+    def cursor(self, *args, **kwargs):
+        return _SqliteCursor(self._conn)
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1")
+
+    @property
+    def server_status(self):
+        """Flag transaksi seperti PyMySQL (dipakai connection pool saat checkin)"""
+        from pymysql.constants import SERVER_STATUS
+        return SERVER_STATUS.SERVER_STATUS_IN_TRANS if self._conn.in_transaction else 0
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+@contextmanager
+def sqlite_standin():
+    """Arahkan pymysql.connect di src.database ke file SQLite sementara"""
+    from src import database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite3")
+        with sqlite3.connect(path) as conn:
+            conn.executescript(SQLITE_SCHEMA)
+        original = database.pymysql.connect
+        database.pymysql.connect = lambda *args, **kwargs: _SqliteConnection(path)
+        try:
+            yield
+        finally:
+            database.pymysql.connect = original
+            if database.db_pool is not None:
+                database.db_pool.close_idle()
+
+
+@contextmanager
+def mysql_database():
+    """Server MySQL dari MYSQL_*; tabel dibuat oleh init_db()"""
+    from src import database
+    database.init_db()
+    yield
+
+
+def _diagnosis(user_id, index):
+    from src.config import CLASS_NAMES
+
+    return {
+        "user_id": user_id,
+        "condition": CLASS_NAMES[index % 7],
+        "confidence": 0.5 + (index % 50) / 100,
+        "severity": ("low", "medium", "high", None)[index % 4],
+        "image_filename": f"bench_{index}.jpg",
+        "top_3_predictions": [{"label": CLASS_NAMES[(index + k) % 7], "confidence": 30.0} for k in range(3)],
+        "class_index": index % 7,
+    }
+
+
+def _save(diagnosis):
+    from src import database
+    return database.save_diagnosis(**diagnosis)
+
+
+def _spread_created_at(user_id, backend):
+    """Riwayat nyata tersebar dalam waktu; bulk insert benchmark jatuh di detik yang sama"""
+    from src import database
+
+    if backend == "sqlite":
+        sql = "UPDATE diagnosis_history SET created_at = datetime('now', '-' || id || ' minutes') WHERE user_id = %s"
+    else:
+        sql = "UPDATE diagnosis_history SET created_at = NOW() - INTERVAL id MINUTE WHERE user_id = %s"
+    with database.get_db_connection() as conn:
+        conn.cursor().execute(sql, (user_id,))
+        conn.commit()
+
+
+def bench_db(repeats, history_rows, backend):
+    from src import database
+
+    run_id = uuid.uuid4().hex[:8]
+    counter = iter(range(10 ** 9))
+
+    def new_user():
+        n = next(counter)
+        return database.create_user(f"bench_{run_id}_{n}", f"bench_{run_id}_{n}@bench.local", "x" * 60, "Benchmark")
+
+    standin = sqlite_standin() if backend == "sqlite" else mysql_database()
+    results = {}
+    created_users = []
+    with standin:
+        # User dengan riwayat panjang untuk query baca
+        user = new_user()
+        created_users.append(user["id"])
+        database.save_diagnoses_bulk([_diagnosis(user["id"], i) for i in range(history_rows)])
+        _spread_created_at(user["id"], backend)
+        last_page = max(1, (history_rows + 9) // 10)
+
+        def create_user_case():
+            created_users.append(new_user()["id"])
+
+        results["db/create_user"] = measure(create_user_case, repeats)
+        results["db/get_user_by_email"] = measure(lambda: database.get_user_by_email(user["email"]), repeats)
+        results["db/get_user_by_username"] = measure(lambda: database.get_user_by_username(user["username"]), repeats)
+        results["db/get_user_by_id"] = measure(lambda: database.get_user_by_id(user["id"]), repeats)
+
+        scratch = new_user()
+        created_users.append(scratch["id"])
+        results["db/save_diagnosis"] = measure(lambda: _save(_diagnosis(scratch["id"], 0)), repeats)
+        bulk = [_diagnosis(scratch["id"], i) for i in range(10)]
+        results["db/save_diagnoses_bulk_10"] = measure(lambda: database.save_diagnoses_bulk(bulk), repeats)
+        # Flush write-behind: satu multi-row INSERT per batch
+        flush_batch = [{**_diagnosis(scratch["id"], i), "created_at": time.time()} for i in range(100)]
+        results["db/insert_diagnoses_multirow_100"] = measure(
+            lambda batch: database.insert_diagnoses_multirow(batch), repeats,
+            setup=lambda: [{**record, "write_id": uuid.uuid4().hex} for record in flush_batch]
+        )
+
+        results["db/get_user_history_first_page"] = measure(lambda: database.get_user_history(user["id"], 1, 10), repeats)
+        results["db/get_user_history_last_page"] = measure(
+            lambda: database.get_user_history(user["id"], last_page, 10), repeats
+        )
+        # Keyset: cursor menuju halaman terakhir, diambil tanpa OFFSET
+        deep_cursor = database.get_user_history(user["id"], max(1, last_page - 1), 10)["next_cursor"]
+        results["db/get_user_history_keyset_last_page"] = measure(
+            lambda: database.get_user_history(user["id"], per_page=10, after=deep_cursor), repeats
+        )
+        some_id = database.get_user_history(user["id"], 1, 1)["data"][0]["id"]
+        results["db/get_diagnosis_by_id"] = measure(lambda: database.get_diagnosis_by_id(some_id, user["id"]), repeats)
+        results["db/get_user_statistics"] = measure(lambda: database.get_user_statistics(user["id"]), repeats)
+
+        results["db/delete_diagnosis"] = measure(
+            lambda diagnosis_id: database.delete_diagnosis(diagnosis_id, scratch["id"]), repeats,
+            setup=lambda: _save(_diagnosis(scratch["id"], 0))
+        )
+
+        def user_with_history():
+            target = new_user()
+            created_users.append(target["id"])
+            database.save_diagnoses_bulk([_diagnosis(target["id"], i) for i in range(20)])
+            return target["id"]
+
+        results["db/delete_all_user_history_20"] = measure(
+            database.delete_all_user_history, repeats, setup=user_with_history
+        )
+
+        if backend == "mysql":
+            with database.get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"DELETE FROM users WHERE id IN ({', '.join(['%s'] * len(created_users))})", created_users
+                )
+                conn.commit()
+    return results
+
+
+# =============================================================================
+# RUN & COMPARE
+# =============================================================================
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _history_rows(count):
+    """Baris diagnosis_history seperti hasil DictCursor PyMySQL (skema compact)"""
+    import decimal
+    from src import database
+
+    started = datetime.datetime(2026, 1, 1, 8, 0, 0)
+    rows = []
+    for i in range(count):
+        diagnosis = _diagnosis(7, i)
+        rows.append({
+            "id": 1000 + i,
+            "user_id": 7,
+            "class_id": diagnosis["class_index"],
+            "confidence": decimal.Decimal(f"{diagnosis['confidence']:.4f}"),
+            "severity": diagnosis["severity"],
+            "top_3": database._pack_top_3(diagnosis["top_3_predictions"]),
+            "image_filename": diagnosis["image_filename"],
+            "created_at": started - datetime.timedelta(minutes=i),
+        })
+    return rows
+
+
+def bench_render(repeats, rows=100):
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+    from src import database
+    from src.json_provider import OrjsonProvider, orjson_available
+
+    db_rows = _history_rows(rows)
+    page = {"status": "success", "data": [database._history_item(row) for row in db_rows],
+            "per_page": rows, "has_more": True, "next_cursor": "x" * 40}
+    app = Flask("bench")
+    providers = {"default": DefaultJSONProvider(app)}
+    if orjson_available():
+        providers["orjson"] = OrjsonProvider(app)
+
+    results = {f"render/decode_rows_{rows}": measure(
+        lambda: [database._history_item(row) for row in db_rows], repeats
+    )}
+    with app.app_context():
+        for name, provider in providers.items():
+            results[f"render/response_{name}_{rows}"] = measure(lambda: provider.response(page), repeats)
+            results[f"render/page_{name}_{rows}"] = measure(
+                lambda: provider.response({**page, "data": [database._history_item(row) for row in db_rows]}),
+                repeats
+            )
+    return results
+
+
+def environment_info(args) -> dict:
+    info = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "groups": args.only,
+        "sizes": args.sizes,
+        "repeats": args.repeats,
+    }
+    try:
+        import torch
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    if set(args.only) & {"preprocess", "forward", "predict"}:
+        from src import inference
+        info["model"] = inference.REPO_NAME
+        info["engine"] = inference.engine.info() if inference.engine is not None else None
+    if "db" in args.only:
+        info["db_backend"] = args.db
+        info["db_history_rows"] = args.history_rows
+    return info
+
+
+def run(args) -> dict:
+    sizes = [parse_size(size) for size in args.sizes]
+    images = {}
+    for width, height in sizes:
+        image = make_synthetic_image(width, height)
+        for fmt in FORMATS:
+            images[(f"{width}x{height}", fmt)] = encode_image(image, fmt)
+
+    if set(args.only) & {"preprocess", "forward", "predict"}:
+        from src import inference
+        if not inference.is_model_ready():
+            inference.load_model()
+
+    results = {}
+    for group in args.only:
+        print(f"▶ {group}...", flush=True)
+        if group == "skin_check":
+            results.update(bench_skin_check(images, args.repeats))
+        elif group == "decode":
+            results.update(bench_decode(images, args.repeats))
+        elif group == "preprocess":
+            results.update(bench_preprocess(images, args.batch_sizes, args.repeats))
+        elif group == "forward":
+            results.update(bench_forward(images, args.batch_sizes, args.repeats))
+        elif group == "predict":
+            results.update(bench_predict(images, args.repeats))
+        elif group == "db":
+            results.update(bench_db(args.repeats, args.history_rows, args.db))
+        elif group == "render":
+            results.update(bench_render(args.repeats))
+    return {"environment": environment_info(args), "results": results}
+
+
+def compare(baseline, current, threshold, min_delta_ms) -> list:
+    """
+    Bandingkan median per kasus. Regresi jika median naik lebih dari `threshold`
+    (relatif) DAN lebih dari `min_delta_ms` (absolut, meredam noise kasus mikro).
+    """
+    rows = []
+    base_results = baseline["results"]
+    current_results = current["results"]
+    for name in sorted(set(base_results) | set(current_results)):
+        base = base_results.get(name)
+        now = current_results.get(name)
+        if base is None or now is None:
+            rows.append({"case": name, "status": "new" if base is None else "missing",
+                         "baseline_ms": base and base["median_ms"], "current_ms": now and now["median_ms"]})
+            continue
+        delta = now["median_ms"] - base["median_ms"]
+        ratio = delta / base["median_ms"] if base["median_ms"] > 0 else 0.0
+        if ratio > threshold and delta > min_delta_ms:
+            status = "regression"
+        elif ratio < -threshold and -delta > min_delta_ms:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append({"case": name, "status": status, "baseline_ms": base["median_ms"],
+                     "current_ms": now["median_ms"], "change_pct": round(ratio * 100, 1)})
+    return rows
+
+
+def print_results(results):
+    header = f"{'case':<42}{'median ms':>11}{'p95 ms':>10}{'mean ms':>10}{'stdev':>9}{'n':>5}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(f"{name:<42}{r['median_ms']:>11.3f}{r['p95_ms']:>10.3f}{r['mean_ms']:>10.3f}{r['stdev_ms']:>9.3f}{r['n']:>5}")
+
+
+def print_comparison(rows):
+    icons = {"regression": "❌", "improved": "✅", "ok": "  ", "new": "🆕", "missing": "⚠️"}
+    header = f"   {'case':<42}{'baseline':>11}{'current':>11}{'change':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        base = f"{row['baseline_ms']:.3f}" if row["baseline_ms"] is not None else "-"
+        now = f"{row['current_ms']:.3f}" if row["current_ms"] is not None else "-"
+        change = f"{row['change_pct']:+.1f}%" if "change_pct" in row else row["status"]
+        print(f"{icons[row['status']]} {row['case']:<42}{base:>11}{now:>11}{change:>9}")
+    regressions = [row for row in rows if row["status"] == "regression"]
+    print("=" * len(header))
+    print(f"❌ {len(regressions)} regresi" if regressions else "✅ Tidak ada regresi")
+    return regressions
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite inferensi & persistensi")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Jalankan benchmark")
+    run_parser.add_argument("--only", nargs="+", choices=GROUPS, default=list(GROUPS), help="Grup yang dijalankan")
+    run_parser.add_argument("--sizes", nargs="+", default=list(DEFAULT_SIZES), help="Ukuran gambar sintetis WxH")
+    run_parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(DEFAULT_BATCH_SIZES))
+    run_parser.add_argument("--repeats", type=int, default=20, help="Iterasi terukur per kasus (setelah 2 warm-up)")
+    run_parser.add_argument("--db", choices=("sqlite", "mysql"), default="sqlite",
+                            help="sqlite = stand-in lokal; mysql = server dari MYSQL_*")
+    run_parser.add_argument("--history-rows", type=int, default=1000, help="Jumlah riwayat user untuk query baca")
+    run_parser.add_argument("--output", help="Simpan hasil JSON ke file")
+    run_parser.add_argument("--baseline", help="Bandingkan langsung dengan hasil JSON sebelumnya")
+    run_parser.add_argument("--threshold", type=float, default=0.10, help="Kenaikan median relatif = regresi")
+    run_parser.add_argument("--min-delta-ms", type=float, default=0.05, help="Kenaikan absolut minimum = regresi")
+
+    compare_parser = sub.add_parser("compare", help="Bandingkan dua file hasil")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10)
+    compare_parser.add_argument("--min-delta-ms", type=float, default=0.05)
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        rows = compare(_load(args.baseline), _load(args.current), args.threshold, args.min_delta_ms)
+        return 1 if print_comparison(rows) else 0
+
+    report = run(args)
+    print_results(report["results"])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Hasil disimpan ke {args.output}")
+    if args.baseline:
+        rows = compare(_load(args.baseline), report, args.threshold, args.min_delta_ms)
+        return 1 if print_comparison(rows) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
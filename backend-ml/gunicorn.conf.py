@@ -0,0 +1,78 @@
+"""
+Konfigurasi gunicorn untuk production (preload-then-fork)
+
+Jalankan:
+    gunicorn -c gunicorn.conf.py app:app
+
+- app.py (dan model) dimuat sekali di master, lalu worker di-fork: bobot model
+  (mmap, lihat src/weights.py) dan objek Python hasil import dibagi ke semua
+  worker sebagai halaman copy-on-write
+- Warm-up tidak dijalankan di master (torch/OpenMP sebelum fork tidak aman),
+  melainkan di tiap worker sebelum menerima request
+- Koneksi MySQL master ditutup sebelum fork; tiap worker membuka pool sendiri
+  (MYSQL_POOL_MIN_SIZE koneksi) sebelum menerima request
+- Setiap worker mencetak memori unique vs shared saat siap; laporan lengkap:
+  python manage.py memory-report --pid <pid master> --children
+- Jika PROMETHEUS_MULTIPROC_DIR di-set, /metrics menggabungkan metrik semua worker;
+  direktori dikosongkan saat start dan file worker yang mati ditandai
+"""
+import gc
+import os
+import glob
+
+# Harus di-set sebelum app.py di-import oleh master (preload_app)
+os.environ.setdefault('MODEL_PRELOAD_FORK', 'true')
+# Model harus selesai dimuat sebelum fork; thread background tidak ikut ter-fork
+os.environ.setdefault('MODEL_LOAD_IN_BACKGROUND', 'false')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 4))  # Request paralel per worker (digabung micro-batcher)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+preload_app = True
+
+
+def on_starting(server):
+    """Kosongkan file metrik multiprocess sisa run sebelumnya"""
+    metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+            os.remove(path)
+
+
+def when_ready(server):
+    """Master selesai memuat app: bekukan objek hasil import agar GC worker tidak menyentuhnya"""
+    # gc.freeze() memindahkan objek ke generasi permanen; tanpa ini, GC di worker
+    # menulis header objek master sehingga halamannya ter-copy (unique naik)
+    # Koneksi MySQL master (init_db saat import) tidak boleh dipakai bersama worker
+    from src.database import db_pool
+    if db_pool is not None:
+        db_pool.close_idle()
+    gc.freeze()
+    from src.memory import process_memory, format_process_memory
+    server.log.info("Master siap. Memori %s", format_process_memory(process_memory()))
+
+
+def post_worker_init(worker):
+    """Warm-up + isi pool MySQL di worker hasil fork, lalu laporkan memori unique vs shared worker"""
+    from src.inference import warm_up_after_fork
+    from src.database import db_pool, diagnosis_writer
+    from src.memory import process_memory, format_process_memory
+    warm_up_after_fork()
+    if db_pool is not None:
+        try:
+            db_pool.prefill()
+        except Exception as e:
+            worker.log.warning("Gagal membuka koneksi awal pool MySQL: %s", e)
+    if diagnosis_writer is not None:
+        # Flusher mulai sekarang agar spool worker yang mati diulang tanpa menunggu request
+        diagnosis_writer.start()
+    worker.log.info("Worker siap. Memori %s", format_process_memory(process_memory()))
+
+
+def child_exit(server, worker):
+    """Worker mati: gauge multiprocess miliknya tidak ikut dijumlahkan lagi"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,222 @@
+"""
+Command line untuk tugas operasional backend-ml
+
+Contoh:
+    python manage.py export-onnx
+    python manage.py export-onnx --output models/model.onnx --opset 17
+    python manage.py check-onnx --onnx models/model.onnx
+    python manage.py compare-precision --images path/to/labeled_folder --output report.json
+    python manage.py memory-report --pid <pid master gunicorn> --children
+    python manage.py rebuild-stats --verify
+    python manage.py rebuild-stats --user-id 42
+    python manage.py migrate-history --status
+    python manage.py migrate-history --batch-size 1000 --pause 0.05
+    python manage.py migrate-history --contract
+"""
+import sys
+import json
+import argparse
+
+from src.config import REPO_NAME, ONNX_MODEL_PATH
+
+
+# =============================================================================
+# ONNX
+# =============================================================================
+
+def cmd_export_onnx(args):
+    """Export checkpoint REPO_NAME ke ONNX lalu cek parity dengan PyTorch"""
+    from src.inference import load_pytorch_model, load_image_processor, get_input_size
+    from src.engines import export_onnx, check_parity
+
+    input_size = get_input_size(load_image_processor())
+    model = load_pytorch_model()
+
+    print(f"Export {REPO_NAME} -> {args.output} (opset {args.opset}, input {input_size})...")
+    export_onnx(model, args.output, input_size=input_size, opset=args.opset)
+    print("✅ Export selesai")
+
+    if args.skip_parity:
+        return 0
+    return _print_parity(check_parity(model, args.output, input_size=input_size, atol=args.atol))
+
+
+def cmd_check_onnx(args):
+    """Parity check logits ONNX Runtime vs PyTorch untuk file ONNX yang sudah ada"""
+    from src.inference import load_pytorch_model, load_image_processor, get_input_size
+    from src.engines import check_parity
+
+    input_size = get_input_size(load_image_processor())
+    model = load_pytorch_model()
+    return _print_parity(check_parity(model, args.onnx, input_size=input_size, atol=args.atol))
+
+
+def _print_parity(report):
+    print(json.dumps(report, indent=2))
+    if report["passed"]:
+        print("✅ Parity check lolos")
+        return 0
+    print("❌ Parity check gagal: logits ONNX berbeda dari PyTorch")
+    return 1
+
+
+# =============================================================================
+# PRECISION
+# =============================================================================
+
+def cmd_compare_precision(args):
+    """Laporan akurasi & latency fp32 vs int8 pada folder gambar berlabel"""
+    from src.inference import load_pytorch_model, load_image_processor
+    from src.evaluation import compare_precisions
+
+    report = compare_precisions(
+        load_pytorch_model(), load_image_processor(), args.images,
+        batch_size=args.batch_size, repeats=args.repeats
+    )
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"Laporan disimpan ke {args.output}")
+    return 0
+
+
+# =============================================================================
+# MEMORY
+# =============================================================================
+
+def cmd_memory_report(args):
+    """Memori unique vs shared per proses (mis. master + worker gunicorn)"""
+    from src.memory import memory_report, child_pids
+
+    pids = list(args.pid)
+    if args.children:
+        for pid in args.pid:
+            pids.extend(child for child in child_pids(pid) if child not in pids)
+    report = memory_report(pids)
+    if not report["processes"]:
+        print("❌ Memori proses tidak bisa dibaca (butuh Linux /proc/<pid>/smaps_rollup)")
+        return 1
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"Laporan disimpan ke {args.output}")
+    return 0
+
+
+# =============================================================================
+# DATABASE
+# =============================================================================
+
+def cmd_rebuild_stats(args):
+    """Cek / hitung ulang tabel user_diagnosis_stats dari diagnosis_history"""
+    from src.database import verify_user_statistics, rebuild_user_statistics
+
+    user_ids = args.user_id or None
+    mismatches = verify_user_statistics(user_ids)
+    for item in mismatches[:50]:
+        print(f"  user {item['user_id']} severity {item['severity']!r}: "
+              f"tabel {item['actual']}, riwayat {item['expected']}")
+    if len(mismatches) > 50:
+        print(f"  ... dan {len(mismatches) - 50} selisih lainnya")
+    if args.verify:
+        if mismatches:
+            print(f"❌ {len(mismatches)} counter statistik tidak sesuai riwayat")
+            return 1
+        print("✅ Statistik user konsisten dengan riwayat")
+        return 0
+
+    count = rebuild_user_statistics(user_ids)
+    print(f"✅ Statistik {count} user dihitung ulang ({len(mismatches)} counter diperbaiki)")
+    return 0
+
+
+def cmd_migrate_history(args):
+    """Migrasi online diagnosis_history ke skema compact (backfill per batch, lalu kontrak)"""
+    from src.database import (
+        get_history_migration_status, migrate_legacy_history, contract_history_schema,
+        HISTORY_LAYOUT_COMPACT
+    )
+
+    status = get_history_migration_status()
+    print(f"Layout: {status['layout']}, baris belum dimigrasi: {status['pending_rows']}")
+    if args.status or status['layout'] == HISTORY_LAYOUT_COMPACT:
+        return 0
+
+    if args.contract:
+        try:
+            contract_history_schema()
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return 1
+        print("✅ Kolom lama dihapus; diagnosis_history memakai skema compact")
+        return 0
+
+    def progress(result):
+        print(f"  {result['migrated']} baris dimigrasi, {result['unmapped']} dilewati", end="\r", flush=True)
+
+    result = migrate_legacy_history(batch_size=args.batch_size, pause=args.pause, on_batch=progress)
+    print(f"✅ {result['migrated']} baris dimigrasi" + " " * 20)
+    if result['unmapped']:
+        print(f"⚠️ {result['unmapped']} baris dengan kelas di luar CLASS_NAMES dilewati "
+              f"(id: {result['unmapped_ids']}); perbaiki atau hapus sebelum --contract")
+        return 1
+    print("Setelah semua worker memakai versi ini, jalankan: python manage.py migrate-history --contract")
+    return 0
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="SkinCheck AI backend tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export-onnx", help="Export model ke ONNX (dynamic batch axis)")
+    p.add_argument("--output", default=ONNX_MODEL_PATH, help="Path file .onnx")
+    p.add_argument("--opset", type=int, default=17)
+    p.add_argument("--atol", type=float, default=1e-3, help="Toleransi selisih logits")
+    p.add_argument("--skip-parity", action="store_true", help="Lewati parity check")
+    p.set_defaults(func=cmd_export_onnx)
+
+    p = sub.add_parser("check-onnx", help="Parity check ONNX vs PyTorch")
+    p.add_argument("--onnx", default=ONNX_MODEL_PATH, help="Path file .onnx")
+    p.add_argument("--atol", type=float, default=1e-3, help="Toleransi selisih logits")
+    p.set_defaults(func=cmd_check_onnx)
+
+    p = sub.add_parser("compare-precision", help="Bandingkan akurasi & latency fp32 vs int8")
+    p.add_argument("--images", required=True, help="Folder gambar berlabel (<root>/<nama kelas>/*.jpg)")
+    p.add_argument("--batch-size", type=int, default=8)
+    p.add_argument("--repeats", type=int, default=3, help="Pengulangan pengukuran latency")
+    p.add_argument("--output", help="Simpan laporan JSON ke file")
+    p.set_defaults(func=cmd_compare_precision)
+
+    p = sub.add_parser("memory-report", help="Memori unique vs shared per proses")
+    p.add_argument("--pid", type=int, action="append", required=True, help="PID proses (boleh berulang)")
+    p.add_argument("--children", action="store_true", help="Ikutkan proses anak (worker gunicorn)")
+    p.add_argument("--output", help="Simpan laporan JSON ke file")
+    p.set_defaults(func=cmd_memory_report)
+
+    p = sub.add_parser("rebuild-stats", help="Cek / hitung ulang statistik diagnosis per user")
+    p.add_argument("--verify", action="store_true", help="Hanya cek; exit 1 jika ada selisih")
+    p.add_argument("--user-id", type=int, action="append", help="Batasi ke user tertentu (boleh berulang)")
+    p.set_defaults(func=cmd_rebuild_stats)
+
+    p = sub.add_parser("migrate-history", help="Migrasi online riwayat diagnosis ke skema compact")
+    p.add_argument("--status", action="store_true", help="Hanya tampilkan status migrasi")
+    p.add_argument("--batch-size", type=int, default=1000, help="Baris per transaksi backfill")
+    p.add_argument("--pause", type=float, default=0.0, help="Jeda (detik) antar batch")
+    p.add_argument("--contract", action="store_true", help="Hapus kolom lama setelah backfill selesai")
+    p.set_defaults(func=cmd_migrate_history)
+
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    sys.exit(args.func(args))
@@ -0,0 +1,248 @@
+"""
+Admission control untuk endpoint inferensi
+- Membatasi pekerjaan inferensi yang berjalan bersamaan (`capacity`, satuan gambar);
+  request selebihnya menunggu di antrian per lane
+- Request langsung ditolak (503 + Retry-After) jika perkiraan latency-nya
+  (antrian di depannya x rata-rata waktu layanan) melebihi latency budget lane
+- Request yang menunggu di antrian dibuang jika deadline-nya lewat atau klien
+  sudah memutus koneksi, sehingga CPU tidak mengerjakan hasil yang tak diterima
+- Dua lane: user login (prioritas, budget lebih besar) dan anonim; slot kosong
+  selalu diberikan ke lane prioritas lebih dulu
+"""
+import math
+import time
+import socket
+import select
+import threading
+from collections import deque
+
+LANE_AUTHENTICATED = "authenticated"
+LANE_ANONYMOUS = "anonymous"
+LANES = (LANE_AUTHENTICATED, LANE_ANONYMOUS)  # Urutan prioritas
+
+REJECT_OVERLOADED = "overloaded"
+REJECT_DEADLINE = "deadline_exceeded"
+REJECT_DISCONNECTED = "client_disconnected"
+
+
+class AdmissionRejected(RuntimeError):
+    """Request tidak diterima / dibuang dari antrian; `retry_after` dalam detik"""
+
+    def __init__(self, reason, retry_after=1, estimated_ms=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+        self.estimated_ms = estimated_ms
+
+
+def socket_disconnect_probe(environ):
+    """
+    Fungsi tanpa argumen yang bernilai True jika klien sudah menutup koneksi.
+    Memakai socket dari server WSGI (gunicorn / werkzeug); None jika tidak tersedia.
+    """
+    sock = environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+    if sock is None:
+        return None
+
+    def disconnected():
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            # Socket "readable" tanpa data = FIN dari klien
+            return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+        except ValueError:
+            return False  # Socket TLS tidak mendukung MSG_PEEK
+        except OSError:
+            return True
+    return disconnected
+
+
+class _Waiter:
+    __slots__ = ("lane", "cost", "granted")
+
+    def __init__(self, lane, cost):
+        self.lane = lane
+        self.cost = cost
+        self.granted = False
+
+
+class AdmissionController:
+    """
+    Gerbang in-process di depan inferensi.
+
+    Pemakaian:
+        with controller.admit(lane, deadline=..., is_disconnected=...):
+            ... inferensi ...
+
+    Waktu layanan dirata-rata (EWMA) per putaran: durasi blok `with` dibagi jumlah
+    putaran selebar `capacity` yang dipakai pekerjaannya (`set_work`, default `cost`).
+    Blok tanpa pekerjaan (cache hit, input ditolak) atau yang keluar karena exception
+    tidak ikut dirata-rata. Perkiraan latency request baru =
+    (ceil(pekerjaan di depannya / capacity) + putaran request itu sendiri) x EWMA.
+    """
+
+    def __init__(self, capacity=16, budgets_ms=None, poll_interval=0.05, ewma_alpha=0.2):
+        self.capacity = max(1, capacity)
+        self.budgets_ms = dict(budgets_ms or {LANE_AUTHENTICATED: 5000, LANE_ANONYMOUS: 2000})
+        self.poll_interval = poll_interval
+        self.ewma_alpha = ewma_alpha
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = {lane: deque() for lane in LANES}
+        self._service_ms = None  # EWMA durasi per putaran (capacity gambar)
+
+        # Statistik
+        self._admitted = {lane: 0 for lane in LANES}
+        self._rejected = {lane: {REJECT_OVERLOADED: 0, REJECT_DEADLINE: 0, REJECT_DISCONNECTED: 0} for lane in LANES}
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+
+    def admit(self, lane, cost=1, deadline=None, is_disconnected=None, enforce_budget=True):
+        """
+        Tunggu slot untuk `cost` gambar; kembalikan context manager yang melepas slot.
+        `deadline` = waktu time.monotonic() terakhir request boleh mulai diproses.
+        `enforce_budget=False` (job asinkron) hanya antri, tidak ditolak karena budget.
+        Melempar AdmissionRejected.
+        """
+        if lane not in self._waiting:
+            raise ValueError(f"Lane tidak dikenal: {lane}")
+        work = max(1, cost)
+        # Request lebih besar dari capacity memakai semua slot selama beberapa putaran
+        cost = min(work, self.capacity)
+        with self._cond:
+            estimated = self._estimate_ms(lane, cost, work)
+            budget = self.budgets_ms.get(lane)
+            if enforce_budget and budget is not None and estimated is not None and estimated > budget:
+                return self._reject(lane, REJECT_OVERLOADED, estimated)
+
+            if self._can_start(lane, cost):
+                self._in_flight += cost
+                self._admitted[lane] += 1
+                return _Admission(self, cost, work)
+
+            waiter = _Waiter(lane, cost)
+            self._waiting[lane].append(waiter)
+            try:
+                while not waiter.granted:
+                    reason = None
+                    if deadline is not None and time.monotonic() >= deadline:
+                        reason = REJECT_DEADLINE
+                    elif is_disconnected is not None and is_disconnected():
+                        reason = REJECT_DISCONNECTED
+                    if reason:
+                        return self._reject(lane, reason, self._estimate_ms(lane, cost, work))
+                    timeout = self.poll_interval
+                    if deadline is not None:
+                        timeout = min(timeout, max(deadline - time.monotonic(), 0))
+                    self._cond.wait(timeout)
+            finally:
+                if not waiter.granted:
+                    self._waiting[lane].remove(waiter)
+                    # Waiter di belakangnya mungkin sekarang bisa mulai
+                    self._grant_waiters()
+            self._admitted[lane] += 1
+            return _Admission(self, cost, work)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "in_flight": self._in_flight,
+                "queued": {lane: sum(w.cost for w in self._waiting[lane]) for lane in LANES},
+                "service_ms_ewma": round(self._service_ms, 2) if self._service_ms is not None else None,
+                "budgets_ms": dict(self.budgets_ms),
+                "admitted": dict(self._admitted),
+                "rejected": {lane: dict(counts) for lane, counts in self._rejected.items()},
+            }
+
+    # -------------------------------------------------------------------------
+    # Internal (dipanggil dengan _cond dipegang)
+    # -------------------------------------------------------------------------
+
+    def _ahead_of(self, lane) -> int:
+        """Jumlah gambar yang akan dilayani sebelum request baru di `lane`"""
+        ahead = self._in_flight
+        for other in LANES:
+            ahead += sum(w.cost for w in self._waiting[other])
+            if other == lane:
+                break
+        return ahead
+
+    def _rounds(self, work) -> int:
+        """Jumlah putaran selebar capacity untuk `work` gambar"""
+        return max(1, math.ceil(work / self.capacity))
+
+    def _estimate_ms(self, lane, cost, work):
+        """Perkiraan latency total (tunggu + layanan); None sebelum ada pengukuran"""
+        if self._service_ms is None:
+            return None
+        excess = max(0, self._ahead_of(lane) + cost - self.capacity)
+        rounds = math.ceil(excess / self.capacity)
+        return (rounds + self._rounds(work)) * self._service_ms
+
+    def _can_start(self, lane, cost) -> bool:
+        """Slot cukup dan tidak ada waiter dengan prioritas sama/lebih tinggi yang mendahului"""
+        for other in LANES:
+            if self._waiting[other]:
+                return False
+            if other == lane:
+                break
+        return self._in_flight + cost <= self.capacity
+
+    def _grant_waiters(self):
+        """Beri slot ke waiter terdepan, lane prioritas lebih dulu"""
+        granted = False
+        for lane in LANES:
+            queue = self._waiting[lane]
+            while queue and self._in_flight + queue[0].cost <= self.capacity:
+                waiter = queue.popleft()
+                waiter.granted = True
+                self._in_flight += waiter.cost
+                granted = True
+            if queue:
+                break  # Lane prioritas masih antri; lane di bawahnya menunggu
+        if granted:
+            self._cond.notify_all()
+
+    def _reject(self, lane, reason, estimated_ms):
+        self._rejected[lane][reason] += 1
+        retry_after = max(1, min(30, math.ceil((estimated_ms or 1000) / 1000)))
+        raise AdmissionRejected(reason, retry_after=retry_after, estimated_ms=estimated_ms)
+
+    def _release(self, cost, elapsed_ms, work):
+        """Lepas slot; `work` = gambar yang benar-benar diproses (0/None = bukan sampel waktu layanan)"""
+        with self._cond:
+            self._in_flight -= cost
+            if work:
+                service_ms = elapsed_ms / self._rounds(work)
+                if self._service_ms is None:
+                    self._service_ms = service_ms
+                else:
+                    self._service_ms += self.ewma_alpha * (service_ms - self._service_ms)
+            self._grant_waiters()
+
+
+class _Admission:
+    """Slot yang sudah diberikan; dilepas saat keluar dari blok `with`"""
+
+    def __init__(self, controller, cost, work):
+        self._controller = controller
+        self._cost = cost
+        self._work = work
+        self._started = None
+
+    def set_work(self, images):
+        """Jumlah gambar yang benar-benar diproses di blok ini (0 = cache hit / input ditolak)"""
+        self._work = images
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Blok yang gagal bukan ukuran waktu layanan
+        work = self._work if exc_type is None else 0
+        self._controller._release(self._cost, (time.perf_counter() - self._started) * 1000.0, work)
+        return False
@@ -0,0 +1,153 @@
+"""
+Micro-batching scheduler untuk inferensi model
+- Mengumpulkan request konkuren menjadi satu batch
+- Batch dibatasi ukuran maksimum dan waktu tunggu maksimum (ms)
+- Setiap pemanggil menerima hasilnya sendiri lewat Future
+"""
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Scheduler batch dinamis in-process.
+
+    `batch_fn` menerima list item dan harus mengembalikan list hasil
+    dengan urutan yang sama. Thread worker mengambil item dari antrian,
+    menunggu maksimal `max_wait_ms` sejak item pertama masuk (atau sampai
+    `max_batch_size` terpenuhi), lalu memanggil `batch_fn` sekali.
+    Dengan `concurrency` > 1 beberapa batch berjalan bersamaan (mis. satu per
+    proses worker inference pool); pengumpulan batch tetap bergiliran.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=5.0, name="micro-batcher", concurrency=1):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size minimal 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0) / 1000.0
+        self.name = name
+        self.concurrency = max(1, concurrency)
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._collect_lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+
+        # Statistik
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._last_batch_size = 0
+        self._max_seen = 0
+        self._wait_total = 0.0
+        self._size_histogram = {}
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+
+    def submit(self, item) -> Future:
+        """Masukkan item ke antrian, kembalikan Future untuk hasilnya"""
+        future = Future()
+        with self._cond:
+            self._ensure_worker()
+            self._queue.append((item, future, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def predict(self, item, timeout=None):
+        """Submit lalu tunggu hasil (blocking)"""
+        return self.submit(item).result(timeout=timeout)
+
+    def queue_depth(self) -> int:
+        """Jumlah item yang sedang menunggu di antrian"""
+        return len(self._queue)
+
+    def stats(self) -> dict:
+        """Statistik antrian dan ukuran batch"""
+        with self._cond:
+            batches = self._batches
+            return {
+                "queue_depth": len(self._queue),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "concurrency": self.concurrency,
+                "batches_run": batches,
+                "items_processed": self._items,
+                "batch_errors": self._errors,
+                "last_batch_size": self._last_batch_size,
+                "max_batch_size_seen": self._max_seen,
+                "avg_batch_size": round(self._items / batches, 2) if batches else 0.0,
+                "avg_queue_wait_ms": round(self._wait_total / self._items * 1000.0, 3) if self._items else 0.0,
+                "batch_size_histogram": dict(sorted(self._size_histogram.items())),
+            }
+
+    # -------------------------------------------------------------------------
+    # Worker
+    # -------------------------------------------------------------------------
+
+    def _ensure_worker(self):
+        # Thread tidak ikut ter-fork (mis. gunicorn preload), jadi cek PID juga
+        if self._pid == os.getpid() and len(self._threads) == self.concurrency \
+                and all(thread.is_alive() for thread in self._threads):
+            return
+        if self._pid != os.getpid():
+            self._queue.clear()
+            self._threads = []
+        self._pid = os.getpid()
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.concurrency:
+            suffix = f"-{len(self._threads)}" if self.concurrency > 1 else ""
+            thread = threading.Thread(target=self._run, name=f"{self.name}{suffix}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _collect_batch(self):
+        """Tunggu item pertama, lalu kumpulkan sampai penuh atau deadline lewat"""
+        # Hanya satu thread yang mengumpulkan; thread lain menunggu giliran
+        with self._collect_lock, self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = self._queue[0][2] + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            size = min(len(self._queue), self.max_batch_size)
+            return [self._queue.popleft() for _ in range(size)]
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.monotonic()
+            items = [entry[0] for entry in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"batch_fn mengembalikan {len(results)} hasil untuk {len(items)} item"
+                    )
+            except Exception as e:
+                with self._cond:
+                    self._errors += 1
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+            with self._cond:
+                size = len(batch)
+                self._batches += 1
+                self._items += size
+                self._last_batch_size = size
+                self._max_seen = max(self._max_seen, size)
+                self._size_histogram[size] = self._size_histogram.get(size, 0) + 1
+                self._wait_total += sum(started - entry[2] for entry in batch)
@@ -0,0 +1,254 @@
+"""
+Cache hasil prediksi berbasis konten (content-addressed)
+- Key: hash byte gambar yang sudah didecode + revisi model
+- Tier 1: LRU in-memory dengan batas jumlah entry
+- Tier 2 (opsional): direktori di disk, dipakai bersama semua worker di host
+- Single-flight: request identik yang bersamaan hanya dihitung sekali, juga untuk
+  batch (get_or_compute_many) dan antara batch dengan request tunggal
+"""
+import os
+import copy
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def image_cache_key(image, revision: str) -> str:
+    """Hash isi piksel gambar (bukan byte file) digabung revisi model"""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    h = hashlib.blake2b(digest_size=20)
+    h.update(revision.encode('utf-8'))
+    h.update(f"{image.width}x{image.height}".encode('ascii'))
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+class PredictionCache:
+    """
+    Cache dua tier untuk hasil predict_skin_disease.
+
+    Entry disk disimpan di `<disk_dir>/<revision>/<key[:2]>/<key>.json`;
+    direktori revisi lain dihapus saat inisialisasi, sehingga cache otomatis
+    invalid jika REPO_NAME atau bobot model berubah.
+    """
+
+    def __init__(self, revision: str, max_entries=1024, disk_dir=None):
+        self.revision = revision
+        self.max_entries = max_entries
+        self.disk_dir = os.path.join(disk_dir, revision) if disk_dir else None
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._inflight = {}
+
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+
+        if disk_dir:
+            self._prune_stale_revisions(disk_dir)
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+
+    def get(self, key):
+        """Ambil hasil dari memory lalu disk, None jika tidak ada"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._hits += 1
+                return copy.deepcopy(self._memory[key])
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is not None:
+                self._disk_hits += 1
+                self._remember(key, value)
+                return copy.deepcopy(value)
+            self._misses += 1
+        return None
+
+    def set(self, key, value):
+        """Simpan hasil ke kedua tier"""
+        with self._lock:
+            self._remember(key, copy.deepcopy(value))
+        self._write_disk(key, value)
+
+    def get_or_compute(self, key, compute):
+        """
+        Kembalikan hasil cache, atau jalankan `compute()` sekali untuk key ini.
+        Pemanggil lain dengan key yang sama menunggu hasil yang sama. Jika
+        `compute` melempar exception, hasil tidak disimpan dan exception
+        diteruskan ke semua pemanggil.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self._coalesced += 1
+
+        if not owner:
+            return copy.deepcopy(future.result())
+
+        try:
+            value = compute()
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get_or_compute_many(self, keys, compute_many):
+        """
+        Versi batch get_or_compute. `keys` boleh berisi duplikat. `compute_many(missing)`
+        dipanggil sekali dengan key unik yang tidak ada di cache dan tidak sedang dihitung
+        pemanggil lain, dan mengembalikan dict key -> hasil; nilai berupa exception berarti
+        key itu gagal (tidak disimpan, diteruskan ke pemanggil lain yang menunggu).
+        Key yang sedang dihitung pemanggil lain ditunggu setelah compute_many selesai
+        (tidak pernah menunggu sambil memegang key sendiri, sehingga bebas deadlock).
+        Mengembalikan dict key -> hasil atau exception.
+        """
+        results = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            value = self.get(key)
+            if value is not None:
+                results[key] = value
+            else:
+                missing.append(key)
+
+        owned, waiting = {}, {}
+        with self._lock:
+            for key in missing:
+                future = self._inflight.get(key)
+                if future is None:
+                    future = Future()
+                    self._inflight[key] = future
+                    owned[key] = future
+                else:
+                    self._coalesced += 1
+                    waiting[key] = future
+
+        if owned:
+            try:
+                computed = compute_many(list(owned))
+                for key, future in owned.items():
+                    value = computed[key]
+                    if not isinstance(value, BaseException):
+                        self.set(key, value)
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+                    results[key] = value
+            except BaseException as e:
+                for future in owned.values():
+                    if not future.done():
+                        future.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    for key in owned:
+                        self._inflight.pop(key, None)
+
+        for key, future in waiting.items():
+            try:
+                results[key] = copy.deepcopy(future.result())
+            except Exception as e:
+                results[key] = e
+        return results
+
+    def clear(self):
+        """Kosongkan tier memory dan disk untuk revisi ini"""
+        with self._lock:
+            self._memory.clear()
+        if self.disk_dir:
+            shutil.rmtree(self.disk_dir, ignore_errors=True)
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def stats(self) -> dict:
+        """Counter hit/miss dan ukuran cache"""
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            return {
+                "revision": self.revision,
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_enabled": self.disk_dir is not None,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "evictions": self._evictions,
+                "hit_ratio": round((self._hits + self._disk_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+    # -------------------------------------------------------------------------
+    # Internal
+    # -------------------------------------------------------------------------
+
+    def _remember(self, key, value):
+        # Dipanggil dengan self._lock dipegang
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._evictions += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Tulis ke file sementara lalu rename agar worker lain tidak membaca file setengah jadi
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(value, f)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except (OSError, TypeError, ValueError) as e:
+            print(f"⚠️ Gagal menulis prediction cache ke disk: {e}")
+
+    def _prune_stale_revisions(self, root):
+        try:
+            entries = os.listdir(root)
+        except OSError:
+            return
+        for name in entries:
+            if name != self.revision:
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
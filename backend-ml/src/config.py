@@ -1,5 +1,7 @@
 import os
 
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
 # =============================================================================
 # MODEL CONFIGURATION
 # =============================================================================
@@ -18,14 +20,119 @@ CLASS_NAMES = [
     'vascular lesion'
 ]
 
+# Inference engine: "pytorch" (default) atau "onnxruntime"
+# Untuk onnxruntime, export dulu: python manage.py export-onnx
+INFERENCE_ENGINE = os.getenv('INFERENCE_ENGINE', 'pytorch').lower()
+ONNX_MODEL_PATH = os.getenv('ONNX_MODEL_PATH', os.path.join(BASE_DIR, 'models', 'model.onnx'))
+ONNX_INTRA_OP_THREADS = int(os.getenv('ONNX_INTRA_OP_THREADS', 0))  # 0 = default ONNX Runtime
+
+# Presisi model PyTorch: "fp32" (default) atau "int8" (dynamic quantization lapisan Linear,
+# ukuran model & latency CPU lebih kecil). Bandingkan dulu: python manage.py compare-precision
+MODEL_PRECISION = os.getenv('MODEL_PRECISION', 'fp32').lower()
+
+# Model dimuat di background thread agar server langsung bisa menjawab /health
+MODEL_LOAD_IN_BACKGROUND = os.getenv('MODEL_LOAD_IN_BACKGROUND', 'true').lower() in ('1', 'true', 'yes')
+
+# Bobot PyTorch dimuat lewat mmap file safetensors (read-only, shared antar proses
+# di satu node lewat page cache). File dibuat sekali dari checkpoint REPO_NAME.
+MODEL_WEIGHTS_MMAP = os.getenv('MODEL_WEIGHTS_MMAP', 'true').lower() in ('1', 'true', 'yes')
+MODEL_MMAP_PATH = os.getenv('MODEL_MMAP_PATH', os.path.join(BASE_DIR, 'models', 'model.mmap.safetensors'))
+
+# Preload-then-fork (gunicorn --preload, lihat gunicorn.conf.py): model dimuat di
+# master tanpa warm-up, lalu tiap worker hasil fork menjalankan warm-up sendiri
+MODEL_PRELOAD_FORK = os.getenv('MODEL_PRELOAD_FORK', 'false').lower() in ('1', 'true', 'yes')
+
+# =============================================================================
+# INFERENCE / BATCHING CONFIGURATION
+# =============================================================================
+# Request /predict yang datang bersamaan digabung menjadi satu forward pass
+BATCHING_ENABLED = os.getenv('BATCHING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 8))          # Maksimal gambar per forward pass
+BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', 5))  # Maksimal tunggu sejak item pertama
+
+# Inference pool: forward pass di proses worker terpisah (proses Flask hanya I/O).
+# Piksel dikirim lewat shared memory; INFERENCE_POOL_MAX_QUEUE = jumlah batch
+# yang boleh antri/berjalan sekaligus, selebihnya ditolak setelah QUEUE_TIMEOUT
+INFERENCE_POOL_ENABLED = os.getenv('INFERENCE_POOL_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+INFERENCE_POOL_SIZE = int(os.getenv('INFERENCE_POOL_SIZE', 2))            # Jumlah proses worker
+INFERENCE_POOL_THREADS = int(os.getenv('INFERENCE_POOL_THREADS', 0))      # Thread torch per worker (0 = CPU / SIZE)
+INFERENCE_POOL_MAX_QUEUE = int(os.getenv('INFERENCE_POOL_MAX_QUEUE', 2 * INFERENCE_POOL_SIZE))
+INFERENCE_POOL_QUEUE_TIMEOUT = float(os.getenv('INFERENCE_POOL_QUEUE_TIMEOUT', 10))  # Detik menunggu slot
+INFERENCE_POOL_TASK_TIMEOUT = float(os.getenv('INFERENCE_POOL_TASK_TIMEOUT', 60))    # Detik menunggu hasil
+
+# Warm-up: batch dummy yang dijalankan setelah model dimuat, sebelum status "ready"
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+WARMUP_BATCH_SIZES = [
+    int(size) for size in os.getenv('WARMUP_BATCH_SIZES', f"1,{BATCH_MAX_SIZE}").split(',') if size.strip()
+]
+WARMUP_ROUNDS = int(os.getenv('WARMUP_ROUNDS', 2))
+
+# Cache hasil prediksi (key = hash isi gambar + revisi model)
+PREDICTION_CACHE_ENABLED = os.getenv('PREDICTION_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 1024))  # Jumlah entry LRU in-memory
+PREDICTION_CACHE_DIR = os.getenv('PREDICTION_CACHE_DIR') or None      # Tier disk opsional, shared antar worker
+
+# Job prediksi asinkron (POST /predict/jobs): antrian berukuran tetap + thread worker.
+# Antrian penuh -> 503 + Retry-After; job selesai dihapus setelah JOBS_TTL_SECONDS
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 2))
+JOBS_MAX_QUEUE = int(os.getenv('JOBS_MAX_QUEUE', 32))
+JOBS_TTL_SECONDS = float(os.getenv('JOBS_TTL_SECONDS', 600))
+JOBS_MAX_STORED = int(os.getenv('JOBS_MAX_STORED', 1000))
+JOBS_SSE_HEARTBEAT_SECONDS = float(os.getenv('JOBS_SSE_HEARTBEAT_SECONDS', 15))
+
+# Admission control di depan inferensi (/predict, /predict/batch, job asinkron).
+# ADMISSION_CAPACITY = gambar yang boleh diproses bersamaan; request yang perkiraan
+# latency-nya melebihi budget lane langsung dijawab 503 + Retry-After.
+# User login (JWT) memakai lane prioritas dengan budget lebih besar dari anonim.
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+ADMISSION_CAPACITY = int(os.getenv(
+    'ADMISSION_CAPACITY', BATCH_MAX_SIZE * (INFERENCE_POOL_SIZE if INFERENCE_POOL_ENABLED else 1)
+))
+ADMISSION_BUDGET_MS = float(os.getenv('ADMISSION_BUDGET_MS', 5000))                 # Lane user login
+ADMISSION_ANONYMOUS_BUDGET_MS = float(os.getenv('ADMISSION_ANONYMOUS_BUDGET_MS', 2000))  # Lane anonim
+# Maksimal waktu menunggu di antrian admission; klien boleh memperpendek lewat
+# header X-Request-Deadline-Ms
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_MS', 10000))
+
+# =============================================================================
+# OBSERVABILITY CONFIGURATION
+# =============================================================================
+# Header Server-Timing (durasi per tahap) pada response /predict* dan /history*
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# Profiling per request (cProfile + torch.profiler), opt-in: header X-Profile-Token
+# yang cocok dengan PROFILE_ADMIN_TOKEN, atau sampling acak PROFILE_SAMPLE_RATE (0-1)
+PROFILE_ADMIN_TOKEN = os.getenv('PROFILE_ADMIN_TOKEN') or None
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILE_MAX_PROFILES = int(os.getenv('PROFILE_MAX_PROFILES', 50))  # Profil terbaru yang disimpan
+PROFILE_TORCH_TRACE = os.getenv('PROFILE_TORCH_TRACE', 'true').lower() in ('1', 'true', 'yes')
+
 # =============================================================================
 # FILE CONFIGURATION
 # =============================================================================
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
 DATABASE_PATH = os.path.join(BASE_DIR, 'skincheck.db')
 
+# Upload didecode di memori; file asli disimpan ke UPLOAD_FOLDER secara opsional
+# dan asinkron (di luar jalur request)
+PERSIST_UPLOADS = os.getenv('PERSIST_UPLOADS', 'true').lower() in ('1', 'true', 'yes')
+PERSIST_UPLOADS_ASYNC = os.getenv('PERSIST_UPLOADS_ASYNC', 'true').lower() in ('1', 'true', 'yes')
+
+# JPEG didecode langsung mendekati ukuran ini (draft mode) bila sisi terpendek
+# jauh lebih besar; harus >= resize prosesor (shortest_edge 256) dan ukuran
+# validasi kulit (200x200). 0 = selalu decode resolusi penuh
+DECODE_MIN_SIZE = int(os.getenv('DECODE_MIN_SIZE', 256))
+
+# Batas endpoint /predict/batch
+BATCH_PREDICT_MAX_FILES = int(os.getenv('BATCH_PREDICT_MAX_FILES', 30))
+BATCH_PREDICT_MAX_CONTENT_LENGTH = int(os.getenv('BATCH_PREDICT_MAX_CONTENT_LENGTH', 64 * 1024 * 1024))
+
+# Serialisasi respons JSON dengan orjson (src/json_provider.py) jika paketnya terpasang;
+# output sama dengan provider bawaan Flask, lebih cepat untuk payload besar seperti /history
+JSON_ORJSON_ENABLED = os.getenv('JSON_ORJSON_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
 # Pastikan folder uploads ada
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
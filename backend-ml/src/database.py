@@ -5,11 +5,22 @@ Database module untuk MySQL
 """
 import os
 import json
+import time
+import uuid
+import base64
+import struct
+import binascii
 import pymysql
+from pymysql.constants import ER
 from datetime import datetime
 from contextlib import contextmanager
 from dotenv import load_dotenv
 
+from .config import CLASS_NAMES, DISEASE_INFO, DEFAULT_DISEASE_INFO
+from .metrics import timed_db, observe_db, observe_write_behind_flush, register_gauge, DB_POOL_EVENTS
+from .db_pool import ConnectionPool
+from .write_behind import WriteBehindQueue
+
 load_dotenv()
 
 # MySQL Configuration
@@ -23,15 +34,85 @@ MYSQL_CONFIG = {
     'cursorclass': pymysql.cursors.DictCursor
 }
 
+# Connection pool (src/db_pool.py); MYSQL_POOL_ENABLED=false = koneksi baru per panggilan
+MYSQL_POOL_ENABLED = os.getenv('MYSQL_POOL_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+MYSQL_POOL_MIN_SIZE = int(os.getenv('MYSQL_POOL_MIN_SIZE', 1))
+MYSQL_POOL_MAX_SIZE = int(os.getenv('MYSQL_POOL_MAX_SIZE', 10))                       # Per proses worker
+MYSQL_POOL_MAX_LIFETIME = float(os.getenv('MYSQL_POOL_MAX_LIFETIME', 1800))            # Detik sebelum recycle
+MYSQL_POOL_CHECKOUT_TIMEOUT = float(os.getenv('MYSQL_POOL_CHECKOUT_TIMEOUT', 5))       # Detik menunggu koneksi
+MYSQL_POOL_PING_INTERVAL = float(os.getenv('MYSQL_POOL_PING_INTERVAL', 30))            # Ping jika idle >= N detik (0 = selalu)
+
+# Write-behind riwayat diagnosis (src/write_behind.py); /predict tidak menunggu INSERT + commit
+WRITE_BEHIND_ENABLED = os.getenv('WRITE_BEHIND_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+WRITE_BEHIND_SPOOL_DIR = os.getenv(
+    'WRITE_BEHIND_SPOOL_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'spool')
+)
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 100))               # Baris per multi-row INSERT
+WRITE_BEHIND_FLUSH_INTERVAL_MS = float(os.getenv('WRITE_BEHIND_FLUSH_INTERVAL_MS', 200))  # Umur maks record sebelum flush
+WRITE_BEHIND_MAX_PENDING = int(os.getenv('WRITE_BEHIND_MAX_PENDING', 100000))          # Lebih dari ini: simpan sinkron
+WRITE_BEHIND_FSYNC = os.getenv('WRITE_BEHIND_FSYNC', 'true').lower() in ('1', 'true', 'yes')
+
+# Export riwayat (GET /history/export): baris per query keyset; koneksi dipinjam per chunk
+HISTORY_EXPORT_CHUNK_ROWS = int(os.getenv('HISTORY_EXPORT_CHUNK_ROWS', 1000))
+
+def _connect():
+    """Buka satu koneksi MySQL baru (handshake TCP + autentikasi)"""
+    started = time.perf_counter()
+    conn = pymysql.connect(**MYSQL_CONFIG)
+    observe_db("connect", time.perf_counter() - started)
+    return conn
+
+db_pool = ConnectionPool(
+    _connect,
+    min_size=MYSQL_POOL_MIN_SIZE,
+    max_size=MYSQL_POOL_MAX_SIZE,
+    max_lifetime=MYSQL_POOL_MAX_LIFETIME,
+    checkout_timeout=MYSQL_POOL_CHECKOUT_TIMEOUT,
+    ping_interval=MYSQL_POOL_PING_INTERVAL,
+    on_event=lambda event: DB_POOL_EVENTS.labels(event=event).inc()
+) if MYSQL_POOL_ENABLED else None
+
+if db_pool is not None:
+    register_gauge(
+        "skincheck_db_pool_connections", "Koneksi MySQL di pool per status",
+        lambda: {(state,): db_pool.stats()[state] for state in ("idle", "in_use")},
+        labels=("state",)
+    )
+    register_gauge("skincheck_db_pool_waiting", "Thread yang menunggu koneksi dari pool",
+                   lambda: db_pool.stats()["waiting"])
+
 @contextmanager
 def get_db_connection():
-    """Context manager untuk MySQL connection"""
-    conn = pymysql.connect(**MYSQL_CONFIG)
-    try:
+    """Context manager untuk MySQL connection (dipinjam dari pool jika aktif)"""
+    if db_pool is None:
+        conn = _connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+    started = time.perf_counter()
+    with db_pool.connection() as conn:
+        observe_db("checkout", time.perf_counter() - started)
         yield conn
-    finally:
-        conn.close()
 
+def get_pool_stats():
+    """Statistik connection pool (None jika pool dimatikan)"""
+    return db_pool.stats() if db_pool is not None else None
+
+def _backfill_stats(cursor):
+    """
+    Isi user_diagnosis_stats dari riwayat. Idempoten: counter yang sudah ada ditimpa hasil
+    hitung ulang, jadi dua proses yang menjalankan init_db bersamaan tidak gagal duplicate key
+    """
+    cursor.execute('''
+        INSERT INTO user_diagnosis_stats (user_id, severity, diagnosis_count)
+        SELECT user_id, COALESCE(severity, ''), COUNT(*) FROM diagnosis_history
+        GROUP BY user_id, COALESCE(severity, '')
+        ON DUPLICATE KEY UPDATE diagnosis_count = VALUES(diagnosis_count)
+    ''')
+
+@timed_db
 def init_db():
     """Inisialisasi database - buat tabel jika belum ada"""
     try:
@@ -51,33 +132,102 @@ def init_db():
                 )
             ''')
             
-            # Create diagnosis_history table
+            # Create diagnosis_history table (skema compact: kelas, severity & top-3 sebagai
+            # kode; nama/deskripsi/rekomendasi di-resolve dari config saat baca)
+            if _table_exists(cursor, 'diagnosis_history'):
+                _expand_legacy_history(cursor)
+            else:
+                cursor.execute('''
+                    CREATE TABLE diagnosis_history (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        user_id INT NOT NULL,
+                        class_id SMALLINT UNSIGNED NOT NULL,
+                        confidence DECIMAL(5,4) NOT NULL,
+                        severity ENUM('low', 'medium', 'high', 'unknown'),
+                        top_3 VARBINARY(12),
+                        image_filename VARCHAR(255),
+                        write_id CHAR(32) NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        INDEX idx_history_user_created (user_id, created_at, id),
+                        UNIQUE KEY uq_history_write_id (write_id),
+                        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+                    )
+                ''')
+            
+            # Statistik per user & severity, diperbarui di transaksi yang sama dengan
+            # insert/delete riwayat ('' = severity NULL)
+            stats_existed = _table_exists(cursor, 'user_diagnosis_stats')
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS diagnosis_history (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
+                CREATE TABLE IF NOT EXISTS user_diagnosis_stats (
                     user_id INT NOT NULL,
-                    condition_name VARCHAR(100) NOT NULL,
-                    confidence DECIMAL(5,4) NOT NULL,
-                    severity VARCHAR(20),
-                    description TEXT,
-                    recommendation TEXT,
-                    image_filename VARCHAR(255),
-                    top_3_predictions JSON,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    severity VARCHAR(20) NOT NULL DEFAULT '',
+                    diagnosis_count INT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_id, severity),
                     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
                 )
             ''')
+            if not stats_existed:
+                # Upgrade dari versi tanpa tabel statistik: isi dari riwayat yang sudah ada
+                _backfill_stats(cursor)
+            
+            # Tabel lama (dibuat sebelum index ada): tambahkan online tanpa mengunci tulis
+            _ensure_index(cursor, 'diagnosis_history', 'idx_history_user_created', '''
+                ALTER TABLE diagnosis_history
+                ADD INDEX idx_history_user_created (user_id, created_at, id),
+                ALGORITHM=INPLACE, LOCK=NONE
+            ''')
+            # Kunci idempoten write-behind (pending id): replay spool tidak menggandakan riwayat
+            if 'write_id' not in _table_columns(cursor, 'diagnosis_history'):
+                _alter_online(cursor, 'ALTER TABLE diagnosis_history ADD COLUMN write_id CHAR(32) NULL')
+            _ensure_index(cursor, 'diagnosis_history', 'uq_history_write_id', '''
+                ALTER TABLE diagnosis_history
+                ADD UNIQUE INDEX uq_history_write_id (write_id),
+                ALGORITHM=INPLACE, LOCK=NONE
+            ''')
             
+            _refresh_history_layout(cursor)
             conn.commit()
             print("✅ MySQL Database initialized successfully")
     except Exception as e:
         print(f"❌ Database initialization error: {e}")
         raise e
 
+def _table_exists(cursor, table):
+    cursor.execute('''
+        SELECT 1 FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = %s LIMIT 1
+    ''', (table,))
+    return cursor.fetchone() is not None
+
+def _table_columns(cursor, table):
+    cursor.execute('''
+        SELECT column_name AS name FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s
+    ''', (table,))
+    return {row['name'].lower() for row in cursor.fetchall()}
+
+def _alter_online(cursor, ddl):
+    """ALTER TABLE tanpa mengunci tulis: INSTANT (metadata saja) jika didukung, jika tidak INPLACE"""
+    try:
+        cursor.execute(f"{ddl}, ALGORITHM=INSTANT")
+    except pymysql.MySQLError:
+        cursor.execute(f"{ddl}, ALGORITHM=INPLACE, LOCK=NONE")
+
+def _ensure_index(cursor, table, index_name, ddl):
+    """Jalankan `ddl` jika index belum ada di tabel"""
+    cursor.execute('''
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1
+    ''', (table, index_name))
+    if cursor.fetchone() is None:
+        cursor.execute(ddl)
+        print(f"✅ Index {index_name} dibuat pada {table}")
+
 # =============================================================================
 # USER MANAGEMENT
 # =============================================================================
 
+@timed_db
 def create_user(username, email, password_hash, full_name=None):
     """Buat user baru"""
     with get_db_connection() as conn:
@@ -96,6 +246,7 @@ def create_user(username, email, password_hash, full_name=None):
                 raise ValueError("Email sudah terdaftar")
             raise e
 
+@timed_db
 def get_user_by_email(email):
     """Cari user berdasarkan email"""
     with get_db_connection() as conn:
@@ -103,6 +254,7 @@ def get_user_by_email(email):
         cursor.execute('SELECT * FROM users WHERE email = %s', (email,))
         return cursor.fetchone()
 
+@timed_db
 def get_user_by_username(username):
     """Cari user berdasarkan username"""
     with get_db_connection() as conn:
@@ -110,6 +262,7 @@ def get_user_by_username(username):
         cursor.execute('SELECT * FROM users WHERE username = %s', (username,))
         return cursor.fetchone()
 
+@timed_db
 def get_user_by_id(user_id):
     """Cari user berdasarkan ID"""
     with get_db_connection() as conn:
@@ -121,75 +274,470 @@ def get_user_by_id(user_id):
 # DIAGNOSIS HISTORY
 # =============================================================================
 
-def save_diagnosis(user_id, condition, confidence, severity=None, description=None, 
-                   recommendation=None, image_filename=None, top_3_predictions=None):
-    """Simpan hasil diagnosis ke database"""
+SEVERITY_LEVELS = ('low', 'medium', 'high', 'unknown')  # Nilai ENUM kolom severity
+
+# Tabel kelas di memori (indeks = class_id = indeks CLASS_NAMES). Nama, deskripsi dan
+# rekomendasi tidak disimpan per baris; di-resolve dari config saat baca
+CLASS_INFO = tuple(
+    {"condition": name, **DISEASE_INFO.get(name, DEFAULT_DISEASE_INFO)} for name in CLASS_NAMES
+)
+CLASS_IDS = {name: class_id for class_id, name in enumerate(CLASS_NAMES)}
+
+def _split_recommendations(recommendation):
+    """Teks rekomendasi -> maksimal 5 kalimat bermakna"""
+    if not recommendation:
+        return []
+    return [r.strip() for r in recommendation.split('.') if r.strip() and len(r.strip()) > 10][:5]
+
+# Bagian respons yang hanya bergantung pada kelas, dihitung sekali:
+# (condition, description, recommendation, recommendations). Tuple tidak bisa
+# diubah sehingga aman dipakai bersama semua baris; diserialisasi sebagai array JSON
+_CLASS_RENDER = tuple(
+    (info['condition'], info['description'], info['recommendation'],
+     tuple(_split_recommendations(info['recommendation'])))
+    for info in CLASS_INFO
+)
+
+# top_3: maksimal 3 pasangan (class_id, skor dalam 0,1%) little-endian uint16 = 12 byte
+_TOP_3_PAIR = struct.Struct('<HH')
+
+# Layout tabel diagnosis_history. None = belum diketahui (init_db gagal, mis. MySQL belum
+# siap saat start): dideteksi saat INSERT riwayat pertama, bukan diasumsikan compact
+HISTORY_LAYOUT_COMPACT = "compact"
+HISTORY_LAYOUT_MIGRATING = "migrating"  # Tabel lama + kolom compact; kolom lama masih ditulis
+_history_layout = None
+
+def _pack_top_3(top_3):
+    """[{label, confidence (persen)}] -> bytes; label di luar CLASS_NAMES dilewati"""
+    packed = b''
+    for item in (top_3 or [])[:3]:
+        class_id = CLASS_IDS.get(item.get('label'))
+        if class_id is not None:
+            score = round(float(item.get('confidence') or 0) * 10)
+            packed += _TOP_3_PAIR.pack(class_id, max(0, min(score, 1000)))
+    return packed or None
+
+_TOP_3_FULL = struct.Struct('<HHHHHH')
+_CLASS_LABELS = tuple(CLASS_NAMES)
+
+def _unpack_top_3(packed):
+    """bytes -> [{label, confidence (persen)}]; kasus umum (3 pasangan) tanpa loop"""
+    if not packed:
+        return []
+    if len(packed) == _TOP_3_FULL.size:
+        id_1, score_1, id_2, score_2, id_3, score_3 = _TOP_3_FULL.unpack(packed)
+        try:
+            return [
+                {"label": _CLASS_LABELS[id_1], "confidence": score_1 / 10},
+                {"label": _CLASS_LABELS[id_2], "confidence": score_2 / 10},
+                {"label": _CLASS_LABELS[id_3], "confidence": score_3 / 10},
+            ]
+        except IndexError:
+            pass  # class id dari model lama dengan kelas lebih banyak
+    return [
+        {"label": _CLASS_LABELS[class_id] if class_id < len(_CLASS_LABELS) else str(class_id),
+         "confidence": score / 10}
+        for class_id, score in _TOP_3_PAIR.iter_unpack(bytes(packed))
+    ]
+
+def _normalize_severity(severity):
+    return severity if severity in SEVERITY_LEVELS else None
+
+def _class_id(diagnosis):
+    """class_index hasil prediksi, atau dicari dari nama kelas"""
+    class_id = diagnosis.get('class_index')
+    if class_id is None:
+        class_id = CLASS_IDS.get(diagnosis.get('condition'))
+    if class_id is None or not 0 <= class_id < len(CLASS_NAMES):
+        raise ValueError(f"Kelas diagnosis tidak dikenal: {diagnosis.get('condition')!r}")
+    return class_id
+
+def _history_insert(rows, with_created_at=False):
+    """
+    (sql, params) INSERT diagnosis_history untuk `rows` (dict dengan key argumen
+    save_diagnosis) sesuai layout tabel. Selama migrasi, kolom lama yang NOT NULL /
+    dibaca kode lama (condition_name, severity teks) ikut diisi.
+    """
+    legacy = _history_layout == HISTORY_LAYOUT_MIGRATING
+    columns = ['user_id', 'class_id', 'confidence', 'severity', 'top_3', 'image_filename', 'write_id']
+    if legacy:
+        columns += ['condition_name', 'severity_level']
+    placeholders = ['%s'] * len(columns)
+    if with_created_at:
+        columns.append('created_at')
+        placeholders.append('FROM_UNIXTIME(%s)')
+    params = []
+    for d in rows:
+        class_id = _class_id(d)
+        severity = _normalize_severity(d.get('severity'))
+        params.extend((d['user_id'], class_id, d['confidence'], severity,
+                       _pack_top_3(d.get('top_3_predictions')), d.get('image_filename'), d.get('write_id')))
+        if legacy:
+            params.extend((CLASS_NAMES[class_id], severity))
+        if with_created_at:
+            params.append(d['created_at'])
+    row_sql = '(' + ', '.join(placeholders) + ')'
+    sql = (f"INSERT INTO diagnosis_history ({', '.join(columns)}) VALUES "
+           + ', '.join([row_sql] * len(rows)))
+    return sql, params
+
+def _insert_history(cursor, rows, with_created_at=False):
+    """
+    Jalankan INSERT riwayat sesuai layout tabel (dideteksi dulu jika belum diketahui).
+    Layout yang basi dideteksi ulang lalu INSERT diulang sekali: kolom lama baru saja
+    dihapus (kontrak migrasi, BAD_FIELD_ERROR) atau tabel ternyata masih lama dan
+    condition_name wajib diisi (NO_DEFAULT_FOR_FIELD).
+    """
+    if _history_layout is None:
+        _refresh_history_layout(cursor)
+    try:
+        cursor.execute(*_history_insert(rows, with_created_at))
+    except pymysql.MySQLError as e:
+        if e.args[0] not in (ER.BAD_FIELD_ERROR, ER.NO_DEFAULT_FOR_FIELD):
+            raise
+        _refresh_history_layout(cursor)
+        cursor.execute(*_history_insert(rows, with_created_at))
+
+def _add_stats(cursor, rows):
+    """
+    Tambah counter user_diagnosis_stats untuk `rows` (dict dengan user_id & severity)
+    dalam transaksi pemanggil. Satu upsert multi-baris, urut per key agar urutan
+    lock sama di semua transaksi.
+    """
+    counts = {}
+    for r in rows:
+        key = (r['user_id'], _normalize_severity(r.get('severity')) or '')
+        counts[key] = counts.get(key, 0) + 1
+    if not counts:
+        return
+    params = []
+    for (user_id, severity), count in sorted(counts.items()):
+        params.extend((user_id, severity, count))
+    cursor.execute(
+        "INSERT INTO user_diagnosis_stats (user_id, severity, diagnosis_count) VALUES "
+        + ", ".join(["(%s, %s, %s)"] * len(counts))
+        + " ON DUPLICATE KEY UPDATE diagnosis_count = diagnosis_count + VALUES(diagnosis_count)",
+        params
+    )
+
+@timed_db
+def save_diagnosis(user_id, condition, confidence, severity=None, description=None,
+                   recommendation=None, image_filename=None, top_3_predictions=None, class_index=None):
+    """
+    Simpan hasil diagnosis ke database (`class_index` dari hasil prediksi; jika kosong dicari dari nama).
+    `description` dan `recommendation` diterima demi kompatibilitas argumen posisional tapi
+    diabaikan: keduanya dirender dari CLASS_INFO saat dibaca.
+    """
+    diagnosis = {'user_id': user_id, 'condition': condition, 'confidence': confidence,
+                 'severity': severity, 'image_filename': image_filename,
+                 'top_3_predictions': top_3_predictions, 'class_index': class_index}
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        top_3_json = json.dumps(top_3_predictions) if top_3_predictions else None
-        cursor.execute('''
-            INSERT INTO diagnosis_history 
-            (user_id, condition_name, confidence, severity, description, recommendation, 
-             image_filename, top_3_predictions)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        ''', (user_id, condition, confidence, severity, description, recommendation,
-              image_filename, top_3_json))
-        conn.commit()
-        return cursor.lastrowid
+        try:
+            _insert_history(cursor, [diagnosis])
+            diagnosis_id = cursor.lastrowid
+            _add_stats(cursor, [diagnosis])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return diagnosis_id
 
-def get_user_history(user_id, page=1, per_page=10):
-    """Ambil riwayat diagnosis user dengan pagination"""
+@timed_db
+def save_diagnoses_bulk(diagnoses):
+    """
+    Simpan banyak hasil diagnosis dalam satu transaksi.
+    `diagnoses` adalah list dict dengan key yang sama seperti argumen save_diagnosis.
+    Mengembalikan list ID dengan urutan yang sama.
+    """
+    if not diagnoses:
+        return []
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        ids = []
+        try:
+            # Satu INSERT per baris: ID multi-row INSERT tidak dijamin berurutan
+            # (innodb_autoinc_lock_mode=2)
+            for d in diagnoses:
+                _insert_history(cursor, [d])
+                ids.append(cursor.lastrowid)
+            _add_stats(cursor, diagnoses)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return ids
+
+@timed_db
+def insert_diagnoses_multirow(records):
+    """
+    Simpan record write-behind dengan satu multi-row INSERT dalam satu transaksi.
+    `created_at` (epoch detik) diambil dari record sehingga waktu riwayat tetap
+    waktu prediksi, bukan waktu flush.
+    Idempoten per `write_id` (pending id): record yang sudah tersimpan (replay spool,
+    retry setelah balasan COMMIT hilang) dilewati, statistik hanya untuk baris baru.
+    Balapan dengan penulis lain memicu duplicate key (IntegrityError, error permanen)
+    sehingga queue mengulang per record dan record itu terlihat sudah tersimpan.
+    Mengembalikan jumlah baris yang benar-benar disimpan.
+    """
+    if not records:
+        return 0
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            fresh = _unsaved_records(cursor, records)
+            if fresh:
+                _insert_history(cursor, fresh, with_created_at=True)
+                _add_stats(cursor, fresh)
+            conn.commit()
+            return len(fresh)
+        except Exception:
+            conn.rollback()
+            raise
+
+def _unsaved_records(cursor, records):
+    """Record yang write_id-nya belum ada di diagnosis_history (juga tanpa duplikat dalam batch)"""
+    write_ids = sorted({r['write_id'] for r in records if r.get('write_id')})
+    saved = set()
+    if write_ids:
+        cursor.execute(
+            'SELECT write_id FROM diagnosis_history WHERE write_id IN (%s)' % ', '.join(['%s'] * len(write_ids)),
+            write_ids
+        )
+        saved = {row['write_id'] for row in cursor.fetchall()}
+    fresh = []
+    for r in records:
+        write_id = r.get('write_id')
+        if write_id:
+            if write_id in saved:
+                continue
+            saved.add(write_id)
+        fresh.append(r)
+    return fresh
+
+def _is_permanent_write_error(exc):
+    """Error data (mis. user sudah dihapus -> FK gagal, kelas tak dikenal) tidak sembuh dengan retry"""
+    return isinstance(exc, (pymysql.err.IntegrityError, pymysql.err.DataError, ValueError))
+
+diagnosis_writer = WriteBehindQueue(
+    insert_diagnoses_multirow,
+    WRITE_BEHIND_SPOOL_DIR,
+    batch_size=WRITE_BEHIND_BATCH_SIZE,
+    flush_interval=WRITE_BEHIND_FLUSH_INTERVAL_MS / 1000.0,
+    max_pending=WRITE_BEHIND_MAX_PENDING,
+    fsync=WRITE_BEHIND_FSYNC,
+    is_permanent=_is_permanent_write_error,
+    on_flush=observe_write_behind_flush,
+    name="diagnosis"
+) if WRITE_BEHIND_ENABLED else None
+
+if diagnosis_writer is not None:
+    register_gauge("skincheck_write_behind_pending", "Diagnosis di spool yang belum tersimpan ke MySQL",
+                   lambda: diagnosis_writer.stats()["pending"])
+    register_gauge("skincheck_write_behind_oldest_seconds", "Umur diagnosis tertua yang belum tersimpan",
+                   lambda: diagnosis_writer.stats()["oldest_pending_seconds"])
+
+def queue_diagnosis(user_id, condition, confidence, severity=None, description=None,
+                    recommendation=None, image_filename=None, top_3_predictions=None, class_index=None):
+    """
+    Catat diagnosis ke write-behind queue; kembalikan pending id (ID database belum ada).
+    `description`/`recommendation` diabaikan seperti pada save_diagnosis.
+    Pending id disimpan sebagai `write_id` (kunci idempoten) dan bisa di-resolve
+    lewat get_diagnosis_by_write_id setelah flush.
+    Melempar WriteBehindFull jika antrian penuh (pemanggil menyimpan sinkron).
+    """
+    write_id = uuid.uuid4().hex
+    record = {
+        "user_id": user_id,
+        "condition": condition,
+        "confidence": confidence,
+        "severity": severity,
+        "image_filename": image_filename,
+        "top_3_predictions": top_3_predictions,
+        "class_index": class_index,
+        "created_at": time.time(),
+        "write_id": write_id,
+    }
+    record["class_index"] = _class_id(record)  # Kelas tak dikenal ditolak sekarang, bukan saat flush
+    return diagnosis_writer.submit(record, pending_id=write_id)
+
+def is_diagnosis_pending(write_id):
+    """True jika diagnosis masih di write-behind queue proses ini"""
+    return diagnosis_writer is not None and diagnosis_writer.is_pending(write_id)
+
+def get_write_behind_stats():
+    """Statistik write-behind queue (None jika dimatikan)"""
+    return diagnosis_writer.stats() if diagnosis_writer is not None else None
+
+def _history_item(row):
+    """
+    Baris diagnosis_history -> dict respons API, dipakai semua pembaca riwayat.
+    Baris compact (class_id terisi) memakai render per kelas yang sudah dihitung
+    (_CLASS_RENDER): per baris hanya top-3 dan created_at yang didekode. Baris lama
+    yang belum dimigrasi dibaca dari kolom teks/JSON-nya.
+    """
+    class_id = row.get('class_id')
+    if class_id is not None and class_id < len(_CLASS_RENDER):
+        condition, description, recommendation, recommendations = _CLASS_RENDER[class_id]
+        top_3 = _unpack_top_3(row['top_3'])
+    else:
+        condition, description, recommendation, recommendations, top_3 = _legacy_render(row)
+    created_at = row['created_at']
+    if created_at is not None and not isinstance(created_at, str):
+        created_at = created_at.isoformat()
+    return {
+        'id': row['id'],
+        'user_id': row['user_id'],
+        'class_id': class_id,
+        'condition': condition,
+        'confidence': row['confidence'],
+        'severity': row['severity'],
+        'description': description,
+        'recommendation': recommendation,
+        'recommendations': recommendations,
+        'image_filename': row['image_filename'],
+        'top_3_predictions': top_3,
+        'created_at': created_at,
+    }
+
+def _legacy_render(row):
+    """Bagian teks baris lama (kolom condition_name/description/recommendation/top_3_predictions)"""
+    class_id = row.get('class_id')
+    if class_id is not None:
+        # class_id di luar CLASS_NAMES (model lama dengan kelas lebih banyak)
+        return str(class_id), DEFAULT_DISEASE_INFO['description'], DEFAULT_DISEASE_INFO['recommendation'], (), \
+            _unpack_top_3(row.get('top_3'))
+    recommendation = row.get('recommendation')
+    top_3 = row.get('top_3_predictions') or []
+    if isinstance(top_3, (str, bytes)):
+        try:
+            top_3 = json.loads(top_3)
+        except ValueError:
+            top_3 = []
+    return (row.get('condition_name') or '', row.get('description'), recommendation,
+            _split_recommendations(recommendation), top_3)
+
+def encode_history_cursor(created_at, diagnosis_id):
+    """Cursor opaque untuk posisi (created_at, id) di riwayat"""
+    raw = f"{created_at}|{diagnosis_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+def decode_history_cursor(cursor):
+    """Kebalikan encode_history_cursor; ValueError jika cursor rusak"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        created_at, _, diagnosis_id = raw.rpartition('|')
+        datetime.fromisoformat(created_at)  # Validasi format
+        return created_at, int(diagnosis_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise ValueError("Cursor riwayat tidak valid")
+
+HISTORY_MAX_PER_PAGE = 100
+
+@timed_db
+def get_user_history(user_id, page=1, per_page=10, after=None, include_total=None):
+    """
+    Ambil riwayat diagnosis user (terbaru dulu).
+    - `after` (cursor dari `next_cursor`): keyset pagination, baris sesudah cursor
+      tanpa OFFSET; biaya sama untuk halaman berapa pun
+    - Tanpa `after`: pagination `page`/`per_page` (OFFSET) seperti sebelumnya
+    `include_total` (default: hanya mode page) menambahkan `total` & `pages` (dari user_diagnosis_stats).
+    Kedua mode memakai index (user_id, created_at, id) dan mengembalikan `next_cursor`.
+    ValueError jika cursor rusak, `page` < 1 atau `per_page` di luar 1..HISTORY_MAX_PER_PAGE.
+    """
+    if not 1 <= per_page <= HISTORY_MAX_PER_PAGE:
+        raise ValueError(f"per_page harus antara 1 dan {HISTORY_MAX_PER_PAGE}")
+    if page < 1:
+        raise ValueError("page harus >= 1")
+    if include_total is None:
+        include_total = after is None
+    position = decode_history_cursor(after) if after else None
+    
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        # Count total
-        cursor.execute('SELECT COUNT(*) as total FROM diagnosis_history WHERE user_id = %s', (user_id,))
-        total = cursor.fetchone()['total']
-        
-        # Calculate pagination
-        offset = (page - 1) * per_page
-        total_pages = (total + per_page - 1) // per_page if total > 0 else 1
+        total = None
+        if include_total:
+            total = _count_from_stats(cursor, user_id)
         
-        # Fetch data
-        cursor.execute('''
-            SELECT * FROM diagnosis_history WHERE user_id = %s
-            ORDER BY created_at DESC LIMIT %s OFFSET %s
-        ''', (user_id, per_page, offset))
+        # Ambil satu baris ekstra untuk mengetahui apakah masih ada halaman berikutnya
+        if position:
+            created_at, last_id = position
+            # `created_at <= %s` memberi batas range index (user_id, created_at);
+            # OR hanya menyaring baris dengan created_at sama
+            cursor.execute('''
+                SELECT * FROM diagnosis_history
+                WHERE user_id = %s AND created_at <= %s AND (created_at < %s OR id < %s)
+                ORDER BY created_at DESC, id DESC LIMIT %s
+            ''', (user_id, created_at, created_at, last_id, per_page + 1))
+        else:
+            offset = (page - 1) * per_page
+            cursor.execute('''
+                SELECT * FROM diagnosis_history WHERE user_id = %s
+                ORDER BY created_at DESC, id DESC LIMIT %s OFFSET %s
+            ''', (user_id, per_page + 1, offset))
         
         rows = cursor.fetchall()
-        data = []
-        for row in rows:
-            item = dict(row)
-            # Rename condition_name to condition for frontend compatibility
-            item['condition'] = item.pop('condition_name', '')
-            # Parse top_3_predictions
-            if item.get('top_3_predictions'):
-                try:
-                    if isinstance(item['top_3_predictions'], str):
-                        item['top_3_predictions'] = json.loads(item['top_3_predictions'])
-                except:
-                    item['top_3_predictions'] = []
-            else:
-                item['top_3_predictions'] = []
-            # Split recommendation into list
-            if item.get('recommendation'):
-                item['recommendations'] = [r.strip() for r in item['recommendation'].split('.') 
-                                          if r.strip() and len(r.strip()) > 10][:5]
-            else:
-                item['recommendations'] = []
-            # Format created_at
-            if item.get('created_at'):
-                item['created_at'] = item['created_at'].isoformat() if hasattr(item['created_at'], 'isoformat') else str(item['created_at'])
-            data.append(item)
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        next_cursor = encode_history_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None
         
-        return {
+        data = [_history_item(row) for row in rows]
+        
+        result = {
             'data': data, 
-            'page': page, 
             'per_page': per_page, 
-            'total': total, 
-            'pages': total_pages
+            'next_cursor': next_cursor,
+            'has_more': has_more
         }
+        if position is None:
+            result['page'] = page
+        if total is not None:
+            result['total'] = total
+            result['pages'] = (total + per_page - 1) // per_page if total > 0 else 1
+        return result
+
+def iter_user_history(user_id, chunk_rows=None):
+    """
+    Seluruh riwayat user (terbaru dulu) sebagai generator list item per chunk, untuk export.
+    - Tiap chunk satu query keyset (user_id, created_at, id) lewat cursor unbuffered
+      (SSDictCursor): baris didekode saat dibaca dari socket, bukan ditampung dulu
+    - Koneksi dikembalikan ke pool sebelum chunk di-yield, sehingga klien yang lambat
+      tidak menahan koneksi; memori O(chunk_rows) berapa pun panjang riwayatnya
+    Bukan satu snapshot: baris yang dihapus selama export bisa tidak ikut.
+    """
+    chunk_rows = max(1, chunk_rows or HISTORY_EXPORT_CHUNK_ROWS)
+    position = None
+    while True:
+        started = time.perf_counter()
+        chunk = []
+        with get_db_connection() as conn:
+            cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+            try:
+                if position:
+                    created_at, last_id = position
+                    cursor.execute('''
+                        SELECT * FROM diagnosis_history
+                        WHERE user_id = %s AND created_at <= %s AND (created_at < %s OR id < %s)
+                        ORDER BY created_at DESC, id DESC LIMIT %s
+                    ''', (user_id, created_at, created_at, last_id, chunk_rows))
+                else:
+                    cursor.execute('''
+                        SELECT * FROM diagnosis_history WHERE user_id = %s
+                        ORDER BY created_at DESC, id DESC LIMIT %s
+                    ''', (user_id, chunk_rows))
+                for row in cursor:
+                    position = (row['created_at'], row['id'])
+                    chunk.append(_history_item(row))
+            finally:
+                cursor.close()
+        observe_db("iter_user_history", time.perf_counter() - started)
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_rows:
+            return
 
+@timed_db
 def get_diagnosis_by_id(diagnosis_id, user_id=None):
     """Ambil satu diagnosis berdasarkan ID"""
     with get_db_connection() as conn:
@@ -200,61 +748,290 @@ def get_diagnosis_by_id(diagnosis_id, user_id=None):
         else:
             cursor.execute('SELECT * FROM diagnosis_history WHERE id = %s', (diagnosis_id,))
         row = cursor.fetchone()
-        if row:
-            item = dict(row)
-            item['condition'] = item.pop('condition_name', '')
-            if item.get('top_3_predictions'):
-                try:
-                    if isinstance(item['top_3_predictions'], str):
-                        item['top_3_predictions'] = json.loads(item['top_3_predictions'])
-                except:
-                    item['top_3_predictions'] = []
-            if item.get('recommendation'):
-                item['recommendations'] = [r.strip() for r in item['recommendation'].split('.') 
-                                          if r.strip() and len(r.strip()) > 10][:5]
-            else:
-                item['recommendations'] = []
-            if item.get('created_at'):
-                item['created_at'] = item['created_at'].isoformat() if hasattr(item['created_at'], 'isoformat') else str(item['created_at'])
-            return item
-        return None
+        return _history_item(row) if row else None
+
+@timed_db
+def get_diagnosis_by_write_id(write_id, user_id):
+    """Diagnosis yang disimpan lewat write-behind, dicari dengan pending id-nya (None jika belum tersimpan)"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM diagnosis_history WHERE write_id = %s AND user_id = %s',
+                       (write_id, user_id))
+        row = cursor.fetchone()
+        return _history_item(row) if row else None
 
+@timed_db
 def delete_diagnosis(diagnosis_id, user_id):
     """Hapus diagnosis (hanya pemilik yang bisa hapus)"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM diagnosis_history WHERE id = %s AND user_id = %s', 
-                      (diagnosis_id, user_id))
-        conn.commit()
-        return cursor.rowcount > 0
+        try:
+            # Severity baris dibutuhkan untuk counter; FOR UPDATE agar delete paralel
+            # pada baris yang sama tidak mengurangi counter dua kali
+            cursor.execute('SELECT severity FROM diagnosis_history WHERE id = %s AND user_id = %s FOR UPDATE',
+                           (diagnosis_id, user_id))
+            row = cursor.fetchone()
+            if row is None:
+                conn.rollback()
+                return False
+            cursor.execute('DELETE FROM diagnosis_history WHERE id = %s AND user_id = %s',
+                           (diagnosis_id, user_id))
+            cursor.execute('''
+                UPDATE user_diagnosis_stats SET diagnosis_count = diagnosis_count - 1
+                WHERE user_id = %s AND severity = %s
+            ''', (user_id, row['severity'] or ''))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return True
 
+@timed_db
 def delete_all_user_history(user_id):
     """Hapus semua riwayat user"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM diagnosis_history WHERE user_id = %s', (user_id,))
-        conn.commit()
-        return cursor.rowcount
+        try:
+            cursor.execute('DELETE FROM diagnosis_history WHERE user_id = %s', (user_id,))
+            deleted = cursor.rowcount
+            cursor.execute('DELETE FROM user_diagnosis_stats WHERE user_id = %s', (user_id,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return deleted
+
+def _count_from_stats(cursor, user_id):
+    """Total diagnosis user dari counter (maksimal satu baris per severity)"""
+    cursor.execute('SELECT SUM(diagnosis_count) as total FROM user_diagnosis_stats WHERE user_id = %s',
+                   (user_id,))
+    row = cursor.fetchone()
+    return int(row['total'] or 0) if row else 0
 
+@timed_db
 def get_user_statistics(user_id):
-    """Ambil statistik diagnosis user"""
+    """Ambil statistik diagnosis user (dari user_diagnosis_stats, tanpa scan riwayat)"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        
-        cursor.execute('SELECT COUNT(*) as total FROM diagnosis_history WHERE user_id = %s', (user_id,))
-        total = cursor.fetchone()['total']
-        
         cursor.execute('''
-            SELECT severity, COUNT(*) as count FROM diagnosis_history 
-            WHERE user_id = %s GROUP BY severity
+            SELECT severity, diagnosis_count FROM user_diagnosis_stats
+            WHERE user_id = %s AND diagnosis_count > 0
         ''', (user_id,))
-        severity_dist = {row['severity'] or 'unknown': row['count'] for row in cursor.fetchall()}
+        severity_dist = {row['severity'] or 'unknown': int(row['diagnosis_count']) for row in cursor.fetchall()}
         
         return {
-            'total_diagnoses': total, 
+            'total_diagnoses': sum(severity_dist.values()), 
             'severity_distribution': severity_dist
         }
 
+def _stats_from_history(cursor, user_ids=None):
+    """Hitung ulang {(user_id, severity): jumlah} dari diagnosis_history"""
+    where, params = '', ()
+    if user_ids:
+        where = 'WHERE user_id IN (' + ', '.join(['%s'] * len(user_ids)) + ')'
+        params = tuple(user_ids)
+    cursor.execute(f'''
+        SELECT user_id, COALESCE(severity, '') as severity, COUNT(*) as diagnosis_count
+        FROM diagnosis_history {where} GROUP BY user_id, COALESCE(severity, '')
+    ''', params)
+    return {(row['user_id'], row['severity']): int(row['diagnosis_count']) for row in cursor.fetchall()}
+
+@timed_db
+def verify_user_statistics(user_ids=None):
+    """
+    Bandingkan user_diagnosis_stats dengan hitungan ulang dari riwayat.
+    Mengembalikan list selisih {user_id, severity, expected, actual} (kosong = konsisten).
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        expected = _stats_from_history(cursor, user_ids)
+        where, params = '', ()
+        if user_ids:
+            where = 'WHERE user_id IN (' + ', '.join(['%s'] * len(user_ids)) + ')'
+            params = tuple(user_ids)
+        cursor.execute(f'SELECT user_id, severity, diagnosis_count FROM user_diagnosis_stats {where}', params)
+        actual = {(row['user_id'], row['severity']): int(row['diagnosis_count']) for row in cursor.fetchall()}
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        if expected.get(key, 0) != actual.get(key, 0):
+            mismatches.append({'user_id': key[0], 'severity': key[1] or None,
+                               'expected': expected.get(key, 0), 'actual': actual.get(key, 0)})
+    return mismatches
+
+@timed_db
+def rebuild_user_statistics(user_ids=None, batch_size=500):
+    """
+    Hitung ulang user_diagnosis_stats dari diagnosis_history. Per batch user dalam
+    transaksi sendiri sehingga tidak mengunci seluruh tabel sekaligus.
+    Mengembalikan jumlah user yang diproses.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        if user_ids is None:
+            cursor.execute('''
+                SELECT user_id FROM diagnosis_history
+                UNION SELECT user_id FROM user_diagnosis_stats
+            ''')
+            user_ids = sorted(row['user_id'] for row in cursor.fetchall())
+            conn.commit()
+        for start in range(0, len(user_ids), batch_size):
+            batch = list(user_ids[start:start + batch_size])
+            placeholders = ', '.join(['%s'] * len(batch))
+            try:
+                cursor.execute(f'DELETE FROM user_diagnosis_stats WHERE user_id IN ({placeholders})', batch)
+                cursor.execute(f'''
+                    INSERT INTO user_diagnosis_stats (user_id, severity, diagnosis_count)
+                    SELECT user_id, COALESCE(severity, ''), COUNT(*) FROM diagnosis_history
+                    WHERE user_id IN ({placeholders}) GROUP BY user_id, COALESCE(severity, '')
+                ''', batch)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return len(user_ids)
+
+# =============================================================================
+# MIGRASI SKEMA COMPACT DIAGNOSIS_HISTORY
+# =============================================================================
+# Online, tiga tahap (expand -> backfill -> contract), tanpa mengunci tulis:
+# 1. init_db menambah kolom class_id / severity_level / top_3 (INSTANT/INPLACE);
+#    baris baru langsung ditulis ke kolom compact + kolom lama yang wajib
+# 2. `manage.py migrate-history` mengisi kolom compact baris lama per batch id
+# 3. `manage.py migrate-history --contract` menghapus kolom lama dan mengganti
+#    severity teks dengan ENUM; worker yang masih berlayout lama menyesuaikan
+#    sendiri saat INSERT pertama gagal (lihat _insert_history)
+
+def _expand_legacy_history(cursor):
+    """Tahap 1: tambahkan kolom compact ke tabel lama (no-op untuk tabel compact / sudah di-expand)"""
+    columns = _table_columns(cursor, 'diagnosis_history')
+    if 'class_id' in columns:
+        return
+    _alter_online(cursor, '''
+        ALTER TABLE diagnosis_history
+        ADD COLUMN class_id SMALLINT UNSIGNED NULL,
+        ADD COLUMN severity_level ENUM('low', 'medium', 'high', 'unknown') NULL,
+        ADD COLUMN top_3 VARBINARY(12) NULL
+    ''')
+    print("✅ Kolom compact ditambahkan ke diagnosis_history; jalankan `python manage.py migrate-history`")
+
+def _refresh_history_layout(cursor):
+    global _history_layout
+    columns = _table_columns(cursor, 'diagnosis_history')
+    _history_layout = HISTORY_LAYOUT_MIGRATING if 'condition_name' in columns else HISTORY_LAYOUT_COMPACT
+    return _history_layout
+
+def _legacy_row_values(row):
+    """Kolom compact untuk satu baris lama; None jika nama kelas tidak ada di CLASS_NAMES"""
+    class_id = CLASS_IDS.get(row['condition_name'])
+    if class_id is None:
+        return None
+    top_3 = row.get('top_3_predictions')
+    if isinstance(top_3, (str, bytes)):
+        try:
+            top_3 = json.loads(top_3)
+        except ValueError:
+            top_3 = None
+    return class_id, _normalize_severity(row.get('severity')), _pack_top_3(top_3)
+
+@timed_db
+def migrate_legacy_history(batch_size=1000, pause=0.0, on_batch=None):
+    """
+    Tahap 2: isi class_id / severity_level / top_3 untuk baris lama, per batch id
+    (transaksi pendek; `pause` detik antar batch untuk membatasi beban replikasi).
+    Baris dengan nama kelas di luar CLASS_NAMES dilewati dan dilaporkan.
+    `on_batch(hasil_sementara)` opsional dipanggil setelah setiap batch.
+    """
+    result = {'migrated': 0, 'unmapped': 0, 'unmapped_ids': []}
+    last_id = 0
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        if _refresh_history_layout(cursor) != HISTORY_LAYOUT_MIGRATING:
+            conn.commit()
+            return result
+        while True:
+            cursor.execute('''
+                SELECT id, condition_name, severity, top_3_predictions FROM diagnosis_history
+                WHERE id > %s AND class_id IS NULL ORDER BY id LIMIT %s
+            ''', (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                conn.commit()
+                return result
+            last_id = rows[-1]['id']
+            updates = []
+            for row in rows:
+                values = _legacy_row_values(row)
+                if values is None:
+                    result['unmapped'] += 1
+                    if len(result['unmapped_ids']) < 100:
+                        result['unmapped_ids'].append(row['id'])
+                    continue
+                updates.append((*values, row['id']))
+            try:
+                if updates:
+                    # `class_id IS NULL`: baris yang sudah ditulis worker tidak ditimpa
+                    cursor.executemany('''
+                        UPDATE diagnosis_history SET class_id = %s, severity_level = %s, top_3 = %s
+                        WHERE id = %s AND class_id IS NULL
+                    ''', updates)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            result['migrated'] += len(updates)
+            if on_batch is not None:
+                on_batch(result)
+            if pause:
+                time.sleep(pause)
+
+@timed_db
+def get_history_migration_status():
+    """Layout tabel diagnosis_history dan jumlah baris lama yang belum dimigrasi"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        layout = _refresh_history_layout(cursor)
+        pending = 0
+        if layout == HISTORY_LAYOUT_MIGRATING:
+            cursor.execute('SELECT COUNT(*) AS pending FROM diagnosis_history WHERE class_id IS NULL')
+            pending = cursor.fetchone()['pending']
+        conn.commit()
+        return {'layout': layout, 'pending_rows': pending}
+
+@timed_db
+def contract_history_schema():
+    """
+    Tahap 3: hapus kolom lama (condition_name, description, recommendation,
+    top_3_predictions, severity teks) dan jadikan severity_level kolom `severity`.
+    Menolak jika masih ada baris tanpa class_id. Statistik user dihitung ulang
+    karena severity di luar SEVERITY_LEVELS menjadi NULL.
+    """
+    status = get_history_migration_status()
+    if status['layout'] != HISTORY_LAYOUT_MIGRATING:
+        return False
+    if status['pending_rows']:
+        raise RuntimeError(
+            f"{status['pending_rows']} baris belum dimigrasi (jalankan migrate-history dulu; "
+            "baris dengan kelas tak dikenal harus dihapus atau diperbaiki manual)"
+        )
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        # Online (INPLACE, LOCK=NONE): tabel dibangun ulang tanpa kolom lama sambil tetap menerima tulis
+        cursor.execute('''
+            ALTER TABLE diagnosis_history
+            DROP COLUMN condition_name,
+            DROP COLUMN description,
+            DROP COLUMN recommendation,
+            DROP COLUMN top_3_predictions,
+            DROP COLUMN severity,
+            RENAME COLUMN severity_level TO severity,
+            MODIFY class_id SMALLINT UNSIGNED NOT NULL,
+            ALGORITHM=INPLACE, LOCK=NONE
+        ''')
+        _refresh_history_layout(cursor)
+        conn.commit()
+    rebuild_user_statistics()
+    return True
+
 # Initialize database on import
 try:
     init_db()
@@ -0,0 +1,228 @@
+"""
+Connection pool thread-safe untuk PyMySQL
+- Koneksi dipakai ulang antar request sehingga query tidak membayar handshake
+  TCP + autentikasi MySQL setiap kali
+- Ukuran min/max; checkout menunggu maksimal `checkout_timeout` saat pool penuh
+- Health check (ping) saat checkout untuk koneksi yang idle lebih dari `ping_interval`
+  detik (0 = setiap checkout, menambah satu round trip ke setiap query)
+- Koneksi berumur lebih dari `max_lifetime` ditutup dan diganti (recycle)
+- Transaksi yang belum di-commit di-rollback saat koneksi dikembalikan, sehingga
+  peminjam berikutnya tidak mewarisi snapshot/lock lama; koneksi yang error dibuang
+- Aman terhadap fork (gunicorn preload): proses anak tidak memakai socket milik master
+"""
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from pymysql.constants import SERVER_STATUS
+
+EVENT_CREATED = "created"
+EVENT_RECYCLED = "recycled"          # Melewati max_lifetime
+EVENT_PING_FAILED = "ping_failed"    # Mati saat checkout, diganti koneksi baru
+EVENT_DISCARDED = "discarded"        # Error saat dipakai / rollback gagal
+EVENT_TIMEOUT = "timeout"            # Checkout melewati checkout_timeout
+EVENTS = (EVENT_CREATED, EVENT_RECYCLED, EVENT_PING_FAILED, EVENT_DISCARDED, EVENT_TIMEOUT)
+
+
+class PoolTimeout(RuntimeError):
+    """Tidak ada koneksi yang bisa dipinjam dalam checkout_timeout"""
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """
+    Pemakaian:
+        pool = ConnectionPool(lambda: pymysql.connect(**config), max_size=10)
+        with pool.connection() as conn:
+            ...
+
+    `connect()` membuat satu koneksi baru. `on_event(nama)` (opsional) dipanggil
+    untuk setiap kejadian di EVENTS, mis. untuk counter Prometheus.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, max_lifetime=1800.0,
+                 checkout_timeout=5.0, ping_interval=30.0, on_event=None):
+        self._connect = connect
+        self.max_size = max(1, max_size)
+        self.min_size = max(0, min(min_size, self.max_size))
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        self.ping_interval = ping_interval
+        self._on_event = on_event
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # LIFO: koneksi terhangat dipakai lebih dulu
+        self._size = 0        # Koneksi terbuka (idle + dipinjam + sedang dibuat)
+        self._waiting = 0
+        self._pid = os.getpid()
+        self._counts = {event: 0 for event in EVENTS}
+        self._checkouts = 0
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+
+    @contextmanager
+    def connection(self):
+        """Pinjam koneksi; dikembalikan ke pool (atau dibuang jika error) setelah blok"""
+        pooled = self._checkout()
+        try:
+            yield pooled.conn
+        except BaseException:
+            self._checkin(pooled, failed=True)
+            raise
+        self._checkin(pooled, failed=False)
+
+    def prefill(self):
+        """Buka koneksi sampai min_size (mis. di worker setelah fork, sebelum menerima request)"""
+        self._check_fork()
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            pooled = self._create()
+            self._checkin(pooled, failed=False)
+
+    def close_idle(self):
+        """Tutup semua koneksi idle (mis. di master sebelum fork); koneksi yang sedang dipinjam tidak terpengaruh"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            self._close_quietly(pooled)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiting": self._waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts": self._checkouts,
+                **self._counts,
+            }
+
+    # -------------------------------------------------------------------------
+    # Internal
+    # -------------------------------------------------------------------------
+
+    def _check_fork(self):
+        """Setelah fork, lupakan koneksi warisan master tanpa menutupnya (socket dipakai bersama)"""
+        if self._pid != os.getpid():
+            with self._cond:
+                if self._pid != os.getpid():
+                    self._idle = deque()
+                    self._size = 0
+                    self._waiting = 0
+                    self._pid = os.getpid()
+
+    def _event(self, event):
+        with self._cond:  # RLock: aman dipanggil saat lock sudah dipegang
+            self._counts[event] += 1
+        if self._on_event is not None:
+            self._on_event(event)
+
+    def _checkout(self) -> _PooledConnection:
+        self._check_fork()
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1  # Slot dipesan; koneksi dibuat di luar lock
+                    pooled = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._event(EVENT_TIMEOUT)
+                    raise PoolTimeout(
+                        f"Tidak ada koneksi database bebas dalam {self.checkout_timeout:g} detik "
+                        f"(max_size={self.max_size})"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._checkouts += 1
+
+        if pooled is None:
+            return self._create()
+        return self._validate(pooled)
+
+    def _validate(self, pooled) -> _PooledConnection:
+        """Koneksi idle dari pool: recycle jika terlalu tua, ping jika lama idle"""
+        now = time.monotonic()
+        if self.max_lifetime and now - pooled.created_at >= self.max_lifetime:
+            self._close_quietly(pooled)
+            self._event(EVENT_RECYCLED)
+            return self._create()
+        if now - pooled.last_used >= self.ping_interval:
+            try:
+                pooled.conn.ping(reconnect=False)
+            except Exception:
+                self._close_quietly(pooled)
+                self._event(EVENT_PING_FAILED)
+                return self._create()
+        return pooled
+
+    def _create(self) -> _PooledConnection:
+        """Buat koneksi untuk slot yang sudah dipesan; slot dilepas jika gagal"""
+        try:
+            pooled = _PooledConnection(self._connect())
+        except BaseException:
+            self._release_slot()
+            raise
+        self._event(EVENT_CREATED)
+        return pooled
+
+    def _checkin(self, pooled, failed):
+        if self._pid != os.getpid():
+            return  # Dipinjam sebelum fork; milik proses lain
+        healthy = True
+        try:
+            # Akhiri transaksi yang masih terbuka (SELECT pun membuka transaksi
+            # saat autocommit mati); tanpa round trip jika tidak ada transaksi
+            if failed or pooled.conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                pooled.conn.rollback()
+        except Exception:
+            healthy = False
+
+        expired = self.max_lifetime and time.monotonic() - pooled.created_at >= self.max_lifetime
+        if not healthy or expired:
+            self._close_quietly(pooled)
+            self._event(EVENT_DISCARDED if not healthy else EVENT_RECYCLED)
+            self._release_slot()
+            return
+        pooled.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close_quietly(pooled):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,208 @@
+"""
+Inference engine untuk model klasifikasi
+- PyTorchEngine: eager PyTorch + HF Transformers (default)
+- OnnxRuntimeEngine: model hasil export ONNX, dijalankan dengan ONNX Runtime
+- Mode presisi fp32 / int8 (dynamic quantization lapisan Linear) untuk PyTorch
+- Export checkpoint REPO_NAME ke ONNX (dynamic batch axis) + parity check logits
+"""
+import os
+import hashlib
+import itertools
+import numpy as np
+import torch
+
+ENGINE_PYTORCH = "pytorch"
+ENGINE_ONNXRUNTIME = "onnxruntime"
+ENGINES = (ENGINE_PYTORCH, ENGINE_ONNXRUNTIME)
+
+PRECISION_FP32 = "fp32"
+PRECISION_INT8 = "int8"
+PRECISIONS = (PRECISION_FP32, PRECISION_INT8)
+
+
+class InferenceEngine:
+    """
+    Antarmuka engine: `forward` menerima pixel_values (N, C, H, W) float32
+    dan mengembalikan logits (N, num_classes) sebagai torch.Tensor.
+    """
+    name = None
+    framework = None
+
+    def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        raise NotImplementedError
+
+    def fingerprint(self) -> bytes:
+        """Byte yang mewakili bobot engine (untuk revisi model / cache key)"""
+        raise NotImplementedError
+
+    def info(self) -> dict:
+        return {"engine": self.name, "framework": self.framework}
+
+
+def quantize_dynamic_int8(model):
+    """Dynamic int8 quantization untuk semua lapisan Linear (bobot int8, aktivasi dikuantisasi saat runtime)"""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def model_size_mb(model) -> float:
+    """
+    Ukuran bobot model dalam MB dari metadata tensor (numel x ukuran elemen): tanpa
+    serialisasi dan tanpa membaca isi bobot (halaman bobot mmap tidak ikut dimuat).
+    Lapisan Linear int8 menyimpan bobot di packed params, bukan parameter; dihitung
+    per lapisan dari hasil unpack-nya.
+    """
+    from torch.ao.nn.quantized.modules.linear import LinearPackedParams
+
+    total = sum(t.numel() * t.element_size() for t in itertools.chain(model.parameters(), model.buffers()))
+    for module in model.modules():
+        if isinstance(module, LinearPackedParams):
+            for tensor in module._weight_bias():
+                if tensor is not None:
+                    total += tensor.numel() * tensor.element_size()
+    return round(total / (1024 * 1024), 2)
+
+
+class PyTorchEngine(InferenceEngine):
+    name = ENGINE_PYTORCH
+    framework = "PyTorch + HuggingFace Transformers"
+
+    def __init__(self, model, precision=PRECISION_FP32):
+        if precision not in PRECISIONS:
+            raise ValueError(f"MODEL_PRECISION tidak dikenal: {precision} (pilihan: {', '.join(PRECISIONS)})")
+        # Sidik jari dihitung dari bobot fp32 asli, sebelum kuantisasi
+        self._fingerprint = self._state_dict_digest(model)
+        self.precision = precision
+        self.model = quantize_dynamic_int8(model) if precision == PRECISION_INT8 else model
+        self._size_mb = None
+
+    def forward(self, pixel_values):
+        with torch.inference_mode():
+            return self.model(pixel_values=pixel_values).logits
+
+    def fingerprint(self):
+        return self._fingerprint + self.precision.encode('utf-8')
+
+    @property
+    def size_mb(self):
+        """Dihitung saat pertama diminta (/model-info), bukan saat engine dibuat"""
+        if self._size_mb is None:
+            self._size_mb = model_size_mb(self.model)
+        return self._size_mb
+
+    def info(self):
+        return {**super().info(), "precision": self.precision, "model_size_mb": self.size_mb}
+
+    @staticmethod
+    def _state_dict_digest(model):
+        h = hashlib.blake2b(digest_size=16)
+        for name, tensor in model.state_dict().items():
+            h.update(name.encode('utf-8'))
+            h.update(tensor.detach().cpu().contiguous().numpy())
+        return h.digest()
+
+
+class OnnxRuntimeEngine(InferenceEngine):
+    name = ENGINE_ONNXRUNTIME
+    framework = "ONNX Runtime"
+
+    def __init__(self, onnx_path, intra_op_threads=0):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError(
+                "INFERENCE_ENGINE=onnxruntime membutuhkan paket 'onnxruntime' (pip install onnxruntime)"
+            ) from e
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(
+                f"Model ONNX tidak ditemukan di {onnx_path}. Jalankan: python manage.py export-onnx"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.onnx_path = onnx_path
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_name = self.session.get_outputs()[0].name
+
+    def forward(self, pixel_values):
+        inputs = {self.input_name: np.ascontiguousarray(pixel_values.numpy(), dtype=np.float32)}
+        logits = self.session.run([self.output_name], inputs)[0]
+        return torch.from_numpy(logits)
+
+    def fingerprint(self):
+        h = hashlib.blake2b(digest_size=16)
+        with open(self.onnx_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        return h.digest()
+
+    def info(self):
+        return {
+            **super().info(),
+            "precision": PRECISION_FP32,
+            "model_size_mb": round(os.path.getsize(self.onnx_path) / (1024 * 1024), 2),
+            "onnx_path": self.onnx_path
+        }
+
+
+# =============================================================================
+# EXPORT & PARITY CHECK
+# =============================================================================
+
+class _LogitsOnly(torch.nn.Module):
+    """Bungkus model HF agar output ONNX hanya tensor logits"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model(pixel_values=pixel_values).logits
+
+
+def export_onnx(model, output_path, input_size=(224, 224), opset=17):
+    """Export model PyTorch ke ONNX dengan batch axis dinamis"""
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    model.eval()
+    dummy = torch.zeros((1, 3, *input_size), dtype=torch.float32)
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model),
+            (dummy,),
+            output_path,
+            input_names=["pixel_values"],
+            output_names=["logits"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=opset,
+            dynamo=False
+        )
+    return output_path
+
+
+def check_parity(model, onnx_path, input_size=(224, 224), batch_sizes=(1, 4), atol=1e-3, seed=0):
+    """
+    Bandingkan logits PyTorch vs ONNX Runtime pada input acak yang sama.
+    Mengembalikan laporan per batch size dan status `passed`.
+    """
+    reference = PyTorchEngine(model)
+    candidate = OnnxRuntimeEngine(onnx_path)
+    generator = torch.Generator().manual_seed(seed)
+
+    report = {"onnx_path": onnx_path, "atol": atol, "batches": [], "passed": True}
+    for batch_size in batch_sizes:
+        pixel_values = torch.randn((batch_size, 3, *input_size), generator=generator)
+        expected = reference.forward(pixel_values)
+        actual = candidate.forward(pixel_values)
+        max_abs_diff = (expected - actual).abs().max().item()
+        argmax_match = bool((expected.argmax(-1) == actual.argmax(-1)).all().item())
+        passed = max_abs_diff <= atol and argmax_match
+        report["batches"].append({
+            "batch_size": batch_size,
+            "max_abs_diff": max_abs_diff,
+            "argmax_match": argmax_match,
+            "passed": passed
+        })
+        report["passed"] = report["passed"] and passed
+    return report
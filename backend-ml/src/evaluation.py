@@ -0,0 +1,112 @@
+"""
+Evaluasi akurasi & latency engine pada folder gambar berlabel
+- Struktur folder: <root>/<nama kelas>/<gambar>.jpg|png (nama kelas sesuai CLASS_NAMES)
+- Dipakai untuk membandingkan presisi fp32 vs int8 sebelum mengganti MODEL_PRECISION
+"""
+import os
+import time
+import statistics
+import torch
+from PIL import Image
+
+from .config import CLASS_NAMES, ALLOWED_EXTENSIONS
+
+
+def load_labeled_folder(root):
+    """Kembalikan list (path, class_index) dari subfolder bernama kelas"""
+    samples = []
+    unknown = []
+    for class_name in sorted(os.listdir(root)):
+        class_dir = os.path.join(root, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        if class_name not in CLASS_NAMES:
+            unknown.append(class_name)
+            continue
+        label = CLASS_NAMES.index(class_name)
+        for filename in sorted(os.listdir(class_dir)):
+            if filename.rsplit('.', 1)[-1].lower() in ALLOWED_EXTENSIONS:
+                samples.append((os.path.join(class_dir, filename), label))
+    if unknown:
+        print(f"⚠️ Folder dilewati (bukan nama kelas): {', '.join(unknown)}")
+    return samples
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def evaluate_engine(engine, pixel_values, labels, batch_size=8, repeats=3):
+    """
+    Jalankan engine pada tensor input yang sudah dipra-proses.
+    Mengembalikan akurasi top-1/top-3, latency per gambar (batch 1) dan throughput batch.
+    """
+    predictions = []
+    top3_hits = 0
+    for start in range(0, len(pixel_values), batch_size):
+        logits = engine.forward(pixel_values[start:start + batch_size])
+        top3 = logits.topk(min(3, logits.shape[-1]), dim=-1).indices
+        predictions.extend(top3[:, 0].tolist())
+        for row, label in zip(top3.tolist(), labels[start:start + batch_size]):
+            top3_hits += label in row
+
+    # Latency batch size 1 (request tunggal)
+    single_ms = []
+    for _ in range(repeats):
+        for i in range(len(pixel_values)):
+            started = time.perf_counter()
+            engine.forward(pixel_values[i:i + 1])
+            single_ms.append((time.perf_counter() - started) * 1000)
+
+    # Throughput dengan batch penuh
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for start in range(0, len(pixel_values), batch_size):
+            engine.forward(pixel_values[start:start + batch_size])
+    batch_seconds = time.perf_counter() - started
+
+    total = len(labels)
+    correct = sum(1 for p, label in zip(predictions, labels) if p == label)
+    return {
+        **engine.info(),
+        "images": total,
+        "top1_accuracy": round(correct / total, 4) if total else 0.0,
+        "top3_accuracy": round(top3_hits / total, 4) if total else 0.0,
+        "latency_ms_p50": round(statistics.median(single_ms), 2),
+        "latency_ms_p95": round(_percentile(single_ms, 95), 2),
+        "throughput_img_per_s": round(total * repeats / batch_seconds, 2) if batch_seconds else 0.0,
+        "batch_size": batch_size,
+        "predictions": predictions
+    }
+
+
+def compare_precisions(model, processor, image_root, batch_size=8, repeats=3):
+    """Laporan fp32 vs int8 (dynamic quantization) pada folder gambar berlabel"""
+    from .engines import PyTorchEngine, PRECISION_FP32, PRECISION_INT8
+
+    samples = load_labeled_folder(image_root)
+    if not samples:
+        raise ValueError(f"Tidak ada gambar berlabel di {image_root}")
+    images = [Image.open(path).convert("RGB") for path, _ in samples]
+    labels = [label for _, label in samples]
+    pixel_values = processor(images, return_tensors="pt")["pixel_values"]
+
+    torch.manual_seed(0)
+    fp32 = evaluate_engine(PyTorchEngine(model, PRECISION_FP32), pixel_values, labels, batch_size, repeats)
+    int8 = evaluate_engine(PyTorchEngine(model, PRECISION_INT8), pixel_values, labels, batch_size, repeats)
+
+    agreement = sum(1 for a, b in zip(fp32.pop("predictions"), int8.pop("predictions")) if a == b)
+    return {
+        "image_root": image_root,
+        "fp32": fp32,
+        "int8": int8,
+        "comparison": {
+            "top1_agreement": round(agreement / len(labels), 4),
+            "top1_accuracy_delta": round(int8["top1_accuracy"] - fp32["top1_accuracy"], 4),
+            "latency_p50_speedup": round(fp32["latency_ms_p50"] / int8["latency_ms_p50"], 2) if int8["latency_ms_p50"] else None,
+            "throughput_speedup": round(int8["throughput_img_per_s"] / fp32["throughput_img_per_s"], 2) if fp32["throughput_img_per_s"] else None,
+            "model_size_ratio": round(int8["model_size_mb"] / fp32["model_size_mb"], 3) if fp32["model_size_mb"] else None
+        }
+    }
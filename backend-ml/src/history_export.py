@@ -0,0 +1,78 @@
+"""
+Export riwayat diagnosis (GET /history/export) sebagai NDJSON atau CSV
+- Input: iterator chunk item riwayat (list dict dari database.iter_user_history)
+- Output: iterator bytes per chunk untuk response Flask yang di-stream (chunked);
+  hanya satu chunk yang ada di memori, berapa pun panjang riwayatnya
+- Opsional gzip streaming (zlib, sync flush per chunk agar klien menerima data
+  bertahap)
+"""
+import io
+import csv
+import zlib
+
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+EXPORT_FORMATS = {
+    FORMAT_NDJSON: "application/x-ndjson; charset=utf-8",
+    FORMAT_CSV: "text/csv; charset=utf-8",
+}
+
+# Kolom export; deskripsi/rekomendasi berasal dari config (bukan data user) sehingga tidak diikutkan
+EXPORT_FIELDS = ("id", "created_at", "condition", "class_id", "confidence", "severity", "image_filename")
+_CSV_HEADER = EXPORT_FIELDS + tuple(
+    f"top_{rank}_{field}" for rank in (1, 2, 3) for field in ("label", "confidence")
+)
+
+
+def export_row(item) -> dict:
+    """Item riwayat -> dict export (confidence sebagai angka, bukan Decimal)"""
+    row = {field: item.get(field) for field in EXPORT_FIELDS}
+    if row["confidence"] is not None:
+        row["confidence"] = float(row["confidence"])
+    row["top_3_predictions"] = item.get("top_3_predictions") or []
+    return row
+
+
+def _ndjson_chunk(items, dumps) -> bytes:
+    return "".join(dumps(export_row(item)) + "\n" for item in items).encode("utf-8")
+
+
+def _csv_chunk(items, header) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(_CSV_HEADER)
+    for item in items:
+        row = export_row(item)
+        values = [row[field] for field in EXPORT_FIELDS]
+        top_3 = row["top_3_predictions"][:3]
+        for rank in range(3):
+            prediction = top_3[rank] if rank < len(top_3) else {}
+            values.extend((prediction.get("label"), prediction.get("confidence")))
+        writer.writerow(values)
+    return buffer.getvalue().encode("utf-8")
+
+
+def encode_export(chunks, fmt, dumps, compress=False):
+    """
+    Generator bytes export untuk `chunks` (iterable list item riwayat).
+    `dumps(obj) -> str` dipakai untuk baris NDJSON (mis. app.json.dumps).
+    Chunk berikutnya baru diminta setelah chunk sebelumnya di-yield.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format export tidak dikenal: {fmt}")
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    first = True
+    for items in chunks:
+        body = _ndjson_chunk(items, dumps) if fmt == FORMAT_NDJSON else _csv_chunk(items, header=first)
+        first = False
+        if compressor is not None:
+            body = compressor.compress(body) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if body:
+            yield body
+    # Riwayat kosong: CSV tetap berisi header
+    tail = _csv_chunk([], header=True) if fmt == FORMAT_CSV and first else b""
+    if compressor is not None:
+        tail = compressor.compress(tail) + compressor.flush()
+    if tail:
+        yield tail
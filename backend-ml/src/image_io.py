@@ -0,0 +1,162 @@
+"""
+Pipeline upload gambar in-memory
+- Upload dibaca langsung dari request stream ke memori (tanpa file sementara)
+- Format divalidasi dari header byte (magic number) sebelum decode
+- Gambar didecode sekali lalu dipakai untuk validasi kulit dan pra-pemrosesan
+- JPEG besar didecode langsung di resolusi rendah (draft mode, scaling di domain DCT)
+  dan orientasi EXIF diterapkan sekali saat decode
+- Penyimpanan file asli opsional dan asinkron, di luar jalur request
+"""
+import io
+import os
+import queue
+import atexit
+import threading
+from PIL import Image, ImageOps
+
+from .config import DECODE_MIN_SIZE
+
+# Magic number format yang didukung
+_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+)
+SUPPORTED_FORMATS = ('jpeg', 'png')
+
+
+class InvalidImageError(ValueError):
+    """Upload bukan gambar yang valid / format tidak didukung"""
+
+    def __init__(self, message, unsupported_format=False):
+        super().__init__(message)
+        self.unsupported_format = unsupported_format
+
+
+def sniff_image_format(header: bytes):
+    """Tebak format dari byte awal file; None jika bukan JPEG/PNG"""
+    for signature, fmt in _SIGNATURES:
+        if header.startswith(signature):
+            return fmt
+    return None
+
+
+def decode_image_bytes(data: bytes, min_size=DECODE_MIN_SIZE) -> Image.Image:
+    """
+    Validasi header lalu decode gambar dari memori.
+    JPEG didecode dengan skala DCT 1/2, 1/4, atau 1/8 sehingga sisi terpendek
+    tetap >= `min_size` (0/None = decode penuh). Orientasi EXIF sudah diterapkan.
+    Melempar InvalidImageError jika format tidak didukung atau file rusak.
+    """
+    fmt = sniff_image_format(data[:16])
+    if fmt is None:
+        # Bedakan "gambar format lain" dengan "bukan gambar sama sekali"
+        try:
+            with Image.open(io.BytesIO(data)) as probe:
+                probe_format = probe.format
+        except Exception:
+            raise InvalidImageError("File bukan gambar yang valid atau rusak")
+        raise InvalidImageError(f"Format {probe_format} tidak didukung", unsupported_format=True)
+
+    try:
+        image = Image.open(io.BytesIO(data), formats=[fmt.upper()])
+        if fmt == 'jpeg' and min_size:
+            # Harus sebelum load(): decoder langsung menghasilkan gambar kecil
+            image.draft('RGB', (min_size, min_size))
+        image.load()
+        ImageOps.exif_transpose(image, in_place=True)
+    except Exception:
+        raise InvalidImageError("File bukan gambar yang valid atau rusak")
+    return image
+
+
+def load_image_file(path, min_size=DECODE_MIN_SIZE) -> Image.Image:
+    """decode_image_bytes untuk file di disk"""
+    with open(path, 'rb') as f:
+        return decode_image_bytes(f.read(), min_size=min_size)
+
+
+# =============================================================================
+# ASYNC PERSISTENCE
+# =============================================================================
+
+class UploadPersister:
+    """
+    Tulis file upload ke disk di background thread.
+    Jika antrian penuh, penulisan dilakukan sinkron (backpressure, tidak ada file yang hilang).
+    """
+
+    def __init__(self, folder, max_pending=256, asynchronous=True):
+        self.folder = folder
+        self.asynchronous = asynchronous
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._written = 0
+        self._failed = 0
+
+    def save(self, filename, data: bytes):
+        """Jadwalkan penyimpanan `data` sebagai `<folder>/<filename>`"""
+        if not self.asynchronous:
+            self._write(filename, data)
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((filename, data))
+        except queue.Full:
+            self._write(filename, data)
+
+    def flush(self, timeout=None):
+        """Tunggu semua penulisan yang tertunda selesai"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        threading.Thread(target=lambda: (self._queue.join(), done.set()), daemon=True).start()
+        done.wait(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "asynchronous": self.asynchronous,
+            "pending": self._queue.qsize(),
+            "written": self._written,
+            "failed": self._failed
+        }
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="upload-persister", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            filename, data = self._queue.get()
+            try:
+                self._write(filename, data)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, filename, data):
+        path = os.path.join(self.folder, filename)
+        tmp_path = f"{path}.part"
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._written += 1
+        except OSError as e:
+            self._failed += 1
+            print(f"⚠️ Gagal menyimpan upload {filename}: {e}")
+
+
+def create_persister(folder, enabled=True, asynchronous=True):
+    """UploadPersister sesuai konfigurasi; None jika penyimpanan dimatikan"""
+    if not enabled:
+        return None
+    persister = UploadPersister(folder, asynchronous=asynchronous)
+    # Selesaikan penulisan yang tertunda saat proses berhenti normal
+    atexit.register(persister.flush, 10)
+    return persister
@@ -1,179 +1,632 @@
 # backend-ml/src/inference.py
+import copy
+import time
+import atexit
+import hashlib
+import threading
+import contextvars
+import multiprocessing
+from datetime import datetime
+from contextlib import contextmanager
 import torch
 import numpy as np
-from transformers import AutoModelForImageClassification, AutoImageProcessor
+from transformers import AutoModelForImageClassification, AutoImageProcessor, AutoConfig
 from PIL import Image
-from .config import REPO_NAME, CLASS_NAMES, CONFIDENCE_THRESHOLD # Impor dari config yang sudah dibuat
-
-# Pemuatan Model (Hanya dilakukan sekali saat aplikasi dimulai)
-print(f"Mengunduh dan memuat model: {REPO_NAME}...")
-try:
-    # Try to load from cache first (offline mode)
-    image_processor = AutoImageProcessor.from_pretrained(REPO_NAME, local_files_only=True)
-    model = AutoModelForImageClassification.from_pretrained(REPO_NAME, local_files_only=True)
-    print("Model dimuat dari cache lokal.")
-except Exception as e:
-    print(f"Cache lokal tidak ditemukan, download dari HuggingFace...")
-    # If cache not found, download from internet
-    image_processor = AutoImageProcessor.from_pretrained(REPO_NAME)
-    model = AutoModelForImageClassification.from_pretrained(REPO_NAME)
-    print("Model berhasil didownload dan dimuat.")
-print("Model siap.")
+from .config import (
+    REPO_NAME, CLASS_NAMES, CONFIDENCE_THRESHOLD,  # Impor dari config yang sudah dibuat
+    BATCHING_ENABLED, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS,
+    PREDICTION_CACHE_ENABLED, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_DIR,
+    WARMUP_ENABLED, WARMUP_BATCH_SIZES, WARMUP_ROUNDS,
+    INFERENCE_ENGINE, ONNX_MODEL_PATH, ONNX_INTRA_OP_THREADS, MODEL_PRECISION,
+    INFERENCE_POOL_ENABLED, INFERENCE_POOL_SIZE, INFERENCE_POOL_THREADS, INFERENCE_POOL_MAX_QUEUE,
+    INFERENCE_POOL_QUEUE_TIMEOUT, INFERENCE_POOL_TASK_TIMEOUT,
+    MODEL_WEIGHTS_MMAP, MODEL_MMAP_PATH, MODEL_PRELOAD_FORK
+)
+from .batching import MicroBatcher
+from .cache import PredictionCache, image_cache_key
+from .skin_detector import is_likely_skin, is_likely_skin_batch, prepare_skin_pixels, build_skin_lut
+from .image_io import load_image_file
+from .preprocessing import ImagePreprocessor
+from .inference_pool import InferencePool, InferencePoolBusy, default_threads_per_worker
+from .weights import (
+    checkpoint_source_id, serving_weights_valid, save_serving_weights,
+    load_model_mmap, mmap_weight_fraction
+)
+from .memory import process_memory, format_process_memory
+from .profiling import profiling_active
+from .metrics import (
+    stage_timer, observe_stage, record_prediction, register_gauge, BATCH_SIZE,
+    STAGE_SKIN_CHECK, STAGE_PREPROCESS, STAGE_INFERENCE, STAGE_FORWARD, STAGE_POSTPROCESS
+)
+from .engines import (
+    ENGINES, ENGINE_PYTORCH, ENGINE_ONNXRUNTIME, PRECISION_FP32,
+    PyTorchEngine, OnnxRuntimeEngine
+)
+
+# =============================================================================
+# MODEL LIFECYCLE
+# =============================================================================
+# Model tidak lagi dimuat saat import. start_model_loading() memuat model di
+# background thread, lalu menjalankan warm-up; server sudah bisa menjawab
+# /health (liveness) sejak awal, dan /ready (readiness) baru OK setelah warm-up.
+
+image_processor = None
+preprocessor = None  # ImagePreprocessor dari config image_processor
+model = None    # Model PyTorch (None jika engine ONNX Runtime)
+engine = None   # InferenceEngine aktif (PooledEngine jika INFERENCE_POOL_ENABLED)
+inference_pool = None  # InferencePool jika forward pass dijalankan di proses worker
+MODEL_REVISION = None
+prediction_cache = None
+
+_model_ready = threading.Event()
+_load_lock = threading.Lock()
+_start_lock = threading.Lock()
+_load_thread = None
+_model_status = {
+    "state": "not_loaded",   # not_loaded -> loading -> warming_up -> ready | failed
+    "error": None,
+    "started_at": None,
+    "ready_at": None,
+    "load_seconds": None,
+    "warmup_seconds": None,
+    "warmup_batch_sizes": []
+}
+
+
+def _from_pretrained(loader):
+    """Muat komponen REPO_NAME dari cache lokal, atau download dari HuggingFace"""
+    try:
+        # Try to load from cache first (offline mode)
+        return loader.from_pretrained(REPO_NAME, local_files_only=True)
+    except Exception as e:
+        print(f"Cache lokal tidak ditemukan, download dari HuggingFace...")
+        # If cache not found, download from internet
+        return loader.from_pretrained(REPO_NAME)
+
+
+def load_pytorch_model():
+    """Muat checkpoint REPO_NAME sebagai model PyTorch (juga dipakai untuk export ONNX)"""
+    if MODEL_WEIGHTS_MMAP:
+        try:
+            return _load_pytorch_model_mmap()
+        except Exception as e:
+            print(f"⚠️ Bobot mmap tidak bisa dipakai ({e}); memuat salinan privat...")
+    loaded = _from_pretrained(AutoModelForImageClassification)
+    loaded.eval()
+    return loaded
+
+
+def _load_pytorch_model_mmap():
+    """
+    Model dengan parameter yang menunjuk ke MODEL_MMAP_PATH (mmap, shared antar proses).
+    File dibuat ulang dari from_pretrained jika belum ada atau checkpoint berubah.
+    """
+    config = _from_pretrained(AutoConfig)
+    source_id = checkpoint_source_id(REPO_NAME)
+    if not serving_weights_valid(MODEL_MMAP_PATH, source_id):
+        print(f"Menyiapkan file bobot mmap: {MODEL_MMAP_PATH}...")
+        pretrained = _from_pretrained(AutoModelForImageClassification)
+        # Blob checkpoint baru ada di cache setelah from_pretrained pertama kali
+        source_id = checkpoint_source_id(REPO_NAME)
+        save_serving_weights(pretrained, MODEL_MMAP_PATH, source_id)
+        del pretrained
+    return load_model_mmap(AutoModelForImageClassification, config, MODEL_MMAP_PATH)
+
+
+def load_image_processor():
+    """Muat image processor REPO_NAME (resize, crop, normalisasi)"""
+    return _from_pretrained(AutoImageProcessor)
+
+
+def _load_weights():
+    """Muat image processor dan inference engine sesuai INFERENCE_ENGINE"""
+    print(f"Mengunduh dan memuat model: {REPO_NAME} (engine: {INFERENCE_ENGINE}, presisi: {MODEL_PRECISION})...")
+    processor = load_image_processor()
+    if INFERENCE_ENGINE == ENGINE_ONNXRUNTIME:
+        if MODEL_PRECISION != PRECISION_FP32:
+            raise ValueError("MODEL_PRECISION=int8 hanya didukung untuk INFERENCE_ENGINE=pytorch")
+        # Bobot PyTorch tidak dimuat sama sekali; cukup file ONNX hasil export
+        loaded, active = None, OnnxRuntimeEngine(ONNX_MODEL_PATH, ONNX_INTRA_OP_THREADS)
+    elif INFERENCE_ENGINE == ENGINE_PYTORCH:
+        active = PyTorchEngine(load_pytorch_model(), precision=MODEL_PRECISION)
+        loaded = active.model
+    else:
+        raise ValueError(f"INFERENCE_ENGINE tidak dikenal: {INFERENCE_ENGINE} (pilihan: {', '.join(ENGINES)})")
+    print("Model berhasil dimuat.")
+    return processor, loaded, active
+
+
+def _start_inference_pool():
+    """Muat image processor di proses ini; bobot model hanya dimuat di proses worker"""
+    global inference_pool
+    processor = load_image_processor()
+    threads = INFERENCE_POOL_THREADS or default_threads_per_worker(INFERENCE_POOL_SIZE)
+    print(f"Menjalankan inference pool: {INFERENCE_POOL_SIZE} worker x {threads} thread "
+          f"(engine: {INFERENCE_ENGINE}, presisi: {MODEL_PRECISION})...")
+    inference_pool = InferencePool(
+        get_input_size(processor),
+        num_workers=INFERENCE_POOL_SIZE,
+        threads_per_worker=threads,
+        max_queue=INFERENCE_POOL_MAX_QUEUE,
+        slot_batch_size=BATCH_MAX_SIZE,
+        queue_timeout=INFERENCE_POOL_QUEUE_TIMEOUT,
+        task_timeout=INFERENCE_POOL_TASK_TIMEOUT
+    ).start()
+    atexit.register(inference_pool.close)
+    print("Inference pool siap.")
+    return processor, None, inference_pool.engine
+
+
+def _model_revision() -> str:
+    """
+    Sidik jari model: REPO_NAME + engine + hash bobot.
+    Berubah otomatis jika repo, engine, atau bobot model berubah.
+    """
+    h = hashlib.blake2b(digest_size=8)
+    h.update(REPO_NAME.encode('utf-8'))
+    h.update(engine.name.encode('utf-8'))
+    h.update(engine.fingerprint())
+    return h.hexdigest()
+
+
+def get_input_size(processor) -> tuple:
+    """Ukuran input model (tinggi, lebar) dari konfigurasi image processor"""
+    crop_size = getattr(processor, "crop_size", None) or {}
+    if "height" in crop_size and "width" in crop_size:
+        return crop_size["height"], crop_size["width"]
+    return 224, 224
+
+
+def _warm_up():
+    """Jalankan beberapa batch dummy agar kernel dan allocator sudah 'panas'"""
+    build_skin_lut()
+    height, width = get_input_size(image_processor)
+    dummy = np.zeros((height, width, 3), dtype=np.uint8)
+    if inference_pool is not None:
+        # Worker sudah warm-up sendiri; cukup cek jalur shared memory sekali
+        _forward_batch([dummy])
+        return
+    for batch_size in WARMUP_BATCH_SIZES:
+        for _ in range(WARMUP_ROUNDS):
+            _forward_batch([dummy] * batch_size)
+        print(f"Warm-up batch size {batch_size} selesai.")
+
+
+def load_model():
+    """
+    Muat model secara sinkron (loading -> warming_up -> ready).
+    Aman dipanggil berkali-kali; pemuatan hanya terjadi sekali.
+    """
+    global image_processor, preprocessor, model, engine, MODEL_REVISION, prediction_cache
+    with _load_lock:
+        if _model_ready.is_set():
+            return
+        _model_status.update(state="loading", error=None, started_at=datetime.now().isoformat())
+        try:
+            started = time.perf_counter()
+            if INFERENCE_POOL_ENABLED and MODEL_PRELOAD_FORK:
+                # Pipe & shared memory pool milik master tidak bisa dipakai bersama worker hasil fork
+                raise ValueError("INFERENCE_POOL_ENABLED tidak bisa digabung dengan MODEL_PRELOAD_FORK")
+            if INFERENCE_POOL_ENABLED:
+                image_processor, model, engine = _start_inference_pool()
+            else:
+                image_processor, model, engine = _load_weights()
+            preprocessor = ImagePreprocessor.from_processor(image_processor)
+            MODEL_REVISION = _model_revision()
+            if PREDICTION_CACHE_ENABLED:
+                prediction_cache = PredictionCache(
+                    MODEL_REVISION,
+                    max_entries=PREDICTION_CACHE_SIZE,
+                    disk_dir=PREDICTION_CACHE_DIR
+                )
+            loaded = time.perf_counter()
+            _model_status.update(state="warming_up", load_seconds=round(loaded - started, 3))
+
+            if WARMUP_ENABLED and not MODEL_PRELOAD_FORK:
+                # Mode preload: torch/OpenMP tidak dijalankan di master sebelum fork;
+                # warm-up dilakukan tiap worker lewat warm_up_after_fork()
+                _warm_up()
+            _model_status.update(
+                state="ready",
+                ready_at=datetime.now().isoformat(),
+                warmup_seconds=round(time.perf_counter() - loaded, 3),
+                warmup_batch_sizes=list(WARMUP_BATCH_SIZES) if WARMUP_ENABLED and not MODEL_PRELOAD_FORK else []
+            )
+            _model_ready.set()
+            print(f"Model siap. Memori {format_process_memory(process_memory())}")
+        except Exception as e:
+            _model_status.update(state="failed", error=str(e))
+            print(f"❌ Gagal memuat model: {e}")
+            raise
+
+
+def warm_up_after_fork():
+    """
+    Warm-up di worker hasil fork (MODEL_PRELOAD_FORK). Bobot tetap halaman milik
+    master (copy-on-write), hanya buffer aktivasi yang menjadi memori privat worker.
+    """
+    if not _model_ready.is_set() or not WARMUP_ENABLED:
+        return
+    started = time.perf_counter()
+    _warm_up()
+    _model_status.update(
+        warmup_seconds=round(time.perf_counter() - started, 3),
+        warmup_batch_sizes=list(WARMUP_BATCH_SIZES)
+    )
+
+
+def start_model_loading(background=True):
+    """Mulai pemuatan model; di background thread jika `background` True"""
+    global _load_thread
+    if multiprocessing.parent_process() is not None:
+        # Proses worker multiprocessing (mis. worker inference pool yang meng-import
+        # ulang app.py sebagai __mp_main__) tidak ikut memuat model
+        return
+    if not background:
+        load_model()
+        return
+    with _start_lock:
+        if _model_ready.is_set() or (_load_thread is not None and _load_thread.is_alive()):
+            return
+
+        def _run():
+            try:
+                load_model()
+            except Exception:
+                pass  # Status "failed" sudah dicatat di load_model
+
+        _load_thread = threading.Thread(target=_run, name="model-loader", daemon=True)
+        _load_thread.start()
+
+
+def is_model_ready() -> bool:
+    """True jika model sudah dimuat dan warm-up selesai"""
+    return _model_ready.is_set()
+
+
+def wait_until_ready(timeout=None) -> bool:
+    """Tunggu sampai model siap (untuk script/CLI); True jika siap"""
+    return _model_ready.wait(timeout)
+
+
+def get_model_status() -> dict:
+    """Status lifecycle model untuk endpoint readiness"""
+    return {"ready": is_model_ready(), **_model_status}
+
+
+def _model_not_ready_result() -> dict:
+    """Hasil error saat model belum siap menerima request"""
+    return {
+        "error": "model_not_ready",
+        "message": "Model AI sedang dimuat, silakan coba lagi sebentar lagi",
+        "state": _model_status["state"],
+        "prediction": None
+    }
+
+
+def _server_busy_result() -> dict:
+    """Hasil error saat antrian inference pool penuh"""
+    return {
+        "error": "server_busy",
+        "message": "Server AI sedang sibuk, silakan coba lagi sebentar lagi",
+        "prediction": None
+    }
+
+
+def _forward_batch(pixel_arrays):
+    """
+    Satu forward pass untuk banyak gambar sekaligus.
+    Menerima list array (H, W, 3) uint8 hasil `preprocessor.prepare`, mengembalikan
+    list probabilitas per gambar. Normalisasi dilakukan sekali untuk seluruh batch.
+    """
+    BATCH_SIZE.observe(len(pixel_arrays))
+    with stage_timer(STAGE_FORWARD):
+        if inference_pool is not None:
+            return [torch.from_numpy(row) for row in inference_pool.infer(pixel_arrays)]
+        logits = engine.forward(preprocessor.to_tensor(pixel_arrays))
+        probabilities = torch.softmax(logits, dim=1)
+        return list(probabilities)
+
+
+batcher = MicroBatcher(
+    _forward_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    name="inference-batcher",
+    # Satu batch per proses worker boleh berjalan bersamaan
+    concurrency=INFERENCE_POOL_SIZE if INFERENCE_POOL_ENABLED else 1
+)
+
+
+class ForwardCount:
+    """Jumlah gambar yang di-forward (bukan cache hit / ditolak validasi kulit) di dalam blok"""
+    __slots__ = ("images",)
+
+    def __init__(self):
+        self.images = 0
+
+
+_forward_count = contextvars.ContextVar("forward_count", default=None)
+
+
+@contextmanager
+def count_forwarded_images():
+    """Hitung gambar yang benar-benar di-forward oleh thread/request ini (mis. untuk admission control)"""
+    count = ForwardCount()
+    token = _forward_count.set(count)
+    try:
+        yield count
+    finally:
+        _forward_count.reset(token)
+
+
+def _count_forwarded(images):
+    count = _forward_count.get()
+    if count is not None:
+        count.images += images
+
+
+def _infer_probabilities(pixels):
+    """Jalankan inferensi satu gambar, lewat micro-batcher jika diaktifkan"""
+    with stage_timer(STAGE_INFERENCE):
+        # Request yang diprofile: forward di thread ini agar tercatat torch.profiler
+        if BATCHING_ENABLED and not profiling_active():
+            return batcher.predict(pixels)
+        return _forward_batch([pixels])[0]
+
 
 def is_likely_skin_image(image: Image.Image) -> dict:
     """
     Validasi apakah gambar kemungkinan berisi kulit manusia.
-    Menggunakan analisis warna HSV untuk deteksi rentang warna kulit.
+    Menggunakan analisis warna HSV untuk deteksi rentang warna kulit
+    (implementasi vektor NumPy di skin_detector).
     
     Returns:
         dict: {"is_skin": bool, "confidence": float, "reason": str}
     """
     try:
-        # Convert ke RGB jika perlu
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Resize untuk performa (analisis warna tidak perlu resolusi tinggi)
-        img_small = image.resize((200, 200))
-        img_array = np.array(img_small)
-        
-        # Convert RGB ke HSV untuk deteksi warna kulit
-        # HSV lebih robust untuk deteksi warna kulit
-        from PIL import ImageStat
-        
-        # Hitung statistik warna
-        stat = ImageStat.Stat(img_small)
-        mean_rgb = stat.mean[:3]
-        
-        # Rentang warna kulit manusia (simplified)
-        # R: 95-255, G: 40-200, B: 20-170
-        # Plus ratio: R>G>B (umumnya berlaku untuk kulit)
-        r, g, b = mean_rgb
-        
-        # Check 1: Rentang RGB untuk kulit
-        in_skin_range = (95 <= r <= 255) and (40 <= g <= 200) and (20 <= b <= 170)
-        
-        # Check 2: Ratio R > G > B (karakteristik kulit)
-        proper_ratio = r > g > b
-        
-        # Check 3: Tidak terlalu gelap atau terlalu terang
-        brightness = (r + g + b) / 3
-        proper_brightness = 60 <= brightness <= 220
-        
-        # Hitung persentase pixel dalam rentang kulit (metode alternatif)
-        hsv_array = np.array(img_small.convert('HSV'))
-        h, s, v = hsv_array[:,:,0], hsv_array[:,:,1], hsv_array[:,:,2]
-        
-        # Rentang HSV untuk kulit (dari penelitian skin detection)
-        # Hue: 0-50 (merah-orange), Saturation: 0.23-0.68, Value: 0.35-1.0
-        skin_mask = (
-            ((h >= 0) & (h <= 50)) &
-            ((s >= 58) & (s <= 173)) &  # 0.23*255 to 0.68*255
-            ((v >= 89) & (v <= 255))     # 0.35*255 to 1.0*255
-        )
-        
-        skin_percentage = np.sum(skin_mask) / skin_mask.size
-        
-        # Decision logic
-        is_skin = False
-        confidence = 0.0
-        reason = ""
-        
-        if skin_percentage > 0.15:  # Minimal 15% pixel adalah warna kulit
-            is_skin = True
-            confidence = min(skin_percentage * 2, 0.95)  # Scale to 0-0.95
-            reason = f"Terdeteksi {skin_percentage*100:.1f}% area kulit"
-        elif in_skin_range and proper_ratio and proper_brightness:
-            is_skin = True
-            confidence = 0.6
-            reason = "Warna rata-rata konsisten dengan kulit"
-        else:
-            reason = f"Warna tidak konsisten dengan kulit (RGB: {r:.0f},{g:.0f},{b:.0f}, Skin%: {skin_percentage*100:.1f}%)"
-        
-        return {
-            "is_skin": is_skin,
-            "confidence": confidence,
-            "reason": reason,
-            "skin_percentage": skin_percentage
-        }
-        
+        return is_likely_skin(image)
     except Exception as e:
         # Jika gagal validasi, lebih baik reject untuk keamanan
+        return _skin_check_failed(e)
+
+
+def _skin_check_failed(error: Exception) -> dict:
+    return {
+        "is_skin": False,
+        "confidence": 0.0,
+        "reason": f"Gagal validasi: {str(error)}",
+        "skin_percentage": 0.0
+    }
+
+
+def _not_skin_result(skin_check: dict) -> dict:
+    """Hasil penolakan untuk gambar yang bukan foto kulit"""
+    return {
+        "error": "not_skin",
+        "message": "Gambar yang diupload bukan foto kulit",
+        "reason": skin_check["reason"],
+        "suggestion": "Silakan upload foto kulit yang jelas. Pastikan fokus pada area kulit dengan pencahayaan yang baik.",
+        "prediction": None
+    }
+
+
+def _build_result(probabilities, skin_check: dict) -> dict:
+    """Pasca-pemrosesan probabilitas satu gambar menjadi hasil klasifikasi"""
+    predicted_class_idx = probabilities.argmax(-1).item()
+    confidence = probabilities[predicted_class_idx].item()
+    
+    predicted_class_name = CLASS_NAMES[predicted_class_idx]
+    
+    # Get top 3 predictions
+    top_3_indices = probabilities.argsort(descending=True)[:3]
+    top_3 = [
+        {
+            "label": CLASS_NAMES[idx.item()],
+            "confidence": round(probabilities[idx].item() * 100, 1)
+        }
+        for idx in top_3_indices
+    ]
+    
+    # STEP 2: Validasi confidence threshold
+    # Untuk aplikasi medis, confidence rendah = reject
+    if confidence < 0.35:  # 35% threshold untuk reject
         return {
-            "is_skin": False,
-            "confidence": 0.0,
-            "reason": f"Gagal validasi: {str(e)}",
-            "skin_percentage": 0.0
+            "error": "low_confidence",
+            "message": "Hasil prediksi tidak dapat dipercaya",
+            "reason": f"Tingkat kepercayaan AI terlalu rendah ({confidence*100:.1f}%)",
+            "suggestion": "Coba upload foto dengan kualitas lebih baik: pencahayaan cukup, fokus jelas, dan area kulit terlihat dengan baik.",
+            "prediction": None,
+            "top_3": top_3  # Tetap kirim untuk debugging
         }
 
-def predict_skin_disease(image_path: str) -> dict:
+    return {
+        "prediction": predicted_class_name,
+        "confidence": confidence,  # float 0-1
+        "class_index": predicted_class_idx,
+        "top_3": top_3,
+        "skin_validation": skin_check,  # Info tambahan
+        "engine": engine.name
+    }
+
+
+def _predict_image(image: Image.Image, on_stage=None) -> dict:
+    """
+    Pipeline lengkap satu gambar: validasi kulit, pra-pemrosesan, inferensi.
+    `on_stage(nama_tahap)` opsional dipanggil setelah validasi kulit (mis. progres job async).
+    """
+    # STEP 1: Validasi apakah gambar adalah kulit
+    with stage_timer(STAGE_SKIN_CHECK):
+        skin_check = is_likely_skin_image(image)
+    if on_stage is not None:
+        on_stage("skin_checked")
+    if not skin_check["is_skin"]:
+        return _not_skin_result(skin_check)
+    
+    # Resize + crop di thread request (uint8); normalisasi per batch di forward pass.
+    # Parameter sama dengan image processor model (bit-identik)
+    with stage_timer(STAGE_PREPROCESS):
+        pixels = preprocessor.prepare(image)
+
+    # 2. Inferensi (digabung dengan request lain oleh micro-batcher)
+    # Probabilitas = softmax dari logit lapisan linear di atas token [CLS]
+    probabilities = _infer_probabilities(pixels)
+    _count_forwarded(1)
+
+    # 3. Pasca-Pemrosesan
+    with stage_timer(STAGE_POSTPROCESS):
+        return _build_result(probabilities, skin_check)
+
+
+def predict_skin_disease(image, on_stage=None) -> dict:
     """
     Melakukan inferensi pada gambar yang diberikan dan mengembalikan hasil klasifikasi.
+    `image` boleh path file atau PIL Image yang sudah didecode (tanpa baca ulang dari disk).
+    Hasil untuk gambar yang sama (isi piksel + revisi model) diambil dari cache
+    (cache hit tidak memanggil `on_stage`).
     """
+    result = _predict_single(image, on_stage)
+    record_prediction(result)
+    return result
+
+
+def _predict_single(image, on_stage=None) -> dict:
+    if not is_model_ready():
+        return _model_not_ready_result()
     try:
         # 1. Load Gambar & Pra-Pemrosesan
-        image = Image.open(image_path)
+        if not isinstance(image, Image.Image):
+            image = load_image_file(image)
         
-        # STEP 1: Validasi apakah gambar adalah kulit
-        skin_check = is_likely_skin_image(image)
-        if not skin_check["is_skin"]:
-            return {
-                "error": "not_skin",
-                "message": "Gambar yang diupload bukan foto kulit",
-                "reason": skin_check["reason"],
-                "suggestion": "Silakan upload foto kulit yang jelas. Pastikan fokus pada area kulit dengan pencahayaan yang baik.",
-                "prediction": None
-            }
+        if prediction_cache is None:
+            return _predict_image(image, on_stage)
         
-        # Sesuai deskripsi model, prosesor menyiapkan image patches dan token [CLS]
-        encoding = image_processor(image.convert("RGB"), return_tensors="pt")
+        key = image_cache_key(image, MODEL_REVISION)
+        return prediction_cache.get_or_compute(key, lambda: _predict_image(image, on_stage))
 
-        # 2. Inferensi
-        with torch.no_grad():
-            outputs = model(**encoding)
-            logits = outputs.logits # Logit dari lapisan linear di atas token [CLS]
+    except InferencePoolBusy:
+        return _server_busy_result()
+    except Exception as e:
+        return {"error": f"Gagal dalam prediksi: {str(e)}", "prediction": "Gagal"}
 
-        # 3. Pasca-Pemrosesan
-        predicted_class_idx = logits.argmax(-1).item()
-        
-        # Hitung skor kepercayaan (probabilitas)
-        probabilities = torch.softmax(logits, dim=1)[0]
-        confidence = probabilities[predicted_class_idx].item()
-        
-        predicted_class_name = CLASS_NAMES[predicted_class_idx]
-        
-        # Get top 3 predictions
-        top_3_indices = probabilities.argsort(descending=True)[:3]
-        top_3 = [
-            {
-                "label": CLASS_NAMES[idx.item()],
-                "confidence": round(probabilities[idx].item() * 100, 1)
-            }
-            for idx in top_3_indices
-        ]
-        
-        # STEP 2: Validasi confidence threshold
-        # Untuk aplikasi medis, confidence rendah = reject
-        if confidence < 0.35:  # 35% threshold untuk reject
-            return {
-                "error": "low_confidence",
-                "message": "Hasil prediksi tidak dapat dipercaya",
-                "reason": f"Tingkat kepercayaan AI terlalu rendah ({confidence*100:.1f}%)",
-                "suggestion": "Coba upload foto dengan kualitas lebih baik: pencahayaan cukup, fokus jelas, dan area kulit terlihat dengan baik.",
-                "prediction": None,
-                "top_3": top_3  # Tetap kirim untuk debugging
-            }
 
-        return {
-            "prediction": predicted_class_name,
-            "confidence": confidence,  # float 0-1
-            "class_index": predicted_class_idx,
-            "top_3": top_3,
-            "skin_validation": skin_check  # Info tambahan
-        }
+def predict_skin_disease_batch(images: list) -> list:
+    """
+    Inferensi banyak gambar (PIL Image) sekaligus dengan satu forward pass.
+    Mengembalikan list hasil dengan urutan yang sama; kegagalan satu gambar
+    tidak menggagalkan gambar lain.
+    """
+    results = _predict_batch(images)
+    for result in results:
+        record_prediction(result)
+    return results
+
 
+def _predict_batch(images: list) -> list:
+    if not is_model_ready():
+        return [_model_not_ready_result() for _ in images]
+    if prediction_cache is None:
+        return [_outcome_result(outcome) for outcome in _compute_batch(images)]
+
+    results = [None] * len(images)
+    keys = {}  # index -> cache key
+    for i, image in enumerate(images):
+        try:
+            keys[i] = image_cache_key(image, MODEL_REVISION)
+        except Exception as e:
+            results[i] = _outcome_result(e)
+
+    # Gambar yang sama (dalam batch ini atau sedang dihitung request lain) hanya dihitung sekali
+    first_image = {}
+    for i, key in keys.items():
+        first_image.setdefault(key, images[i])
+
+    def compute(missing):
+        return dict(zip(missing, _compute_batch([first_image[key] for key in missing])))
+
+    outcomes = prediction_cache.get_or_compute_many(list(keys.values()), compute)
+    seen = set()
+    for i, key in keys.items():
+        outcome = outcomes[key]
+        # Duplikat dalam batch mendapat salinan sendiri (hasil dimodifikasi per item oleh pemanggil)
+        results[i] = _outcome_result(copy.deepcopy(outcome) if key in seen else outcome)
+        seen.add(key)
+    return results
+
+
+def _outcome_result(outcome) -> dict:
+    """Hasil _compute_batch per gambar -> dict hasil; exception menjadi hasil error (tidak di-cache)"""
+    if isinstance(outcome, InferencePoolBusy):
+        return _server_busy_result()
+    if isinstance(outcome, Exception):
+        return {"error": f"Gagal dalam prediksi: {str(outcome)}", "prediction": "Gagal"}
+    return outcome
+
+
+def _compute_batch(images: list) -> list:
+    """
+    Validasi kulit + satu forward pass untuk `images`. Mengembalikan list dengan urutan
+    yang sama berisi dict hasil, atau exception untuk gambar yang gagal.
+    """
+    outcomes = [None] * len(images)
+    to_check = []  # (index, image RGB, piksel kecil untuk validasi kulit)
+    pending = []   # (index, image RGB, skin_check)
+
+    # STEP 1: Siapkan piksel untuk validasi kulit
+    for i, image in enumerate(images):
+        try:
+            rgb = image.convert("RGB")
+            to_check.append((i, rgb, prepare_skin_pixels(rgb)))
+        except Exception as e:
+            outcomes[i] = e
+
+    # Validasi kulit semua gambar dalam satu pass vektor
+    if to_check:
+        try:
+            with stage_timer(STAGE_SKIN_CHECK):
+                skin_checks = is_likely_skin_batch(np.stack([pixels for _, _, pixels in to_check]))
+        except Exception as e:
+            skin_checks = [_skin_check_failed(e)] * len(to_check)
+        for (i, rgb, _), skin_check in zip(to_check, skin_checks):
+            if not skin_check["is_skin"]:
+                outcomes[i] = _not_skin_result(skin_check)
+            else:
+                pending.append((i, rgb, skin_check))
+
+    if not pending:
+        return outcomes
+
+    # STEP 2: Pra-pemrosesan + satu forward pass untuk semua gambar yang lolos
+    try:
+        with stage_timer(STAGE_PREPROCESS):
+            pixel_arrays = [preprocessor.prepare(image) for _, image, _ in pending]
+        probabilities = _forward_batch(pixel_arrays)
+        _count_forwarded(len(pending))
+        for (i, _, skin_check), probs in zip(pending, probabilities):
+            with stage_timer(STAGE_POSTPROCESS):
+                outcomes[i] = _build_result(probs, skin_check)
     except Exception as e:
-        return {"error": f"Gagal dalam prediksi: {str(e)}", "prediction": "Gagal"}
+        for i, _, _ in pending:
+            outcomes[i] = e
+
+    return outcomes
+
+
+# =============================================================================
+# METRICS GAUGES
+# =============================================================================
+
+register_gauge(
+    "skincheck_model_state", "Status pemuatan model (1 = status saat ini)",
+    lambda: {(state,): float(_model_status["state"] == state)
+             for state in ("not_loaded", "loading", "warming_up", "ready", "failed")},
+    labels=("state",)
+)
+register_gauge("skincheck_batcher_queue_depth", "Gambar yang menunggu di micro-batcher", batcher.queue_depth)
+register_gauge(
+    "skincheck_inference_pool_in_flight", "Batch yang antri/berjalan di inference pool",
+    lambda: inference_pool.stats()["in_flight"] if inference_pool else 0
+)
 
 
 def get_model_info() -> dict:
@@ -182,5 +635,37 @@ def get_model_info() -> dict:
         "model_name": REPO_NAME,
         "total_classes": len(CLASS_NAMES),
         "class_names": CLASS_NAMES,
-        "framework": "PyTorch + HuggingFace Transformers"
-    }
\ No newline at end of file
+        "framework": engine.framework if engine else None,
+        "engine": engine.info() if engine else {"engine": INFERENCE_ENGINE},
+        "precision": engine.info()["precision"] if engine else MODEL_PRECISION,
+        "status": get_model_status(),
+        "model_revision": MODEL_REVISION,
+        "batching": get_batching_stats(),
+        "cache": get_cache_stats(),
+        "inference_pool": {"enabled": True, **inference_pool.stats()} if inference_pool else {"enabled": False},
+        "memory": get_memory_stats()
+    }
+
+
+def get_memory_stats() -> dict:
+    """Memori proses ini (unique vs shared) dan fraksi bobot model yang di-mmap"""
+    return {
+        "process": process_memory(),
+        "weights_mmap": MODEL_WEIGHTS_MMAP,
+        "weights_shared_fraction": (
+            round(mmap_weight_fraction(model, MODEL_MMAP_PATH), 3) if model is not None else None
+        ),
+        "preload_fork": MODEL_PRELOAD_FORK
+    }
+
+
+def get_batching_stats() -> dict:
+    """Statistik micro-batcher: kedalaman antrian dan distribusi ukuran batch"""
+    return {"enabled": BATCHING_ENABLED, **batcher.stats()}
+
+
+def get_cache_stats() -> dict:
+    """Counter hit/miss prediction cache"""
+    if prediction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_cache.stats()}
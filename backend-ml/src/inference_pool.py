@@ -0,0 +1,389 @@
+"""
+Inference pool: forward pass model di proses worker terpisah
+- Proses Flask hanya menjadi front end I/O (decode, validasi kulit, resize/crop)
+  sehingga endpoint ringan (/history, /auth/login) tidak tertahan oleh PyTorch
+- Piksel uint8 (N, H, W, 3) dikirim lewat slot shared memory yang dialokasikan
+  sekali saat start, bukan di-pickle
+- Task dan hasil (probabilitas per gambar) lewat pipe per worker; tidak ada
+  lock antar proses, jadi worker yang mati tidak bisa menahan worker lain
+- Jumlah slot = batas antrian; jika semua terpakai lebih lama dari `queue_timeout`
+  request ditolak dengan InferencePoolBusy
+- Worker yang mati diganti otomatis; task yang sedang dikerjakannya digagalkan
+- Worker yang tidak menjawab dalam `task_timeout` dihentikan paksa lalu diganti,
+  sehingga slot shared memory task-nya kembali ke pool
+"""
+import os
+import queue
+import threading
+import itertools
+import multiprocessing
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+import numpy as np
+
+from .engines import InferenceEngine
+
+
+class InferencePoolBusy(RuntimeError):
+    """Semua slot inference pool terpakai (antrian penuh)"""
+
+
+class PooledEngine(InferenceEngine):
+    """Deskripsi engine yang berjalan di worker (nama, presisi, sidik jari bobot)"""
+
+    def __init__(self, info, fingerprint):
+        self.name = info["engine"]
+        self.framework = info["framework"]
+        self._info = info
+        self._fingerprint = fingerprint
+
+    def forward(self, pixel_values):
+        raise NotImplementedError("Forward pass dijalankan di worker; gunakan InferencePool.infer")
+
+    def fingerprint(self):
+        return self._fingerprint
+
+    def info(self):
+        return {**self._info, "process_pool": True}
+
+
+# =============================================================================
+# WORKER PROCESS
+# =============================================================================
+
+def _worker_main(num_threads, slot_names, slot_shape, tasks, results):
+    """Loop proses worker: muat model, warm-up, lalu jalankan task dari pipe `tasks`"""
+    import torch
+    if num_threads:
+        torch.set_num_threads(num_threads)
+
+    try:
+        from .inference import _load_weights
+        from .preprocessing import ImagePreprocessor
+        from .config import WARMUP_ENABLED, WARMUP_BATCH_SIZES, WARMUP_ROUNDS
+
+        processor, _, engine = _load_weights()
+        preprocessor = ImagePreprocessor.from_processor(processor)
+        slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+
+        def run(pixel_arrays):
+            logits = engine.forward(preprocessor.to_tensor(pixel_arrays))
+            return torch.softmax(logits, dim=1).numpy().copy()
+
+        if WARMUP_ENABLED:
+            dummy = np.zeros(slot_shape[1:], dtype=np.uint8)
+            for batch_size in WARMUP_BATCH_SIZES:
+                for _ in range(WARMUP_ROUNDS):
+                    run([dummy] * batch_size)
+    except Exception as e:
+        results.send(("failed", None, f"{type(e).__name__}: {e}"))
+        return
+
+    results.send(("ready", None, {"info": engine.info(), "fingerprint": engine.fingerprint()}))
+
+    while True:
+        try:
+            task = tasks.recv()
+        except EOFError:
+            break  # Proses Flask sudah berhenti
+        if task is None:
+            break
+        task_id, slot, count = task
+        try:
+            pixels = np.ndarray((count, *slot_shape[1:]), dtype=np.uint8, buffer=slots[slot].buf)
+            results.send(("result", task_id, run(list(pixels))))
+        except Exception as e:
+            results.send(("error", task_id, f"{type(e).__name__}: {e}"))
+
+    for shm in slots:
+        shm.close()
+
+
+# =============================================================================
+# POOL (proses Flask)
+# =============================================================================
+
+class _Worker:
+    def __init__(self, worker_id, process, tasks, results):
+        self.id = worker_id
+        self.process = process
+        self.tasks = tasks        # Connection: proses Flask -> worker
+        self.results = results    # Connection: worker -> proses Flask
+        self.send_lock = threading.Lock()
+        self.ready = False
+        self.in_flight = set()  # task_id
+
+    def send(self, message):
+        with self.send_lock:
+            self.tasks.send(message)
+
+
+class InferencePool:
+    """
+    Pool proses worker inferensi.
+
+    `infer(pixel_arrays)` menerima list array (H, W, 3) uint8 hasil
+    `ImagePreprocessor.prepare` dan mengembalikan list probabilitas per gambar.
+    Batch yang lebih besar dari kapasitas slot dipecah dan dijalankan paralel.
+    """
+
+    def __init__(self, input_size, num_workers=2, threads_per_worker=0, max_queue=4,
+                 slot_batch_size=8, queue_timeout=10.0, task_timeout=60.0):
+        if num_workers < 1:
+            raise ValueError("num_workers minimal 1")
+        self.input_size = tuple(input_size)
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.slot_batch_size = slot_batch_size
+        self.queue_timeout = queue_timeout
+        self.task_timeout = task_timeout
+        self.engine = None
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._slot_shape = (slot_batch_size, *self.input_size, 3)
+        slot_bytes = int(np.prod(self._slot_shape))
+        self._slots = [shared_memory.SharedMemory(create=True, size=slot_bytes) for _ in range(max(1, max_queue))]
+        self._free_slots = queue.Queue()
+        for index in range(len(self._slots)):
+            self._free_slots.put(index)
+
+        self._workers = {}
+        self._pending = {}  # task_id -> (Future, slot, worker_id)
+        self._lock = threading.Lock()
+        self._task_ids = itertools.count()
+        self._worker_ids = itertools.count()
+        self._ready = threading.Event()
+        self._startup_error = None
+        self._closed = False
+        self._reader = None
+
+        # Statistik
+        self._tasks_done = 0
+        self._tasks_failed = 0
+        self._rejected = 0
+        self._restarts = 0
+
+    # -------------------------------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------------------------------
+
+    def start(self, timeout=None):
+        """Jalankan semua worker dan tunggu sampai siap (model dimuat + warm-up)"""
+        for _ in range(self.num_workers):
+            self._spawn_worker()
+        self._reader = threading.Thread(target=self._read_results, name="inference-pool-reader", daemon=True)
+        self._reader.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError("Worker inference pool belum siap")
+        if self._startup_error:
+            self.close()
+            raise RuntimeError(f"Worker inference pool gagal memuat model: {self._startup_error}")
+        return self
+
+    def close(self):
+        """Hentikan worker dan lepaskan shared memory"""
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers.values())
+        for worker in workers:
+            try:
+                worker.send(None)
+            except OSError:
+                pass
+        for worker in workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        for shm in self._slots:
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _spawn_worker(self):
+        worker_id = next(self._worker_ids)
+        task_recv, task_send = self._ctx.Pipe(duplex=False)
+        result_recv, result_send = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self.threads_per_worker, [shm.name for shm in self._slots],
+                  self._slot_shape, task_recv, result_send),
+            name=f"inference-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        # Ujung milik worker ditutup di sini agar kematian worker terbaca sebagai EOF
+        task_recv.close()
+        result_send.close()
+        with self._lock:
+            self._workers[worker_id] = _Worker(worker_id, process, task_send, result_recv)
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+
+    def infer(self, pixel_arrays) -> list:
+        """Forward pass di worker; blocking sampai semua hasil kembali"""
+        futures = [
+            self._submit(pixel_arrays[start:start + self.slot_batch_size])
+            for start in range(0, len(pixel_arrays), self.slot_batch_size)
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.extend(future.result(timeout=self.task_timeout))
+            except TimeoutError:
+                self._on_task_timeout(future)
+                raise
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            workers = [
+                {"id": w.id, "pid": w.process.pid, "alive": w.process.is_alive(),
+                 "ready": w.ready, "in_flight": len(w.in_flight)}
+                for w in self._workers.values()
+            ]
+            in_flight = len(self._pending)
+        return {
+            "workers": workers,
+            "threads_per_worker": self.threads_per_worker,
+            "slots": len(self._slots),
+            "slots_free": self._free_slots.qsize(),
+            "slot_batch_size": self.slot_batch_size,
+            "in_flight": in_flight,
+            "tasks_done": self._tasks_done,
+            "tasks_failed": self._tasks_failed,
+            "rejected": self._rejected,
+            "worker_restarts": self._restarts
+        }
+
+    def _submit(self, pixel_arrays) -> Future:
+        try:
+            slot = self._free_slots.get(timeout=self.queue_timeout)
+        except queue.Empty:
+            self._rejected += 1
+            raise InferencePoolBusy(
+                f"Antrian inference pool penuh ({len(self._slots)} slot terpakai)"
+            ) from None
+
+        count = len(pixel_arrays)
+        view = np.ndarray((count, *self._slot_shape[1:]), dtype=np.uint8, buffer=self._slots[slot].buf)
+        for i, pixels in enumerate(pixel_arrays):
+            view[i] = pixels
+
+        future = Future()
+        with self._lock:
+            ready = [w for w in self._workers.values() if w.ready]
+            if not ready:
+                self._free_slots.put(slot)
+                raise RuntimeError("Tidak ada worker inference yang siap")
+            # Worker dengan task paling sedikit
+            worker = min(ready, key=lambda w: len(w.in_flight))
+            task_id = next(self._task_ids)
+            self._pending[task_id] = (future, slot, worker.id)
+            worker.in_flight.add(task_id)
+        try:
+            worker.send((task_id, slot, count))
+        except OSError as e:
+            self._on_task_done(task_id, "error", f"Gagal mengirim task ke worker {worker.id}: {e}")
+        return future
+
+    # -------------------------------------------------------------------------
+    # Result reader & supervisor
+    # -------------------------------------------------------------------------
+
+    def _read_results(self):
+        while not self._closed:
+            with self._lock:
+                by_conn = {worker.results: worker for worker in self._workers.values()}
+            for conn in wait(list(by_conn), timeout=1.0):
+                worker = by_conn[conn]
+                try:
+                    kind, key, payload = conn.recv()
+                except (EOFError, OSError):
+                    self._on_worker_exit(worker)
+                    continue
+                if kind == "ready":
+                    self._on_ready(worker.id, payload)
+                elif kind == "failed":
+                    self._on_startup_failed(worker.id, payload)
+                else:
+                    self._on_task_done(key, kind, payload)
+
+    def _on_ready(self, worker_id, payload):
+        with self._lock:
+            worker = self._workers.get(worker_id)
+            if worker is not None:
+                worker.ready = True
+            if self.engine is None:
+                self.engine = PooledEngine(payload["info"], payload["fingerprint"])
+            all_ready = all(w.ready for w in self._workers.values())
+        if all_ready:
+            self._ready.set()
+
+    def _on_startup_failed(self, worker_id, error):
+        print(f"❌ Worker inferensi {worker_id} gagal memuat model: {error}")
+        if not self._ready.is_set():
+            self._startup_error = error
+            self._ready.set()
+
+    def _on_task_done(self, task_id, kind, payload):
+        with self._lock:
+            entry = self._pending.pop(task_id, None)
+            if entry is None:
+                return
+            future, slot, worker_id = entry
+            worker = self._workers.get(worker_id)
+            if worker is not None:
+                worker.in_flight.discard(task_id)
+        self._free_slots.put(slot)
+        if kind == "result":
+            self._tasks_done += 1
+            future.set_result(list(payload))
+        else:
+            self._tasks_failed += 1
+            future.set_exception(RuntimeError(payload))
+
+    def _on_task_timeout(self, future):
+        """Task melewati task_timeout: worker dianggap macet dan dihentikan paksa"""
+        with self._lock:
+            worker_id = next((entry[2] for entry in self._pending.values() if entry[0] is future), None)
+            worker = self._workers.get(worker_id)
+        if worker is None:
+            return  # Hasil datang tepat setelah timeout, atau worker sudah diganti
+        print(f"⚠️ Worker inferensi {worker.id} (pid {worker.process.pid}) tidak menjawab dalam "
+              f"{self.task_timeout} detik, dihentikan...")
+        # SIGKILL, bukan SIGTERM: worker yang macet di kode native (atau di-SIGSTOP) tidak
+        # memproses SIGTERM. Reader melihat EOF lalu _on_worker_exit menggagalkan task-nya,
+        # mengembalikan slot, dan menjalankan pengganti.
+        worker.process.kill()
+
+    def _on_worker_exit(self, worker):
+        """Worker berhenti: gagalkan task yang sedang dikerjakannya, lalu ganti"""
+        with self._lock:
+            if self._workers.pop(worker.id, None) is None:
+                return
+        worker.process.join(timeout=5)
+        for task_id in list(worker.in_flight):
+            self._on_task_done(task_id, "error", f"Worker inferensi {worker.id} berhenti")
+        if self._closed:
+            return
+        if not worker.ready:
+            # Gagal saat memuat model; tidak diganti agar tidak berulang terus
+            print(f"❌ Worker inferensi {worker.id} berhenti sebelum siap (exit code {worker.process.exitcode})")
+            if not self._ready.is_set():
+                self._startup_error = self._startup_error or f"exit code {worker.process.exitcode}"
+                self._ready.set()
+            return
+        print(f"⚠️ Worker inferensi {worker.id} (pid {worker.process.pid}) berhenti "
+              f"(exit code {worker.process.exitcode}), menjalankan pengganti...")
+        self._restarts += 1
+        self._spawn_worker()
+
+
+def default_threads_per_worker(num_workers) -> int:
+    """Bagi core CPU rata ke semua worker"""
+    return max(1, (os.cpu_count() or 1) // num_workers)
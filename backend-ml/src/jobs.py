@@ -0,0 +1,215 @@
+"""
+Job prediksi asinkron
+- POST /predict/jobs langsung mengembalikan job id; pekerjaan dijalankan oleh
+  sejumlah thread worker dari antrian berukuran tetap (penuh -> JobQueueFull)
+- Setiap job mencatat tahap (stage) yang sudah dilalui; klien bisa polling
+  snapshot() atau berlangganan event lewat wait_for_update() (SSE)
+- Job yang sudah selesai dihapus setelah `ttl_seconds`; jumlah job tersimpan
+  juga dibatasi `max_jobs`, sehingga memori tetap terbatas
+- Store bersifat per proses (in-memory)
+"""
+import os
+import time
+import uuid
+import queue
+import threading
+from collections import OrderedDict
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class JobQueueFull(RuntimeError):
+    """Antrian job penuh; klien sebaiknya mencoba lagi nanti (503 + Retry-After)"""
+
+
+class Job:
+    """
+    Satu job prediksi. `handler(job)` mengembalikan (payload, http_status);
+    selama berjalan handler memanggil job.advance(stage) untuk tiap tahap.
+    """
+
+    def __init__(self, handler, owner=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.state = JOB_QUEUED
+        self.stages = []  # [{"stage": ..., "at": epoch detik, ...info}]
+        self.result = None
+        self.http_status = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.version = 0  # Naik setiap ada perubahan (untuk SSE)
+        self._handler = handler
+        self._cond = threading.Condition()
+
+    def advance(self, stage, **info):
+        """Catat tahap `stage` (diabaikan jika tahap yang sama sudah tercatat)"""
+        with self._cond:
+            if any(entry["stage"] == stage for entry in self.stages):
+                return
+            self.stages.append({"stage": stage, "at": round(time.time(), 3), **info})
+            self._changed()
+
+    def _set_state(self, state, result=None, http_status=None):
+        with self._cond:
+            self.state = state
+            if state in FINISHED_STATES:
+                self.result = result
+                self.http_status = http_status
+                self.finished_at = time.time()
+                self._handler = None  # Lepas referensi ke byte gambar
+            self._changed()
+
+    def _changed(self):
+        self.version += 1
+        self._cond.notify_all()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def wait_for_update(self, version, timeout=None) -> int:
+        """Blok sampai versi job > `version` atau timeout; kembalikan versi terbaru"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > version, timeout=timeout)
+            return self.version
+
+    def snapshot(self) -> dict:
+        """Representasi JSON job (untuk GET /predict/jobs/<id> dan event SSE)"""
+        with self._cond:
+            return {
+                "job_id": self.id,
+                "state": self.state,
+                "stages": [dict(entry) for entry in self.stages],
+                "result": self.result,
+                "http_status": self.http_status,
+                "created_at": round(self.created_at, 3),
+                "finished_at": round(self.finished_at, 3) if self.finished_at else None,
+            }
+
+
+class JobManager:
+    """
+    Antrian job berukuran tetap + thread worker (dibuat saat submit pertama,
+    dan dibuat ulang di proses hasil fork seperti MicroBatcher).
+    """
+
+    def __init__(self, workers=2, max_queue=32, ttl_seconds=600, max_jobs=1000, name="prediction-jobs"):
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max(max_jobs, self.max_queue + self.workers)
+        self.name = name
+
+        self._jobs = OrderedDict()  # id -> Job, urut waktu dibuat
+        self._lock = threading.Lock()
+        self._queue = None
+        self._threads = []
+        self._pid = None
+
+        # Statistik
+        self._submitted = 0
+        self._rejected = 0
+        self._expired = 0
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+
+    def submit(self, handler, owner=None) -> Job:
+        """Daftarkan job baru; melempar JobQueueFull jika antrian penuh"""
+        job = Job(handler, owner=owner)
+        job.advance(JOB_QUEUED)
+        with self._lock:
+            self._ensure_workers()
+            self._sweep()
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._rejected += 1
+                raise JobQueueFull(f"Antrian job penuh ({self.max_queue})") from None
+            self._jobs[job.id] = job
+            self._submitted += 1
+        return job
+
+    def get(self, job_id, owner=None):
+        """Job dengan id `job_id` milik `owner` (None jika tidak ada / kedaluwarsa / bukan miliknya)"""
+        with self._lock:
+            self._sweep()
+            job = self._jobs.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    def stats(self) -> dict:
+        with self._lock:
+            states = {}
+            for job in self._jobs.values():
+                states[job.state] = states.get(job.state, 0) + 1
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                "stored_jobs": len(self._jobs),
+                "states": states,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "expired": self._expired,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+    # -------------------------------------------------------------------------
+    # Internal
+    # -------------------------------------------------------------------------
+
+    def _ensure_workers(self):
+        """Start thread worker (dipanggil dengan _lock dipegang)"""
+        if self._pid == os.getpid():
+            return
+        # Proses baru (atau hasil fork): thread & antrian lama tidak berlaku
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._jobs.clear()
+        self._threads = []
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _sweep(self):
+        """Hapus job selesai yang melewati TTL, lalu job selesai tertua jika melebihi max_jobs"""
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - job.finished_at > self.ttl_seconds:
+                del self._jobs[job_id]
+                self._expired += 1
+        if len(self._jobs) > self.max_jobs:
+            for job_id, job in list(self._jobs.items()):
+                if len(self._jobs) <= self.max_jobs:
+                    break
+                if job.finished:
+                    del self._jobs[job_id]
+                    self._expired += 1
+
+    def _run(self):
+        job_queue = self._queue
+        while True:
+            try:
+                job = job_queue.get(timeout=self.ttl_seconds or None)
+            except queue.Empty:
+                # Idle: tetap bersihkan job kedaluwarsa
+                with self._lock:
+                    self._sweep()
+                continue
+            handler = job._handler
+            job._set_state(JOB_RUNNING)
+            try:
+                result, http_status = handler(job)
+            except Exception as e:
+                job._set_state(JOB_FAILED, {"status": "error", "message": f"Terjadi kesalahan: {e}"}, 500)
+                continue
+            state = JOB_SUCCEEDED if http_status < 400 else JOB_FAILED
+            job._set_state(state, result, http_status)
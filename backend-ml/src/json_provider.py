@@ -0,0 +1,43 @@
+"""
+JSON provider Flask berbasis orjson untuk payload besar (mis. /history)
+- Serialisasi langsung ke bytes di C, tanpa str perantara seperti json.dumps
+- Hasil sama dengan DefaultJSONProvider: key diurutkan (sort_keys), datetime
+  sebagai HTTP date, Decimal sebagai string, indent saat debug
+- Opsional: tanpa paket orjson, aplikasi tetap memakai provider bawaan Flask
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - tergantung environment
+    orjson = None
+
+
+def orjson_available() -> bool:
+    return orjson is not None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Pasang dengan `app.json = OrjsonProvider(app)`"""
+
+    def _options(self, sort_keys, indent):
+        # Datetime lewat default() (HTTP date) agar sama dengan provider bawaan
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        option = self._options(kwargs.get("sort_keys", self.sort_keys), kwargs.get("indent"))
+        return orjson.dumps(obj, default=kwargs.get("default", self.default), option=option).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        body = orjson.dumps(obj, default=self.default, option=self._options(self.sort_keys, pretty))
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,96 @@
+"""
+Laporan memori proses (Linux /proc)
+- unique: halaman privat proses (Private_Clean + Private_Dirty); hilang jika proses mati
+- shared: halaman yang juga dipetakan proses lain (Shared_Clean + Shared_Dirty),
+  mis. bobot model mmap atau halaman master gunicorn yang belum di-copy-on-write
+- pss: RSS dengan halaman shared dibagi rata ke semua pemakainya
+Dipakai untuk memperkirakan berapa worker/replika muat di satu node:
+biaya worker tambahan ~ unique, bukan RSS.
+"""
+import os
+
+_SMAPS_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared",
+    "Shared_Dirty": "shared",
+    "Private_Clean": "unique",
+    "Private_Dirty": "unique",
+    "Swap": "swap",
+}
+
+
+def _read_kb_fields(path) -> dict:
+    """Parse baris 'Nama:  123 kB' menjadi {nama: kB}"""
+    fields = {}
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    return fields
+
+
+def process_memory(pid=None):
+    """Memori satu proses dalam MB (rss, pss, unique, shared, swap); None jika tidak tersedia"""
+    pid = pid or os.getpid()
+    try:
+        fields = _read_kb_fields(f"/proc/{pid}/smaps_rollup")
+    except OSError:
+        return None
+    usage = {"pid": pid, "rss": 0, "pss": 0, "unique": 0, "shared": 0, "swap": 0}
+    for name, key in _SMAPS_FIELDS.items():
+        usage[key] += fields.get(name, 0)
+    for key in ("rss", "pss", "unique", "shared", "swap"):
+        usage[key] = round(usage[key] / 1024, 1)
+    return usage
+
+
+def child_pids(pid) -> list:
+    """PID anak langsung dari `pid` (mis. worker gunicorn atau worker inference pool)"""
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        return []
+    return sorted(set(children))
+
+
+def available_memory_mb():
+    """MemAvailable node dalam MB (None jika tidak tersedia)"""
+    try:
+        return round(_read_kb_fields("/proc/meminfo")["MemAvailable"] / 1024, 1)
+    except (OSError, KeyError):
+        return None
+
+
+def memory_report(pids) -> dict:
+    """
+    Ringkasan memori sekumpulan proses (master + worker).
+    `additional_workers_estimate` = MemAvailable / rata-rata unique per proses:
+    worker baru hanya menambah halaman privat, halaman shared sudah ada di page cache.
+    """
+    processes = [usage for usage in (process_memory(pid) for pid in pids) if usage]
+    total_unique = round(sum(p["unique"] for p in processes), 1)
+    available = available_memory_mb()
+    mean_unique = total_unique / len(processes) if processes else 0
+    return {
+        "processes": processes,
+        "total_rss_mb": round(sum(p["rss"] for p in processes), 1),
+        "total_pss_mb": round(sum(p["pss"] for p in processes), 1),
+        "total_unique_mb": total_unique,
+        "mem_available_mb": available,
+        "additional_workers_estimate": int(available // mean_unique) if available and mean_unique else None,
+    }
+
+
+def format_process_memory(usage) -> str:
+    """Satu baris log: 'pid 123: unique 85.2 MB, shared 330.1 MB, ...'"""
+    if usage is None:
+        return "memori proses tidak tersedia (/proc/<pid>/smaps_rollup)"
+    return (
+        f"pid {usage['pid']}: unique {usage['unique']} MB, shared {usage['shared']} MB, "
+        f"pss {usage['pss']} MB, rss {usage['rss']} MB"
+    )
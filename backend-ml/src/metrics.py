@@ -0,0 +1,239 @@
+"""
+Metrik Prometheus (GET /metrics)
+- Histogram durasi per tahap pipeline prediksi (decode, validasi kulit,
+  pra-pemrosesan, forward pass, pasca-pemrosesan, simpan riwayat, ...)
+- Histogram durasi setiap fungsi src/database.py (termasuk buka koneksi MySQL
+  dan checkout dari connection pool) + counter kejadian pool
+- Histogram durasi & jumlah record per flush write-behind riwayat diagnosis
+- Counter hasil prediksi per outcome (success / not_skin / low_confidence / ...) dan kelas
+- Gauge status model dan kedalaman antrian, dibaca saat scrape (tanpa biaya di jalur request)
+- Durasi tahap yang terjadi di thread request juga dikumpulkan per request
+  untuk header Server-Timing (start_request_timing / server_timing_header)
+
+Dengan beberapa worker gunicorn, set PROMETHEUS_MULTIPROC_DIR (direktori kosong,
+dibersihkan setiap start) agar histogram & counter semua worker digabung.
+Gauge antrian selalu milik worker yang menjawab scrape.
+"""
+import os
+import time
+import functools
+import contextvars
+
+from prometheus_client import (
+    REGISTRY, CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+)
+from prometheus_client.core import GaugeMetricFamily
+
+# Tahap pipeline prediksi (label `stage`)
+STAGE_UPLOAD_SAVE = "upload_save"      # Jadwalkan/tulis file upload asli
+STAGE_DECODE = "decode"                # Validasi header + decode Pillow
+STAGE_SKIN_CHECK = "skin_check"        # is_likely_skin_image / versi batch
+STAGE_PREPROCESS = "preprocess"        # Resize + crop (uint8)
+STAGE_INFERENCE = "inference"          # Per gambar: antri di micro-batcher + forward pass
+STAGE_FORWARD = "forward"              # Per batch: normalisasi + forward pass + softmax
+STAGE_POSTPROCESS = "postprocess"      # Top-3, threshold confidence
+STAGE_SAVE_DIAGNOSIS = "save_diagnosis"
+STAGES = (
+    STAGE_UPLOAD_SAVE, STAGE_DECODE, STAGE_SKIN_CHECK, STAGE_PREPROCESS,
+    STAGE_INFERENCE, STAGE_FORWARD, STAGE_POSTPROCESS, STAGE_SAVE_DIAGNOSIS,
+)
+
+_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075,
+    0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0,
+)
+
+PREDICT_STAGE_SECONDS = Histogram(
+    "skincheck_predict_stage_seconds", "Durasi tahap pipeline prediksi",
+    ["stage"], buckets=_LATENCY_BUCKETS
+)
+DB_SECONDS = Histogram(
+    "skincheck_db_seconds", "Durasi fungsi src/database.py (connect = buka koneksi MySQL, checkout = pinjam dari pool)",
+    ["function"], buckets=_LATENCY_BUCKETS
+)
+DB_ERRORS = Counter(
+    "skincheck_db_errors_total", "Exception dari fungsi src/database.py", ["function"]
+)
+DB_POOL_EVENTS = Counter(
+    "skincheck_db_pool_events_total",
+    "Kejadian connection pool MySQL (created, recycled, ping_failed, discarded, timeout)", ["event"]
+)
+PREDICTIONS = Counter(
+    "skincheck_predictions_total", "Hasil prediksi per outcome dan kelas (top-1)",
+    ["outcome", "class_name"]
+)
+WRITE_BEHIND_FLUSH_SECONDS = Histogram(
+    "skincheck_write_behind_flush_seconds",
+    "Durasi flush write-behind (pinjam koneksi + multi-row INSERT + commit)", buckets=_LATENCY_BUCKETS
+)
+WRITE_BEHIND_FLUSH_RECORDS = Histogram(
+    "skincheck_write_behind_flush_records", "Jumlah record per flush write-behind",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+BATCH_SIZE = Histogram(
+    "skincheck_inference_batch_size", "Jumlah gambar per forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+# Child per label dibuat sekali; observe() di jalur request tanpa lookup label
+_STAGE_HISTOGRAMS = {stage: PREDICT_STAGE_SECONDS.labels(stage=stage) for stage in STAGES}
+
+_OUTCOMES = ("not_skin", "low_confidence", "server_busy", "model_not_ready")
+
+# List (nama, detik, deskripsi) milik request yang sedang berjalan; None di luar request
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+class stage_timer:
+    """Context manager: catat durasi blok ke histogram tahap `stage`"""
+    __slots__ = ("_stage", "_started")
+
+    def __init__(self, stage):
+        self._stage = stage
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe_stage(self._stage, time.perf_counter() - self._started)
+        return False
+
+
+def observe_write_behind_flush(seconds, records):
+    """Hook on_flush WriteBehindQueue (dipanggil di thread flusher, bukan request)"""
+    WRITE_BEHIND_FLUSH_SECONDS.observe(seconds)
+    WRITE_BEHIND_FLUSH_RECORDS.observe(records)
+
+
+def observe_stage(stage, seconds):
+    """Catat durasi tahap yang diukur sendiri oleh pemanggil"""
+    _STAGE_HISTOGRAMS[stage].observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds, None))
+
+
+def record_prediction(result):
+    """Hitung satu hasil predict_skin_disease per outcome & kelas"""
+    error = result.get('error')
+    if not error:
+        outcome, class_name = "success", result.get('prediction') or ""
+    elif error == "low_confidence":
+        top_3 = result.get('top_3') or [{}]
+        outcome, class_name = error, top_3[0].get('label', "")
+    elif error in _OUTCOMES:
+        outcome, class_name = error, ""
+    else:
+        outcome, class_name = "error", ""
+    PREDICTIONS.labels(outcome=outcome, class_name=class_name).inc()
+
+
+def timed_db(fn):
+    """Dekorator fungsi database: histogram durasi + counter error per nama fungsi"""
+    histogram = DB_SECONDS.labels(function=fn.__name__)
+    errors = DB_ERRORS.labels(function=fn.__name__)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            histogram.observe(elapsed)
+            timings = _request_timings.get()
+            if timings is not None:
+                timings.append(("db", elapsed, fn.__name__))
+    return wrapper
+
+
+def observe_db(function, seconds):
+    """Catat durasi operasi database yang bukan fungsi (mis. buka koneksi)"""
+    DB_SECONDS.labels(function=function).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append(("db", seconds, function))
+
+
+# =============================================================================
+# SERVER-TIMING (per request)
+# =============================================================================
+
+def start_request_timing():
+    """Mulai mengumpulkan durasi tahap untuk request ini; kembalikan token"""
+    return _request_timings.set([])
+
+
+def finish_request_timing(token) -> list:
+    """Akhiri pengumpulan; kembalikan list (nama, detik, deskripsi)"""
+    timings = _request_timings.get() or []
+    _request_timings.reset(token)
+    return timings
+
+
+def server_timing_header(timings, total_seconds=None) -> str:
+    """
+    Nilai header Server-Timing, mis. 'decode;dur=2.1, db;desc="save_diagnosis";dur=4.0, total;dur=31.5'.
+    Tahap dengan nama & deskripsi sama dijumlahkan (urutan kemunculan pertama).
+    """
+    merged = {}
+    for name, seconds, description in timings:
+        merged[(name, description)] = merged.get((name, description), 0.0) + seconds
+    parts = []
+    for (name, description), seconds in merged.items():
+        desc = f';desc="{description}"' if description else ""
+        parts.append(f"{name}{desc};dur={seconds * 1000:.2f}")
+    if total_seconds is not None:
+        parts.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(parts)
+
+
+# =============================================================================
+# GAUGE (dibaca saat scrape)
+# =============================================================================
+
+_gauge_sources = []  # (nama, dokumentasi, nama label, fungsi)
+
+
+def register_gauge(name, documentation, fn, labels=()):
+    """
+    Daftarkan gauge yang nilainya dibaca saat scrape.
+    `fn()` mengembalikan angka, atau {tuple nilai label: angka} jika `labels` diisi.
+    """
+    _gauge_sources.append((name, documentation, tuple(labels), fn))
+
+
+class _LiveGaugeCollector:
+    def collect(self):
+        for name, documentation, labels, fn in list(_gauge_sources):
+            try:
+                value = fn()
+            except Exception:
+                continue  # Sumber belum siap (mis. model belum dimuat)
+            family = GaugeMetricFamily(name, documentation, labels=list(labels))
+            if labels:
+                for label_values, sample in value.items():
+                    family.add_metric(list(label_values), sample)
+            else:
+                family.add_metric([], value)
+            yield family
+
+
+_live_gauges = _LiveGaugeCollector()
+if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    REGISTRY.register(_live_gauges)
+
+
+def render_metrics():
+    """(body, content type) format teks Prometheus untuk GET /metrics"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_live_gauges)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
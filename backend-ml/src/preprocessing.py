@@ -0,0 +1,146 @@
+"""
+Pra-pemrosesan gambar native (pengganti pemanggilan AutoImageProcessor per request)
+- Parameter resize, center crop, rescale dan mean/std dibaca dari config image processor
+- Resize + crop per gambar dengan Pillow (uint8), sama persis dengan backend PIL transformers
+- Rescale + normalisasi + HWC->CHW untuk satu batch sekaligus lewat lookup table
+  float32 per channel, ditulis langsung ke buffer input yang dialokasikan ulang
+  hanya saat batch bertambah besar
+- Hasil bit-identik dengan `processor(images, return_tensors="pt")["pixel_values"]`
+"""
+import threading
+import numpy as np
+import torch
+from PIL import Image
+
+
+class ImagePreprocessor:
+    """Resize/crop per gambar (uint8) lalu normalisasi batch ke buffer float32 reusable"""
+
+    def __init__(self, size, crop_size=None, resample=Image.BICUBIC,
+                 rescale_factor=None, image_mean=None, image_std=None):
+        """
+        size: {"shortest_edge": int} atau {"height": int, "width": int}; None = tanpa resize
+        crop_size: {"height": int, "width": int}; None = tanpa center crop
+        rescale_factor: None = tanpa rescale; image_mean/std: None = tanpa normalisasi
+        """
+        if size is not None and "shortest_edge" not in size and not ("height" in size and "width" in size):
+            raise ValueError(f"Konfigurasi resize tidak didukung: {size}")
+        self.size = size
+        self.crop_size = crop_size
+        self.resample = resample
+        self.input_size = self._output_size()
+        self._lut = self._build_lut(rescale_factor, image_mean, image_std)
+        self._local = threading.local()
+
+    @classmethod
+    def from_processor(cls, processor):
+        """Buat dari image processor transformers (mis. BitImageProcessor DINOv2)"""
+        config = processor.to_dict()
+        if config.get("do_pad"):
+            raise ValueError("Image processor dengan padding tidak didukung")
+        return cls(
+            size=config["size"] if config.get("do_resize", True) else None,
+            crop_size=config["crop_size"] if config.get("do_center_crop") else None,
+            resample=config.get("resample", Image.BILINEAR),
+            rescale_factor=config["rescale_factor"] if config.get("do_rescale", True) else None,
+            image_mean=config["image_mean"] if config.get("do_normalize", True) else None,
+            image_std=config["image_std"] if config.get("do_normalize", True) else None
+        )
+
+    def _output_size(self):
+        if self.crop_size:
+            return self.crop_size["height"], self.crop_size["width"]
+        if self.size and "height" in self.size:
+            return self.size["height"], self.size["width"]
+        return None  # Ukuran bervariasi (tanpa crop & resize tetap)
+
+    @staticmethod
+    def _build_lut(rescale_factor, image_mean, image_std):
+        """
+        Tabel (3, 256) float32: nilai akhir untuk setiap byte per channel.
+        Urutan dan dtype operasi sama dengan transformers: rescale di float64
+        lalu cast ke float32, normalisasi (x - mean) / std di float32.
+        """
+        values = np.arange(256, dtype=np.float64)
+        if rescale_factor is not None:
+            values = values * rescale_factor
+        values = np.repeat(values.astype(np.float32)[np.newaxis], 3, axis=0)
+        if image_mean is not None:
+            mean = np.asarray(image_mean, dtype=np.float32).reshape(3, 1)
+            std = np.asarray(image_std, dtype=np.float32).reshape(3, 1)
+            values = (values - mean) / std
+        return np.ascontiguousarray(values, dtype=np.float32)
+
+    # -------------------------------------------------------------------------
+    # Per gambar (thread request)
+    # -------------------------------------------------------------------------
+
+    def prepare(self, image: Image.Image) -> np.ndarray:
+        """Resize + center crop satu gambar; mengembalikan array (H, W, 3) uint8"""
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if self.size is not None:
+            width, height = image.size
+            if "shortest_edge" in self.size:
+                # Sama dengan get_resize_output_image_size(default_to_square=False)
+                short, long = (width, height) if width <= height else (height, width)
+                new_short = self.size["shortest_edge"]
+                new_long = int(new_short * long / short)
+                new_width, new_height = (new_short, new_long) if width <= height else (new_long, new_short)
+            else:
+                new_width, new_height = self.size["width"], self.size["height"]
+            if (new_width, new_height) != image.size:
+                image = image.resize((new_width, new_height), resample=self.resample)
+        pixels = np.asarray(image)
+        if self.crop_size:
+            pixels = self._center_crop(pixels, self.crop_size["height"], self.crop_size["width"])
+        return pixels
+
+    @staticmethod
+    def _center_crop(pixels, crop_height, crop_width):
+        """Center crop seperti transformers; sisi yang lebih kecil dari crop dipad nol"""
+        height, width = pixels.shape[:2]
+        if height < crop_height or width < crop_width:
+            new_height, new_width = max(height, crop_height), max(width, crop_width)
+            padded = np.zeros((new_height, new_width, 3), dtype=np.uint8)
+            top_pad = -(-(new_height - height) // 2)
+            left_pad = -(-(new_width - width) // 2)
+            padded[top_pad:top_pad + height, left_pad:left_pad + width] = pixels
+            pixels = padded
+            height, width = new_height, new_width
+        top = (height - crop_height) // 2
+        left = (width - crop_width) // 2
+        return pixels[top:top + crop_height, left:left + crop_width]
+
+    # -------------------------------------------------------------------------
+    # Per batch (thread forward pass)
+    # -------------------------------------------------------------------------
+
+    def _buffer(self, batch_size, height, width):
+        """Buffer (N, 3, H, W) float32 per thread; hanya dialokasikan ulang jika kurang besar"""
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or buffer.shape[0] < batch_size or buffer.shape[2:] != (height, width):
+            capacity = max(batch_size, buffer.shape[0] if buffer is not None else 0)
+            buffer = np.empty((capacity, 3, height, width), dtype=np.float32)
+            self._local.buffer = buffer
+        return buffer
+
+    def to_tensor(self, arrays) -> torch.Tensor:
+        """
+        Normalisasi list array (H, W, 3) uint8 hasil `prepare` menjadi tensor (N, 3, H, W).
+        Tensor berbagi memori dengan buffer thread ini: pakai sebelum memanggil
+        to_tensor lagi di thread yang sama.
+        """
+        height, width = arrays[0].shape[:2]
+        buffer = self._buffer(len(arrays), height, width)
+        for i, pixels in enumerate(arrays):
+            if pixels.shape[:2] != (height, width):
+                raise ValueError(f"Ukuran gambar dalam satu batch harus sama: {pixels.shape} vs {(height, width)}")
+            for c in range(3):
+                # mode='clip' menghindari buffering internal; index uint8 selalu valid
+                np.take(self._lut[c], pixels[..., c], out=buffer[i, c], mode='clip')
+        return torch.from_numpy(buffer[:len(arrays)])
+
+    def __call__(self, images) -> torch.Tensor:
+        """prepare + to_tensor untuk list gambar PIL (tensor baru, tidak berbagi buffer)"""
+        return self.to_tensor([self.prepare(image) for image in images]).clone()
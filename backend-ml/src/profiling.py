@@ -0,0 +1,121 @@
+"""
+Profiling per request (opt-in, untuk investigasi request lambat di production)
+- Aktif jika request membawa header X-Profile-Token yang cocok dengan
+  PROFILE_ADMIN_TOKEN, atau terpilih sampling acak PROFILE_SAMPLE_RATE
+- Menulis cProfile (.prof, buka dengan `python -m pstats` / snakeviz) dan trace
+  torch.profiler (.trace.json, buka di chrome://tracing / Perfetto)
+- Direktori output berotasi: hanya `max_profiles` profil terbaru yang disimpan
+- Selama profiling, forward pass dijalankan di thread request (tanpa
+  micro-batcher) agar operator torch ikut tercatat di trace request ini
+"""
+import os
+import hmac
+import time
+import uuid
+import random
+import cProfile
+import threading
+import contextvars
+
+_profiling = contextvars.ContextVar("request_profiling", default=False)
+
+PROFILE_TOKEN_HEADER = "X-Profile-Token"
+
+
+def profiling_active() -> bool:
+    """True jika request di context ini sedang diprofile"""
+    return _profiling.get()
+
+
+class RequestProfiler:
+    """Pemilih request yang diprofile + penulis file profil berotasi"""
+
+    def __init__(self, output_dir, max_profiles=50, sample_rate=0.0, admin_token=None, torch_trace=True):
+        self.output_dir = output_dir
+        self.max_profiles = max(1, max_profiles)
+        self.sample_rate = max(0.0, min(sample_rate, 1.0))
+        self.admin_token = admin_token or None
+        self.torch_trace = torch_trace
+        # torch.profiler hanya boleh aktif satu per proses
+        self._torch_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.admin_token is not None
+
+    def should_profile(self, headers) -> bool:
+        """Header admin yang valid, atau terpilih sampling"""
+        token = headers.get(PROFILE_TOKEN_HEADER)
+        if token and self.admin_token and hmac.compare_digest(token, self.admin_token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, label):
+        """Mulai profiling request ini; kembalikan session untuk .stop()"""
+        session = _ProfileSession(self, label)
+        session.start()
+        return session
+
+    def _rotate(self):
+        """Hapus profil tertua (dikelompokkan per id) melebihi max_profiles"""
+        groups = {}
+        for name in os.listdir(self.output_dir):
+            path = os.path.join(self.output_dir, name)
+            profile_id = name.split('.', 1)[0]
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            paths, newest = groups.get(profile_id, ([], 0))
+            paths.append(path)
+            groups[profile_id] = (paths, max(newest, mtime))
+        ordered = sorted(groups.values(), key=lambda group: group[1], reverse=True)
+        for paths, _ in ordered[self.max_profiles:]:
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+class _ProfileSession:
+    def __init__(self, profiler, label):
+        self.profiler = profiler
+        safe_label = "".join(c if c.isalnum() or c in "-_" else "_" for c in (label or "request"))
+        self.profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:8]}_{safe_label}"
+        self._cprofile = cProfile.Profile()
+        self._torch_profile = None
+        self._token = None
+
+    def start(self):
+        if self.profiler.torch_trace and self.profiler._torch_lock.acquire(blocking=False):
+            # Request lain yang sedang diprofile bersamaan hanya mendapat cProfile
+            from torch.profiler import profile, ProfilerActivity
+            self._torch_profile = profile(activities=[ProfilerActivity.CPU], record_shapes=True)
+            self._torch_profile.__enter__()
+        self._token = _profiling.set(True)
+        try:
+            self._cprofile.enable()
+        except ValueError:
+            # Python >= 3.12: hanya satu profiler aktif sekaligus (sys.monitoring)
+            self._cprofile = None
+
+    def stop(self) -> str:
+        """Hentikan profiling, tulis file, kembalikan id profil"""
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        _profiling.reset(self._token)
+        if self._torch_profile is not None:
+            try:
+                self._torch_profile.__exit__(None, None, None)
+            finally:
+                self.profiler._torch_lock.release()
+
+        os.makedirs(self.profiler.output_dir, exist_ok=True)
+        base = os.path.join(self.profiler.output_dir, self.profile_id)
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(f"{base}.prof")
+        if self._torch_profile is not None:
+            self._torch_profile.export_chrome_trace(f"{base}.trace.json")
+        self.profiler._rotate()
+        return self.profile_id
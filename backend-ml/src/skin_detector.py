@@ -0,0 +1,158 @@
+"""
+Deteksi kulit berbasis warna, versi vektor NumPy
+- Rata-rata RGB, brightness, dan mask kulit HSV dihitung dari satu array piksel
+- Batch API untuk array (N, H, W, 3) uint8
+- Konversi HSV meniru Pillow (`Image.convert('HSV')`) agar keputusan identik
+- Mask kulit diambil dari lookup table 2^24 warna (2 MB, bit-packed) yang
+  dibangun sekali; per gambar hanya satu lookup, bukan konversi HSV penuh
+"""
+import threading
+import numpy as np
+from PIL import Image
+
+# Ukuran analisis warna (tidak perlu resolusi tinggi)
+SKIN_CHECK_SIZE = (200, 200)
+
+# Rentang HSV kulit dalam skala 0-255 Pillow
+# Hue: 0-50 (merah-orange), Saturation: 0.23-0.68, Value: 0.35-1.0
+HUE_MAX = 50
+SAT_MIN, SAT_MAX = 58, 173   # 0.23*255 to 0.68*255
+VAL_MIN = 89                 # 0.35*255
+
+SKIN_PERCENTAGE_MIN = 0.15   # Minimal 15% pixel adalah warna kulit
+
+
+def prepare_skin_pixels(image: Image.Image) -> np.ndarray:
+    """Resize gambar ke SKIN_CHECK_SIZE dan kembalikan array (H, W, 3) uint8"""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return np.asarray(image.resize(SKIN_CHECK_SIZE))
+
+
+def pillow_hsv_skin_mask(pixels: np.ndarray) -> np.ndarray:
+    """
+    Mask kulit HSV untuk array (..., 3) uint8, dihitung langsung (tanpa lookup table).
+
+    Mengikuti rgb2hsv_row di Pillow (Convert.c): s dan h dihitung dalam
+    float32, pembagian dengan 6.0 dan perkalian 255.0 dalam double, lalu
+    dipotong (truncate) ke int.
+    """
+    rgb = pixels.astype(np.int16)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    maxc = rgb.max(axis=-1)
+    minc = rgb.min(axis=-1)
+
+    # V = max(R, G, B); piksel abu-abu (max == min) punya H = S = 0
+    chroma = (maxc - minc).astype(np.float32)
+    gray = chroma == 0
+    safe_chroma = np.where(gray, np.float32(1), chroma)
+
+    s = chroma / np.where(gray, 1, maxc).astype(np.float32)
+    sat = np.where(gray, 0, (s.astype(np.float64) * 255.0).astype(np.int64))
+
+    rc = (maxc - r).astype(np.float32) / safe_chroma
+    gc = (maxc - g).astype(np.float32) / safe_chroma
+    bc = (maxc - b).astype(np.float32) / safe_chroma
+    h = np.where(
+        r == maxc, (bc - gc).astype(np.float64),
+        np.where(g == maxc,
+                 2.0 + rc.astype(np.float64) - bc,
+                 4.0 + gc.astype(np.float64) - rc)
+    ).astype(np.float32)
+    h = np.fmod(h.astype(np.float64) / 6.0 + 1.0, 1.0).astype(np.float32)
+    hue = np.where(gray, 0, (h.astype(np.float64) * 255.0).astype(np.int64))
+
+    return (
+        (hue <= HUE_MAX) &
+        (sat >= SAT_MIN) & (sat <= SAT_MAX) &
+        (maxc >= VAL_MIN)
+    )
+
+
+_skin_lut = None
+_skin_lut_lock = threading.Lock()
+
+
+def build_skin_lut() -> np.ndarray:
+    """
+    Bangun (sekali) lookup table mask kulit untuk seluruh 2^24 warna RGB,
+    bit-packed little-endian dengan index (R << 16) | (G << 8) | B.
+    Dipanggil saat warm-up agar request pertama tidak menanggung biayanya.
+    """
+    global _skin_lut
+    with _skin_lut_lock:
+        if _skin_lut is None:
+            lut = np.empty(1 << 24, dtype=bool)
+            g, b = np.meshgrid(np.arange(256, dtype=np.uint8), np.arange(256, dtype=np.uint8), indexing='ij')
+            pixels = np.stack([np.zeros_like(g), g, b], axis=-1)
+            # Per nilai R agar memori sementara tetap kecil
+            for r in range(256):
+                pixels[..., 0] = r
+                lut[r << 16:(r + 1) << 16] = pillow_hsv_skin_mask(pixels).ravel()
+            _skin_lut = np.packbits(lut, bitorder='little')
+    return _skin_lut
+
+
+def skin_mask(pixels: np.ndarray) -> np.ndarray:
+    """Mask kulit HSV untuk array (..., 3) uint8 lewat lookup table"""
+    lut = _skin_lut if _skin_lut is not None else build_skin_lut()
+    rgb = pixels.astype(np.uint32)
+    index = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+    return ((lut[index >> 3] >> (index & 7).astype(np.uint8)) & 1).astype(bool)
+
+
+def _decide(mean_rgb, skin_percentage) -> dict:
+    """Logika keputusan dari rata-rata RGB dan persentase piksel kulit"""
+    r, g, b = (float(v) for v in mean_rgb)
+    skin_percentage = float(skin_percentage)
+
+    # Check 1: Rentang RGB untuk kulit (R: 95-255, G: 40-200, B: 20-170)
+    in_skin_range = (95 <= r <= 255) and (40 <= g <= 200) and (20 <= b <= 170)
+    # Check 2: Ratio R > G > B (karakteristik kulit)
+    proper_ratio = r > g > b
+    # Check 3: Tidak terlalu gelap atau terlalu terang
+    brightness = (r + g + b) / 3
+    proper_brightness = 60 <= brightness <= 220
+
+    if skin_percentage > SKIN_PERCENTAGE_MIN:
+        return {
+            "is_skin": True,
+            "confidence": min(skin_percentage * 2, 0.95),  # Scale to 0-0.95
+            "reason": f"Terdeteksi {skin_percentage*100:.1f}% area kulit",
+            "skin_percentage": skin_percentage
+        }
+    if in_skin_range and proper_ratio and proper_brightness:
+        return {
+            "is_skin": True,
+            "confidence": 0.6,
+            "reason": "Warna rata-rata konsisten dengan kulit",
+            "skin_percentage": skin_percentage
+        }
+    return {
+        "is_skin": False,
+        "confidence": 0.0,
+        "reason": f"Warna tidak konsisten dengan kulit (RGB: {r:.0f},{g:.0f},{b:.0f}, Skin%: {skin_percentage*100:.1f}%)",
+        "skin_percentage": skin_percentage
+    }
+
+
+def is_likely_skin_batch(pixels: np.ndarray) -> list:
+    """
+    Validasi kulit untuk batch array (N, H, W, 3) uint8.
+    Mengembalikan list dict {"is_skin", "confidence", "reason", "skin_percentage"}.
+    """
+    if pixels.ndim != 4 or pixels.shape[-1] != 3:
+        raise ValueError(f"Butuh array (N, H, W, 3), bukan {pixels.shape}")
+    n = pixels.shape[0]
+    flat = pixels.reshape(n, -1, 3)
+    count = flat.shape[1]
+    # Jumlah per channel lewat matmul float64 (eksak untuk integer), jauh lebih
+    # cepat daripada reduksi sepanjang axis piksel yang ber-stride 3
+    mean_rgb = (np.ones(count) @ flat.astype(np.float64)) / count
+    skin_percentage = np.count_nonzero(skin_mask(flat), axis=1) / count
+    return [_decide(mean_rgb[i], skin_percentage[i]) for i in range(n)]
+
+
+def is_likely_skin(image: Image.Image) -> dict:
+    """Validasi kulit untuk satu gambar PIL"""
+    return is_likely_skin_batch(prepare_skin_pixels(image)[np.newaxis])[0]
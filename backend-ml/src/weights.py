@@ -0,0 +1,147 @@
+"""
+Pemuatan bobot model lewat memory-mapped safetensors
+- Tensor parameter menunjuk langsung ke halaman file model.safetensors (mmap
+  private, copy-on-write) di page cache, bukan salinan di heap proses
+- Semua worker di satu node yang memuat file yang sama berbagi satu salinan
+  bobot read-only; RSS unik per worker tidak lagi berisi bobot model
+- Model dibangun di device 'meta' (tanpa alokasi bobot acak), lalu parameter
+  di-assign ke tensor mmap
+- File mmap ditulis sekali dari state_dict model hasil from_pretrained (nama key
+  sama persis dengan arsitektur versi transformers yang terpasang, float32),
+  lalu dipakai ulang selama checkpoint sumber tidak berubah
+"""
+import os
+import json
+import struct
+import torch
+
+SAFETENSORS_FILENAME = "model.safetensors"
+
+_DTYPES = {
+    "F64": torch.float64, "F32": torch.float32, "F16": torch.float16, "BF16": torch.bfloat16,
+    "I64": torch.int64, "I32": torch.int32, "I16": torch.int16, "I8": torch.int8,
+    "U8": torch.uint8, "BOOL": torch.bool,
+}
+
+
+def read_safetensors_header(path):
+    """Kembalikan (offset awal data, header JSON tanpa __metadata__, metadata)"""
+    with open(path, 'rb') as f:
+        (header_size,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_size))
+    metadata = header.pop("__metadata__", None) or {}
+    return 8 + header_size, header, metadata
+
+
+def load_safetensors_mmap(path) -> dict:
+    """
+    State dict yang tensornya adalah view ke file safetensors yang di-mmap.
+    Tidak ada byte bobot yang disalin; halaman dibaca dari page cache saat dipakai.
+    """
+    data_start, header, _ = read_safetensors_header(path)
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=os.path.getsize(path))
+    raw = torch.empty(0, dtype=torch.uint8).set_(storage)
+
+    state_dict = {}
+    for name, meta in header.items():
+        dtype = _DTYPES.get(meta["dtype"])
+        if dtype is None:
+            raise ValueError(f"dtype safetensors tidak didukung: {meta['dtype']} ({name})")
+        start, end = (data_start + offset for offset in meta["data_offsets"])
+        element_size = torch.empty(0, dtype=dtype).element_size()
+        if start % element_size:
+            raise ValueError(f"Tensor {name} tidak ter-align di file safetensors")
+        state_dict[name] = raw[start:end].view(dtype).view(meta["shape"])
+    return state_dict
+
+
+def find_cached_safetensors(repo_id):
+    """Path model.safetensors REPO di cache HuggingFace lokal (None jika belum ada)"""
+    from huggingface_hub import try_to_load_from_cache
+    path = try_to_load_from_cache(repo_id, SAFETENSORS_FILENAME)
+    return path if isinstance(path, str) and os.path.exists(path) else None
+
+
+def checkpoint_source_id(repo_id) -> str:
+    """
+    Identitas checkpoint sumber: path blob di cache HF (nama blob = hash isi file).
+    Berubah jika checkpoint di-update, sehingga file mmap dibuat ulang.
+    """
+    path = find_cached_safetensors(repo_id)
+    if path is None:
+        return f"{repo_id}@unknown"
+    return f"{repo_id}@{os.path.basename(os.path.realpath(path))}"
+
+
+def serving_weights_valid(path, source_id) -> bool:
+    """True jika file mmap ada dan dibuat dari checkpoint `source_id`"""
+    if not os.path.exists(path):
+        return False
+    try:
+        return read_safetensors_header(path)[2].get("source") == source_id
+    except (OSError, ValueError):
+        return False
+
+
+def save_serving_weights(model, path, source_id):
+    """Tulis state_dict model (float32, contiguous) sebagai safetensors untuk mmap (atomic)"""
+    from safetensors.torch import save_file
+
+    state_dict = {
+        name: tensor.detach().to(torch.float32 if tensor.is_floating_point() else tensor.dtype).contiguous()
+        for name, tensor in model.state_dict().items()
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.part"
+    save_file(state_dict, tmp_path, metadata={"source": source_id})
+    os.replace(tmp_path, path)
+
+
+def load_model_mmap(model_class, config, weights_path):
+    """
+    Bangun `model_class` dari `config` dengan parameter yang menunjuk ke file mmap.
+    Melempar ValueError jika checkpoint tidak cocok persis dengan arsitektur model
+    (pemanggil sebaiknya fallback ke from_pretrained).
+    """
+    state_dict = load_safetensors_mmap(weights_path)
+    with torch.device("meta"):
+        model = model_class.from_config(config)
+    model.eval()
+
+    missing, unexpected = model.load_state_dict(state_dict, strict=False, assign=True)
+    leftover = [name for name, tensor in model.state_dict().items() if tensor.is_meta]
+    if missing or unexpected or leftover:
+        raise ValueError(
+            f"Checkpoint tidak cocok dengan arsitektur (missing={missing[:3]}, "
+            f"unexpected={unexpected[:3]}, belum dimuat={leftover[:3]})"
+        )
+    return model
+
+
+def _mapped_ranges(path):
+    """Rentang alamat (start, end) tempat `path` dipetakan di proses ini (/proc/self/maps)"""
+    target = os.path.realpath(path)
+    ranges = []
+    try:
+        with open("/proc/self/maps") as f:
+            for line in f:
+                parts = line.split(maxsplit=5)
+                if len(parts) == 6 and parts[5].strip() == target:
+                    start, end = (int(address, 16) for address in parts[0].split('-'))
+                    ranges.append((start, end))
+    except OSError:
+        pass
+    return ranges
+
+
+def mmap_weight_fraction(model, weights_path) -> float:
+    """Fraksi byte parameter yang menunjuk ke mmap `weights_path` (1.0 = semua shared)"""
+    ranges = _mapped_ranges(weights_path)
+    total = mapped = 0
+    for tensor in model.state_dict().values():
+        size = tensor.numel() * tensor.element_size()
+        total += size
+        address = tensor.data_ptr()
+        if any(start <= address and address + size <= end for start, end in ranges):
+            mapped += size
+    return mapped / total if total else 0.0
@@ -0,0 +1,396 @@
+"""
+Write-behind queue untuk penyimpanan riwayat diagnosis
+- submit() mencatat record ke spool file lokal (append, opsional fsync) lalu langsung
+  mengembalikan pending id; request tidak menunggu round trip + commit MySQL
+- fsync dengan group commit: append di bawah lock antrian, fsync di luar lock oleh satu
+  pemanggil untuk semua record yang sudah di-append; submit lain yang datang selama fsync
+  berjalan ikut fsync berikutnya, dan flusher tidak ikut menunggu disk
+- Thread flusher menulis record terkumpul sebagai satu multi-row INSERT saat
+  `batch_size` tercapai atau record tertua sudah menunggu `flush_interval` detik
+- Gagal flush (MySQL lambat / mati) dicoba ulang dengan exponential backoff; record
+  tetap di spool. Error permanen per baris (mis. user sudah dihapus) dipisah ke
+  dead-letter file agar tidak menahan antrian
+- Spool per proses (terkunci flock); saat start, spool proses yang sudah mati
+  diadopsi dan record yang belum di-ack diulang (at-least-once; flush_fn harus
+  idempoten per pending id)
+
+Format spool (JSON per baris):
+    {"op": "add", "id": "<pending id>", "record": {...}}
+    {"op": "ack", "ids": ["<pending id>", ...]}
+"""
+import os
+import json
+import time
+import uuid
+import fcntl
+import atexit
+import threading
+from collections import deque
+
+SPOOL_SUFFIX = ".spool"
+DEAD_LETTER_FILE = "dead-letter.jsonl"
+
+
+class WriteBehindFull(RuntimeError):
+    """Record tertunda melebihi max_pending; pemanggil sebaiknya menyimpan secara sinkron"""
+
+
+class _Entry:
+    __slots__ = ("pending_id", "record", "queued_at")
+
+    def __init__(self, pending_id, record, queued_at):
+        self.pending_id = pending_id
+        self.record = record
+        self.queued_at = queued_at
+
+
+class WriteBehindQueue:
+    """
+    `flush_fn(records)` menyimpan list record dalam satu transaksi (melempar exception
+    jika gagal). `is_permanent(exc)` menandai error yang tidak akan sembuh dengan retry.
+    `on_flush(detik, jumlah)` (opsional) dipanggil setiap flush berhasil.
+    """
+
+    def __init__(self, flush_fn, spool_dir, batch_size=100, flush_interval=0.2, max_pending=100000,
+                 fsync=True, backoff_base=0.5, backoff_max=30.0, is_permanent=None, on_flush=None,
+                 compact_bytes=16 * 1024 * 1024, name="write-behind"):
+        self.flush_fn = flush_fn
+        self.spool_dir = spool_dir
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_pending = max(self.batch_size, max_pending)
+        self.fsync = fsync
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.is_permanent = is_permanent or (lambda exc: False)
+        self.on_flush = on_flush
+        self.name = name
+        self.compact_bytes = compact_bytes
+
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._spool = None
+        self._spool_path = None
+        self._pid = None
+
+        # Group commit: nomor urut append terakhir, yang sudah di-fsync, dan apakah fsync sedang berjalan
+        self._sync_cond = threading.Condition()
+        self._appended_seq = 0
+        self._synced_seq = 0
+        self._syncing = False
+
+        # Statistik
+        self._submitted = 0
+        self._flushed = 0
+        self._batches = 0
+        self._failures = 0
+        self._dead_lettered = 0
+        self._recovered = 0
+        self._fsyncs = 0
+        self._last_flush_ms = None
+        self._last_error = None
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+
+    def start(self):
+        """Buka spool dan jalankan flusher di proses ini (idempoten; otomatis saat submit pertama)"""
+        with self._cond:
+            self._ensure_started()
+
+    def submit(self, record, pending_id=None) -> str:
+        """
+        Catat record (dict JSON-serializable) ke spool; kembalikan pending id.
+        `pending_id` dari pemanggil (mis. juga disimpan di record sebagai kunci idempoten)
+        atau dibuat baru.
+        """
+        pending_id = pending_id or uuid.uuid4().hex
+        with self._cond:
+            self._ensure_started()
+            if len(self._pending) >= self.max_pending:
+                raise WriteBehindFull(f"{len(self._pending)} record menunggu flush")
+            self._append({"op": "add", "id": pending_id, "record": record}, sync=False)
+            self._spool.flush()  # Ke page cache: selamat jika proses crash
+            self._appended_seq += 1
+            seq = self._appended_seq
+            self._pending.append(_Entry(pending_id, record, time.monotonic()))
+            self._submitted += 1
+            if len(self._pending) >= self.batch_size or len(self._pending) == 1:
+                self._cond.notify_all()
+        if self.fsync:
+            self._wait_synced(seq)  # Di luar _cond: submit & flusher lain tidak menunggu disk
+        return pending_id
+
+    def flush(self, timeout=None) -> bool:
+        """Tunggu sampai semua record tertunda tersimpan; False jika timeout"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            self._cond.notify_all()
+            while self._pending:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def is_pending(self, pending_id) -> bool:
+        """True jika record masih menunggu flush di proses ini"""
+        with self._cond:
+            return any(entry.pending_id == pending_id for entry in self._pending)
+
+    def stats(self) -> dict:
+        with self._cond:
+            oldest = self._pending[0].queued_at if self._pending else None
+            spool_bytes = 0
+            if self._spool is not None:
+                try:
+                    spool_bytes = os.fstat(self._spool.fileno()).st_size
+                except OSError:
+                    pass
+            return {
+                "pending": len(self._pending),
+                "oldest_pending_seconds": round(time.monotonic() - oldest, 3) if oldest is not None else 0.0,
+                "spool_bytes": spool_bytes,
+                "submitted": self._submitted,
+                "flushed": self._flushed,
+                "batches": self._batches,
+                "failures": self._failures,
+                "dead_lettered": self._dead_lettered,
+                "recovered": self._recovered,
+                "spool_fsyncs": self._fsyncs,
+                "last_flush_ms": self._last_flush_ms,
+                "last_error": self._last_error,
+                "batch_size": self.batch_size,
+                "flush_interval": self.flush_interval,
+            }
+
+    # -------------------------------------------------------------------------
+    # Spool
+    # -------------------------------------------------------------------------
+
+    def _ensure_started(self):
+        """Dipanggil dengan _cond dipegang; proses baru / hasil fork mendapat spool & flusher sendiri"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._pending = deque()
+        self._sync_cond = threading.Condition()
+        self._appended_seq = self._synced_seq = 0
+        self._syncing = False
+        if self._spool is not None:
+            self._spool.close()  # Warisan fork; lock tetap dipegang proses induk
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, f"{self.name}-{os.getpid()}{SPOOL_SUFFIX}")
+        self._spool_path = path
+        self._spool = open(path, "a+b")
+        fcntl.flock(self._spool.fileno(), fcntl.LOCK_EX)
+        # Isi lama (pid dipakai ulang setelah restart) sudah ada di file ini
+        self._spool.seek(0)
+        for entry in self._unacked(self._spool):
+            self._pending.append(entry)
+            self._recovered += 1
+        self._adopt_orphans(path)
+        threading.Thread(target=self._run, name=f"{self.name}-flusher", daemon=True).start()
+        atexit.register(self.flush, timeout=5)
+
+    def _adopt_orphans(self, own_path):
+        """Ambil alih spool proses yang sudah mati (tidak terkunci)"""
+        for name in sorted(os.listdir(self.spool_dir)):
+            path = os.path.join(self.spool_dir, name)
+            if not (name.startswith(f"{self.name}-") and name.endswith(SPOOL_SUFFIX)) or path == own_path:
+                continue
+            try:
+                orphan = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            with orphan:
+                try:
+                    fcntl.flock(orphan.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # Milik proses yang masih hidup
+                if os.fstat(orphan.fileno()).st_nlink == 0:
+                    continue  # Sudah diadopsi proses lain
+                entries = list(self._unacked(orphan))
+                for entry in entries:
+                    self._append({"op": "add", "id": entry.pending_id, "record": entry.record}, sync=False)
+                    self._pending.append(entry)
+                self._sync()
+                self._recovered += len(entries)
+                os.unlink(path)
+
+    @staticmethod
+    def _unacked(spool):
+        """Record `add` yang belum di-ack, urut seperti ditulis"""
+        added = {}
+        for line in spool:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue  # Baris terakhir terpotong saat crash
+            if item.get("op") == "add":
+                added[item["id"]] = item["record"]
+            elif item.get("op") == "ack":
+                for pending_id in item["ids"]:
+                    added.pop(pending_id, None)
+        now = time.monotonic()
+        return [_Entry(pending_id, record, now) for pending_id, record in added.items()]
+
+    def _append(self, item, sync=True):
+        self._spool.write(json.dumps(item, separators=(",", ":")).encode("utf-8") + b"\n")
+        if sync:
+            self._sync()
+
+    def _sync(self):
+        self._spool.flush()
+        if self.fsync:
+            os.fsync(self._spool.fileno())
+
+    def _wait_synced(self, seq):
+        """
+        Group commit: kembali setelah append nomor `seq` di-fsync. Satu pemanggil menjadi
+        leader dan men-fsync semua yang sudah di-append; sisanya menunggu hasilnya.
+        """
+        with self._sync_cond:
+            while self._synced_seq < seq:
+                if not self._syncing:
+                    self._syncing = True
+                    break
+                self._sync_cond.wait()
+            else:
+                return
+        synced = self._synced_seq
+        try:
+            with self._cond:
+                target = self._appended_seq
+                # dup: kompaksi boleh mengganti & menutup file spool selama fsync berjalan
+                fd = os.dup(self._spool.fileno())
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            synced = target
+        finally:
+            with self._sync_cond:
+                self._synced_seq = max(self._synced_seq, synced)
+                self._syncing = False
+                self._fsyncs += 1
+                self._sync_cond.notify_all()
+
+    def _acknowledge(self, entries):
+        """Dipanggil dengan _cond dipegang setelah entries (selalu terdepan di antrian) tersimpan"""
+        for _ in entries:
+            self._pending.popleft()
+        # Tanpa fsync di bawah lock: ack yang hilang saat crash hanya membuat record diulang
+        # (flush_fn idempoten), dan ikut ter-fsync oleh group commit berikutnya
+        if not self._pending:
+            # Semua sudah tersimpan: spool cukup dikosongkan
+            self._spool.truncate(0)
+        elif os.fstat(self._spool.fileno()).st_size >= self.compact_bytes:
+            self._compact()
+        else:
+            self._append({"op": "ack", "ids": [entry.pending_id for entry in entries]}, sync=False)
+            self._spool.flush()
+        self._cond.notify_all()
+
+    def _compact(self):
+        """Tulis ulang spool hanya berisi record tertunda (antrian tidak pernah kosong di beban tinggi)"""
+        path = self._spool_path
+        tmp_path = f"{path}.compact"
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)  # Sisa kompaksi yang terputus
+        compacted = open(tmp_path, "a+b")  # Mode append: tulis selalu di akhir, juga setelah truncate
+        fcntl.flock(compacted.fileno(), fcntl.LOCK_EX)  # Sudah terkunci sebelum terlihat proses lain
+        for entry in self._pending:
+            compacted.write(json.dumps({"op": "add", "id": entry.pending_id, "record": entry.record},
+                                       separators=(",", ":")).encode("utf-8") + b"\n")
+        compacted.flush()
+        os.fsync(compacted.fileno())
+        os.replace(tmp_path, path)
+        self._spool.close()
+        self._spool = compacted
+
+    def _dead_letter(self, entry, error):
+        path = os.path.join(self.spool_dir, DEAD_LETTER_FILE)
+        line = json.dumps({"id": entry.pending_id, "record": entry.record, "error": str(error),
+                           "at": time.time()}, separators=(",", ":"))
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        print(f"⚠️ Write-behind: record {entry.pending_id} dipindah ke {path}: {error}")
+
+    # -------------------------------------------------------------------------
+    # Flusher
+    # -------------------------------------------------------------------------
+
+    def _next_batch(self):
+        """Tunggu batch penuh atau record tertua melewati flush_interval"""
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            while len(self._pending) < self.batch_size:
+                remaining = self._pending[0].queued_at + self.flush_interval - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return [self._pending[i] for i in range(min(self.batch_size, len(self._pending)))]
+
+    def _run(self):
+        attempt = 0
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            try:
+                self.flush_fn([entry.record for entry in batch])
+            except Exception as e:
+                error = e
+                if self.is_permanent(e):
+                    error = self._flush_individually(batch)
+                    if error is None:
+                        attempt = 0
+                        continue
+                # Error sementara (juga di tengah flush per baris): backoff sebelum mencoba lagi
+                attempt += 1
+                self._backoff(attempt, len(batch), error)
+                continue
+            attempt = 0
+            elapsed = time.perf_counter() - started
+            self._flushed_ok(batch, elapsed)
+
+    def _backoff(self, attempt, count, error):
+        delay = min(self.backoff_base * 2 ** (attempt - 1), self.backoff_max)
+        with self._cond:
+            self._failures += 1
+            self._last_error = f"{type(error).__name__}: {error}"
+        print(f"⚠️ Write-behind: flush {count} record gagal ({error}); coba lagi dalam {delay:.1f} detik")
+        time.sleep(delay)
+
+    def _flush_individually(self, batch):
+        """
+        Batch gagal karena error permanen: simpan per baris, baris yang gagal ke dead-letter.
+        Mengembalikan error sementara yang menghentikannya (sisa batch diulang setelah
+        backoff), atau None jika seluruh batch sudah diproses.
+        """
+        for entry in batch:
+            started = time.perf_counter()
+            try:
+                self.flush_fn([entry.record])
+            except Exception as e:
+                if not self.is_permanent(e):
+                    return e  # MySQL bermasalah lagi
+                self._dead_letter(entry, e)
+                with self._cond:
+                    self._dead_lettered += 1
+                    self._acknowledge([entry])
+                continue
+            self._flushed_ok([entry], time.perf_counter() - started)
+        return None
+
+    def _flushed_ok(self, entries, elapsed):
+        with self._cond:
+            self._acknowledge(entries)
+            self._flushed += len(entries)
+            self._batches += 1
+            self._last_flush_ms = round(elapsed * 1000, 2)
+            self._last_error = None
+        if self.on_flush is not None:
+            self.on_flush(elapsed, len(entries))
@@ -0,0 +1,161 @@
+"""
+Test AdmissionController (src/admission.py): budget latency, deadline,
+klien terputus, prioritas lane user login, dan waktu layanan per putaran
+(batch besar, cache hit dan blok yang gagal tidak mendistorsi EWMA)
+
+Jalankan:
+    python test_admission.py
+    python -m pytest test_admission.py
+"""
+import time
+import threading
+
+from src.admission import (
+    AdmissionController, AdmissionRejected,
+    LANE_AUTHENTICATED, LANE_ANONYMOUS,
+    REJECT_OVERLOADED, REJECT_DEADLINE, REJECT_DISCONNECTED
+)
+
+
+def occupy(controller, lane=LANE_AUTHENTICATED, cost=1):
+    """Ambil slot di thread lain; kembalikan Event untuk melepasnya"""
+    release = threading.Event()
+    started = threading.Event()
+
+    def run():
+        with controller.admit(lane, cost=cost):
+            started.set()
+            release.wait(5)
+
+    threading.Thread(target=run, daemon=True).start()
+    assert started.wait(5)
+    return release
+
+
+def expect_rejected(reason, fn):
+    try:
+        fn()
+    except AdmissionRejected as e:
+        assert e.reason == reason, e.reason
+        assert e.retry_after >= 1
+        return e
+    raise AssertionError(f"harus ditolak ({reason})")
+
+
+def test_rejects_when_estimate_exceeds_budget():
+    controller = AdmissionController(capacity=1, budgets_ms={LANE_AUTHENTICATED: 250, LANE_ANONYMOUS: 150})
+    with controller.admit(LANE_ANONYMOUS):
+        time.sleep(0.1)  # EWMA layanan ~100 ms
+    release = occupy(controller)
+    try:
+        # Satu pekerjaan di depan: perkiraan ~200 ms (> budget anonim, < budget login)
+        error = expect_rejected(REJECT_OVERLOADED, lambda: controller.admit(LANE_ANONYMOUS))
+        assert error.estimated_ms > 150
+        threading.Timer(0.05, release.set).start()
+        with controller.admit(LANE_AUTHENTICATED, deadline=time.monotonic() + 2):
+            pass
+    finally:
+        release.set()
+    stats = controller.stats()
+    assert stats["rejected"][LANE_ANONYMOUS][REJECT_OVERLOADED] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_queued_request_dropped_on_deadline_and_disconnect():
+    controller = AdmissionController(capacity=1, budgets_ms={}, poll_interval=0.01)
+    release = occupy(controller)
+    try:
+        started = time.monotonic()
+        expect_rejected(REJECT_DEADLINE, lambda: controller.admit(LANE_ANONYMOUS, deadline=time.monotonic() + 0.1))
+        assert time.monotonic() - started < 1
+        expect_rejected(REJECT_DISCONNECTED, lambda: controller.admit(LANE_ANONYMOUS, is_disconnected=lambda: True))
+        assert sum(controller.stats()["queued"].values()) == 0
+    finally:
+        release.set()
+
+
+def test_authenticated_lane_served_first():
+    controller = AdmissionController(capacity=1, budgets_ms={})
+    release = occupy(controller)
+    order = []
+
+    def wait_in(lane):
+        with controller.admit(lane, deadline=time.monotonic() + 5):
+            order.append(lane)
+
+    anonymous = threading.Thread(target=wait_in, args=(LANE_ANONYMOUS,))
+    anonymous.start()
+    time.sleep(0.1)
+    authenticated = threading.Thread(target=wait_in, args=(LANE_AUTHENTICATED,))
+    authenticated.start()
+    time.sleep(0.1)
+    release.set()
+    anonymous.join(5)
+    authenticated.join(5)
+    assert order == [LANE_AUTHENTICATED, LANE_ANONYMOUS], order
+
+
+def test_cost_counts_against_capacity():
+    controller = AdmissionController(capacity=4, budgets_ms={})
+    release = occupy(controller, cost=3)
+    try:
+        expect_rejected(REJECT_DEADLINE, lambda: controller.admit(LANE_AUTHENTICATED, cost=2, deadline=time.monotonic() + 0.1))
+        with controller.admit(LANE_AUTHENTICATED, cost=1):
+            assert controller.stats()["in_flight"] == 4
+    finally:
+        release.set()
+
+
+def test_large_batch_does_not_trip_single_requests():
+    controller = AdmissionController(capacity=4, budgets_ms={LANE_AUTHENTICATED: 250, LANE_ANONYMOUS: 250})
+    with controller.admit(LANE_AUTHENTICATED, cost=12):
+        time.sleep(0.3)  # 12 gambar = 3 putaran x ~100 ms
+    service_ms = controller.stats()["service_ms_ewma"]
+    assert 90 <= service_ms < 200, service_ms
+    for _ in range(3):
+        with controller.admit(LANE_ANONYMOUS):
+            time.sleep(0.1)
+    assert controller.stats()["rejected"][LANE_ANONYMOUS][REJECT_OVERLOADED] == 0
+    # Batch besar sendiri tetap diperkirakan sesuai jumlah putarannya
+    error = expect_rejected(REJECT_OVERLOADED, lambda: controller.admit(LANE_AUTHENTICATED, cost=12))
+    assert error.estimated_ms >= 3 * 90
+
+
+def test_cache_hits_and_failures_not_sampled():
+    controller = AdmissionController(capacity=4, budgets_ms={})
+    with controller.admit(LANE_AUTHENTICATED):
+        time.sleep(0.1)
+    service_ms = controller.stats()["service_ms_ewma"]
+    for _ in range(5):
+        with controller.admit(LANE_AUTHENTICATED) as admitted:
+            admitted.set_work(0)  # Cache hit: tidak ada forward pass
+    try:
+        with controller.admit(LANE_AUTHENTICATED):
+            time.sleep(0.3)
+            raise RuntimeError("forward gagal")
+    except RuntimeError:
+        pass
+    stats = controller.stats()
+    assert stats["service_ms_ewma"] == service_ms and stats["in_flight"] == 0
+
+
+if __name__ == "__main__":
+    tests = [
+        test_rejects_when_estimate_exceeds_budget,
+        test_queued_request_dropped_on_deadline_and_disconnect,
+        test_authenticated_lane_served_first,
+        test_cost_counts_against_capacity,
+        test_large_batch_does_not_trip_single_requests,
+        test_cache_hits_and_failures_not_sampled,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 50)
+    print("✅ Semua test admission lolos" if not failed else f"❌ {failed} test gagal")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,200 @@
+"""
+Test PredictionCache (src/cache.py): batas LRU, tier disk antar instance,
+single-flight (tunggal & batch, termasuk duplikat dalam batch) dan invalidasi
+saat revisi model berubah
+
+Jalankan:
+    python test_cache.py
+    python -m pytest test_cache.py
+"""
+import os
+import time
+import tempfile
+import threading
+
+from PIL import Image
+
+from src.cache import PredictionCache, image_cache_key
+
+
+def result(label):
+    return {"prediction": label, "top_3": [{"label": label, "confidence": 90.0}]}
+
+
+def test_lru_bound_and_recency():
+    cache = PredictionCache("rev-a", max_entries=2)
+    cache.set("k1", result("a"))
+    cache.set("k2", result("b"))
+    assert cache.get("k1")["prediction"] == "a"  # k1 jadi paling baru dipakai
+    cache.set("k3", result("c"))
+    assert cache.get("k2") is None
+    assert cache.get("k1") is not None and cache.get("k3") is not None
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+
+
+def test_returned_values_are_copies():
+    cache = PredictionCache("rev-a")
+    cache.set("k", result("a"))
+    cache.get("k")["prediction"] = "diubah"
+    assert cache.get("k")["prediction"] == "a"
+
+
+def test_disk_tier_shared_between_instances():
+    root = tempfile.mkdtemp(prefix="cache-")
+    writer = PredictionCache("rev-a", max_entries=1, disk_dir=root)
+    writer.set("k1", result("a"))
+    writer.set("k2", result("b"))  # k1 keluar dari memory, tetap di disk
+    assert writer.get("k1")["prediction"] == "a"
+    reader = PredictionCache("rev-a", disk_dir=root)  # Worker lain di host yang sama
+    assert reader.get("k2")["prediction"] == "b"
+    assert reader.stats()["disk_hits"] == 1
+    assert reader.get("k2") is not None and reader.stats()["hits"] == 1
+
+
+def test_revision_change_invalidates():
+    root = tempfile.mkdtemp(prefix="cache-")
+    PredictionCache("rev-a", disk_dir=root).set("k", result("a"))
+    newer = PredictionCache("rev-b", disk_dir=root)
+    assert newer.get("k") is None
+    assert os.listdir(root) == ["rev-b"]
+    image = Image.new("RGB", (4, 4), (200, 150, 120))
+    assert image_cache_key(image, "rev-a") != image_cache_key(image, "rev-b")
+    assert image_cache_key(image, "rev-a") == image_cache_key(image.convert("RGBA"), "rev-a")
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    cache = PredictionCache("rev-a")
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return result("a")
+
+    values = []
+    threads = [threading.Thread(target=lambda: values.append(cache.get_or_compute("k", compute)))
+               for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and len(values) == 5
+    assert all(value == result("a") for value in values)
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_failed_compute_not_cached():
+    cache = PredictionCache("rev-a")
+
+    def fail():
+        raise RuntimeError("forward gagal")
+
+    try:
+        cache.get_or_compute("k", fail)
+        raise AssertionError("exception compute harus diteruskan")
+    except RuntimeError:
+        pass
+    assert cache.get_or_compute("k", lambda: result("a"))["prediction"] == "a"
+
+
+def test_batch_dedupes_and_skips_cached():
+    cache = PredictionCache("rev-a")
+    cache.set("k1", result("a"))
+    requested = []
+
+    def compute_many(missing):
+        requested.append(list(missing))
+        return {key: result(key) for key in missing}
+
+    values = cache.get_or_compute_many(["k1", "k2", "k2", "k3"], compute_many)
+    assert requested == [["k2", "k3"]]
+    assert values["k1"]["prediction"] == "a" and values["k2"]["prediction"] == "k2"
+    assert cache.get("k3") is not None
+
+
+def test_batch_failures_per_key_not_cached():
+    cache = PredictionCache("rev-a")
+    error = ValueError("gambar rusak")
+    values = cache.get_or_compute_many(["k1", "k2"], lambda missing: {"k1": result("a"), "k2": error})
+    assert values["k2"] is error
+    assert cache.get("k1") is not None and cache.get("k2") is None
+
+
+def test_batch_waits_for_inflight_single_request():
+    cache = PredictionCache("rev-a")
+    started, release = threading.Event(), threading.Event()
+
+    def slow_compute():
+        started.set()
+        release.wait(5)
+        return result("single")
+
+    single = threading.Thread(target=lambda: cache.get_or_compute("k1", slow_compute))
+    single.start()
+    started.wait(5)
+    requested = []
+
+    def compute_many(missing):
+        requested.extend(missing)
+        release.set()
+        return {key: result(key) for key in missing}
+
+    values = cache.get_or_compute_many(["k1", "k2"], compute_many)
+    single.join()
+    assert requested == ["k2"]
+    assert values["k1"]["prediction"] == "single"
+    assert cache.stats()["coalesced"] == 1
+
+
+def test_single_request_waits_for_batch():
+    cache = PredictionCache("rev-a")
+    started, release = threading.Event(), threading.Event()
+
+    def slow_compute_many(missing):
+        started.set()
+        release.wait(5)
+        return {key: result("batch") for key in missing}
+
+    batch = threading.Thread(target=lambda: cache.get_or_compute_many(["k1"], slow_compute_many))
+    batch.start()
+    started.wait(5)
+    values = []
+    single = threading.Thread(target=lambda: values.append(
+        cache.get_or_compute("k1", lambda: result("single"))))
+    single.start()
+    time.sleep(0.05)
+    release.set()
+    batch.join()
+    single.join()
+    assert values == [result("batch")]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_lru_bound_and_recency,
+        test_returned_values_are_copies,
+        test_disk_tier_shared_between_instances,
+        test_revision_change_invalidates,
+        test_single_flight_coalesces_concurrent_calls,
+        test_failed_compute_not_cached,
+        test_batch_dedupes_and_skips_cached,
+        test_batch_failures_per_key_not_cached,
+        test_batch_waits_for_inflight_single_request,
+        test_single_request_waits_for_batch,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 50)
+    print("✅ Semua test prediction cache lolos" if not failed else f"❌ {failed} test gagal")
+    raise SystemExit(1 if failed else 0)
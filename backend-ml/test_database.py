@@ -0,0 +1,350 @@
+"""
+Test src/database.py tanpa server MySQL: koneksi tiruan di atas SQLite in-memory
+yang menerjemahkan dialek MySQL yang dipakai modul (placeholder %s, ON DUPLICATE
+KEY UPDATE, FROM_UNIXTIME, information_schema.columns): INSERT write-behind yang
+idempoten per write_id, validasi pagination riwayat, counter user_diagnosis_stats
+(dijaga saat simpan/hapus, verifikasi dan rebuild dari riwayat), dan deteksi
+layout tabel riwayat lama yang belum dimigrasi
+
+Jalankan:
+    python test_database.py
+    python -m pytest test_database.py
+"""
+import re
+import time
+import sqlite3
+import datetime
+from contextlib import contextmanager
+
+import pymysql
+from pymysql.constants import ER
+
+from src import database
+
+SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(50) UNIQUE NOT NULL,
+    email VARCHAR(100) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    full_name VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE diagnosis_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    class_id SMALLINT NOT NULL,
+    confidence DECIMAL(5,4) NOT NULL,
+    severity TEXT,
+    top_3 BLOB,
+    image_filename VARCHAR(255),
+    write_id CHAR(32) UNIQUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE user_diagnosis_stats (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    severity VARCHAR(20) NOT NULL DEFAULT '',
+    diagnosis_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, severity)
+);
+"""
+
+# Tabel riwayat lama setelah tahap expand (kolom compact sudah ditambahkan, belum dikontrak)
+LEGACY_SCHEMA = SCHEMA.replace("""    class_id SMALLINT NOT NULL,
+    confidence DECIMAL(5,4) NOT NULL,
+    severity TEXT,""", """    condition_name VARCHAR(100) NOT NULL,
+    description TEXT,
+    recommendation TEXT,
+    top_3_predictions TEXT,
+    confidence DECIMAL(5,4) NOT NULL,
+    severity VARCHAR(20),
+    class_id SMALLINT,
+    severity_level TEXT,""")
+
+
+class FakeCursor:
+    """Cursor tiruan dengan antarmuka PyMySQL DictCursor"""
+
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+
+    @staticmethod
+    def _translate(sql):
+        sql = re.sub(r"SELECT column_name AS name FROM information_schema\.columns\s+"
+                     r"WHERE table_schema = DATABASE\(\) AND table_name = %s",
+                     "SELECT name FROM pragma_table_info(%s)", sql)
+        sql = sql.replace("%s", "?").replace(" FOR UPDATE", "")
+        sql = sql.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET")
+        return re.sub(r"\bVALUES\((\w+)\)", r"excluded.\1", sql)
+
+    def execute(self, sql, params=()):
+        try:
+            self._cursor.execute(self._translate(sql), tuple(params or ()))
+        except sqlite3.IntegrityError as e:
+            if "NOT NULL" not in str(e):
+                raise
+            # Error MySQL untuk kolom NOT NULL tanpa default yang tidak diisi INSERT
+            raise pymysql.err.OperationalError(ER.NO_DEFAULT_FOR_FIELD, str(e)) from e
+        return self._cursor.rowcount
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(self._translate(sql), [tuple(p) for p in seq_of_params])
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return dict(row) if row is not None else None
+
+    def fetchall(self):
+        return [dict(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return (dict(row) for row in self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class FakeConnection:
+    def __init__(self, schema=SCHEMA):
+        self.db = sqlite3.connect(":memory:")
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.create_function(
+            "FROM_UNIXTIME", 1,
+            lambda ts: datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+        )
+        self.db.executescript(schema)
+        self.commits = 0
+
+    def cursor(self, *args):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        self.commits += 1
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def rows(self, sql, params=()):
+        return [dict(row) for row in self.db.execute(sql, params)]
+
+
+@contextmanager
+def fake_database(schema=SCHEMA, layout=None):
+    """Arahkan get_db_connection di src.database ke satu FakeConnection (layout None = belum dideteksi)"""
+    conn = FakeConnection(schema)
+
+    @contextmanager
+    def get_db_connection():
+        yield conn
+
+    original = database.get_db_connection, database._history_layout
+    database.get_db_connection, database._history_layout = get_db_connection, layout
+    try:
+        conn.user_id = database.create_user("budi", "budi@example.com", "hash")["id"]
+        yield conn
+    finally:
+        database.get_db_connection, database._history_layout = original
+
+
+def flush_record(user_id, write_id, severity="low", class_index=0):
+    return {
+        "user_id": user_id,
+        "condition": database.CLASS_NAMES[class_index],
+        "confidence": 0.9,
+        "severity": severity,
+        "image_filename": None,
+        "top_3_predictions": [{"label": database.CLASS_NAMES[class_index], "confidence": 90.0}],
+        "class_index": class_index,
+        "created_at": time.time(),
+        "write_id": write_id,
+    }
+
+
+def stats(conn):
+    return {row["severity"]: row["diagnosis_count"]
+            for row in conn.rows("SELECT severity, diagnosis_count FROM user_diagnosis_stats")}
+
+
+def test_write_behind_replay_not_duplicated():
+    with fake_database() as conn:
+        first = [flush_record(conn.user_id, "a" * 32), flush_record(conn.user_id, "b" * 32, "high")]
+        assert database.insert_diagnoses_multirow(first) == 2
+        # Replay setelah crash / balasan COMMIT hilang: hanya record baru yang disimpan
+        replay = first + [flush_record(conn.user_id, "c" * 32)]
+        assert database.insert_diagnoses_multirow(replay) == 1
+        assert conn.rows("SELECT COUNT(*) AS n FROM diagnosis_history")[0]["n"] == 3
+        assert stats(conn) == {"low": 2, "high": 1}
+
+
+def test_duplicate_write_id_in_batch_saved_once():
+    with fake_database() as conn:
+        record = flush_record(conn.user_id, "d" * 32)
+        assert database.insert_diagnoses_multirow([record, dict(record)]) == 1
+        assert stats(conn) == {"low": 1}
+
+
+def test_records_without_write_id_still_saved():
+    # Spool dari versi sebelum kolom write_id
+    with fake_database() as conn:
+        record = flush_record(conn.user_id, None)
+        assert database.insert_diagnoses_multirow([record, dict(record)]) == 2
+        assert stats(conn) == {"low": 2}
+
+
+def test_pending_id_resolves_to_diagnosis():
+    with fake_database() as conn:
+        database.insert_diagnoses_multirow([flush_record(conn.user_id, "e" * 32, class_index=3)])
+        diagnosis = database.get_diagnosis_by_write_id("e" * 32, conn.user_id)
+        assert diagnosis["id"] == 1 and diagnosis["condition"] == database.CLASS_NAMES[3]
+        assert database.get_diagnosis_by_write_id("e" * 32, conn.user_id + 1) is None
+        assert database.get_diagnosis_by_write_id("f" * 32, conn.user_id) is None
+
+
+def test_history_page_bounds():
+    with fake_database() as conn:
+        database.save_diagnoses_bulk([flush_record(conn.user_id, None) for _ in range(2)])
+        for kwargs in ({"per_page": 0}, {"per_page": -1}, {"per_page": 101}, {"page": 0}):
+            try:
+                database.get_user_history(conn.user_id, **kwargs)
+                raise AssertionError(f"{kwargs} harus ditolak")
+            except ValueError:
+                pass
+        page = database.get_user_history(conn.user_id, 1, 1)
+        assert len(page["data"]) == 1 and page["has_more"] and page["total"] == 2
+        rest = database.get_user_history(conn.user_id, per_page=1, after=page["next_cursor"])
+        assert len(rest["data"]) == 1 and not rest["has_more"]
+        assert rest["data"][0]["id"] != page["data"][0]["id"]
+
+
+def test_stats_counters_follow_writes_and_deletes():
+    with fake_database() as conn:
+        high_id = database.save_diagnosis(conn.user_id, database.CLASS_NAMES[1], 0.8, severity="high")
+        database.save_diagnoses_bulk([flush_record(conn.user_id, None, severity) for severity in
+                                      ("low", "low", None, "bukan-severity")])
+        assert stats(conn) == {"high": 1, "low": 2, "": 2}
+        assert database.get_user_statistics(conn.user_id) == {
+            "total_diagnoses": 5, "severity_distribution": {"high": 1, "low": 2, "unknown": 2}}
+
+        assert database.delete_diagnosis(high_id, conn.user_id)
+        assert not database.delete_diagnosis(high_id, conn.user_id)  # Tidak dikurangi dua kali
+        assert not database.delete_diagnosis(high_id + 1, conn.user_id + 1)  # Bukan pemilik
+        assert stats(conn) == {"high": 0, "low": 2, "": 2}
+        assert database.get_user_statistics(conn.user_id)["severity_distribution"] == {"low": 2, "unknown": 2}
+        assert database.verify_user_statistics() == []
+
+
+def test_delete_all_history_removes_stats():
+    with fake_database() as conn:
+        other = database.create_user("ani", "ani@example.com", "hash")["id"]
+        database.save_diagnoses_bulk([flush_record(conn.user_id, None), flush_record(other, None, "high")])
+        assert database.delete_all_user_history(conn.user_id) == 1
+        assert conn.rows("SELECT user_id, severity, diagnosis_count FROM user_diagnosis_stats") == [
+            {"user_id": other, "severity": "high", "diagnosis_count": 1}]
+        assert database.get_user_statistics(conn.user_id) == {"total_diagnoses": 0, "severity_distribution": {}}
+
+
+def test_stats_backfill_is_idempotent():
+    # init_db bersamaan di dua proses: backfill kedua menimpa counter, bukan gagal duplicate key
+    with fake_database() as conn:
+        database.save_diagnoses_bulk([flush_record(conn.user_id, None, severity) for severity in ("low", "low", None)])
+        conn.db.execute("UPDATE user_diagnosis_stats SET diagnosis_count = 9 WHERE severity = 'low'")
+        for _ in range(2):
+            database._backfill_stats(conn.cursor())
+        assert stats(conn) == {"low": 2, "": 1}
+
+
+def test_verify_and_rebuild_after_drift():
+    with fake_database() as conn:
+        other = database.create_user("ani", "ani@example.com", "hash")["id"]
+        database.save_diagnoses_bulk([flush_record(conn.user_id, None), flush_record(conn.user_id, None, None),
+                                      flush_record(other, None, "medium")])
+        # Counter bergeser (mis. baris dihapus manual di luar aplikasi)
+        conn.db.execute("UPDATE user_diagnosis_stats SET diagnosis_count = 7 WHERE severity = 'low'")
+        conn.db.execute("INSERT INTO user_diagnosis_stats VALUES (?, 'high', 2)", (conn.user_id,))
+        conn.db.execute("DELETE FROM user_diagnosis_stats WHERE user_id = ?", (other,))
+        assert database.verify_user_statistics() == [
+            {"user_id": conn.user_id, "severity": "high", "expected": 0, "actual": 2},
+            {"user_id": conn.user_id, "severity": "low", "expected": 1, "actual": 7},
+            {"user_id": other, "severity": "medium", "expected": 1, "actual": 0},
+        ]
+
+        assert database.rebuild_user_statistics([other]) == 1
+        assert database.verify_user_statistics([other]) == []
+        assert len(database.verify_user_statistics([conn.user_id])) == 2
+
+        assert database.rebuild_user_statistics(batch_size=1) == 2
+        assert database.verify_user_statistics() == []
+        assert stats(conn) == {"low": 1, "": 1, "medium": 1}
+
+
+def test_layout_detected_on_first_write():
+    with fake_database(LEGACY_SCHEMA) as conn:
+        database.save_diagnosis(conn.user_id, database.CLASS_NAMES[2], 0.7, severity="medium")
+        assert database._history_layout == database.HISTORY_LAYOUT_MIGRATING
+        assert conn.rows("SELECT condition_name, class_id, severity, severity_level FROM diagnosis_history") == [
+            {"condition_name": database.CLASS_NAMES[2], "class_id": 2, "severity": "medium",
+             "severity_level": "medium"}]
+    with fake_database() as conn:
+        database.save_diagnosis(conn.user_id, database.CLASS_NAMES[2], 0.7)
+        assert database._history_layout == database.HISTORY_LAYOUT_COMPACT
+
+
+def test_stale_compact_layout_retried_on_legacy_table():
+    # Layout basi (mis. tabel dikembalikan ke versi lama): INSERT compact ditolak MySQL
+    # dengan NO_DEFAULT_FOR_FIELD, dideteksi ulang lalu diulang sekali, bukan gagal terus
+    with fake_database(LEGACY_SCHEMA, layout=database.HISTORY_LAYOUT_COMPACT) as conn:
+        records = [flush_record(conn.user_id, "g" * 32), flush_record(conn.user_id, "h" * 32, "high", 5)]
+        assert database.insert_diagnoses_multirow(records) == 2
+        assert database._history_layout == database.HISTORY_LAYOUT_MIGRATING
+        assert [row["condition_name"] for row in conn.rows("SELECT condition_name FROM diagnosis_history")] == [
+            database.CLASS_NAMES[0], database.CLASS_NAMES[5]]
+        assert stats(conn) == {"low": 1, "high": 1}
+
+
+def test_save_diagnosis_keeps_positional_signature():
+    # Pemanggil lama masih mengirim description/recommendation secara posisional
+    with fake_database() as conn:
+        diagnosis_id = database.save_diagnosis(conn.user_id, database.CLASS_NAMES[3], 0.9, "high",
+                                               "deskripsi lama", "rekomendasi lama", "lama.jpg")
+        item = database.get_diagnosis_by_id(diagnosis_id, conn.user_id)
+        assert item["image_filename"] == "lama.jpg" and item["severity"] == "high"
+        assert item["class_id"] == 3 and item["description"] == database.CLASS_INFO[3]["description"]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_write_behind_replay_not_duplicated,
+        test_duplicate_write_id_in_batch_saved_once,
+        test_records_without_write_id_still_saved,
+        test_pending_id_resolves_to_diagnosis,
+        test_history_page_bounds,
+        test_stats_counters_follow_writes_and_deletes,
+        test_delete_all_history_removes_stats,
+        test_stats_backfill_is_idempotent,
+        test_verify_and_rebuild_after_drift,
+        test_layout_detected_on_first_write,
+        test_stale_compact_layout_retried_on_legacy_table,
+        test_save_diagnosis_keeps_positional_signature,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 50)
+    print("✅ Semua test database lolos" if not failed else f"❌ {failed} test gagal")
+    raise SystemExit(1 if failed else 0)
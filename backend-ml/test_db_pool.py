@@ -0,0 +1,157 @@
+"""
+Test ConnectionPool (src/db_pool.py): pemakaian ulang koneksi, batas ukuran +
+timeout checkout, recycle max_lifetime, ping saat checkout, rollback transaksi
+yang tertinggal, dan reset setelah fork
+
+Jalankan:
+    python test_db_pool.py
+    python -m pytest test_db_pool.py
+"""
+import time
+import threading
+
+from pymysql.constants import SERVER_STATUS
+
+from src.db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """Koneksi tiruan dengan antarmuka yang dipakai pool (ping, rollback, server_status, close)"""
+
+    def __init__(self):
+        self.server_status = 0
+        self.alive = True
+        self.closed = False
+        self.rollbacks = 0
+        self.pings = 0
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if not self.alive:
+            raise ConnectionError("server pergi")
+
+    def rollback(self):
+        if not self.alive:
+            raise ConnectionError("server pergi")
+        self.rollbacks += 1
+        self.server_status = 0
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+    return ConnectionPool(connect, **kwargs), created
+
+
+def test_connection_reused():
+    pool, created = make_pool(max_size=2, ping_interval=0)
+    for _ in range(5):
+        with pool.connection() as conn:
+            assert conn is created[0]
+    stats = pool.stats()
+    assert len(created) == 1 and stats["created"] == 1 and stats["checkouts"] == 5
+    assert stats["idle"] == 1 and stats["in_use"] == 0
+    assert created[0].pings == 4  # ping_interval=0: setiap checkout dari idle
+
+
+def test_max_size_and_checkout_timeout():
+    pool, created = make_pool(max_size=1, checkout_timeout=0.1)
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with pool.connection():
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    assert held.wait(5)
+    started = time.monotonic()
+    try:
+        with pool.connection():
+            raise AssertionError("pool penuh harus timeout")
+    except PoolTimeout:
+        assert time.monotonic() - started < 1
+    # Peminjam yang menunggu mendapat koneksi begitu dikembalikan
+    threading.Timer(0.05, release.set).start()
+    pool.checkout_timeout = 2
+    with pool.connection() as conn:
+        assert conn is created[0]
+    thread.join(5)
+    assert pool.stats()["timeout"] == 1 and len(created) == 1
+
+
+def test_recycle_and_ping_failure():
+    pool, created = make_pool(max_lifetime=0.05, ping_interval=0)
+    with pool.connection():
+        pass
+    time.sleep(0.06)
+    with pool.connection() as conn:
+        assert conn is created[1] and created[0].closed
+
+    pool.max_lifetime = 0
+    created[1].alive = False
+    with pool.connection() as conn:
+        assert conn is created[2] and created[1].closed
+    stats = pool.stats()
+    assert stats["recycled"] == 1 and stats["ping_failed"] == 1 and stats["size"] == 1
+
+
+def test_open_transaction_rolled_back_and_broken_discarded():
+    pool, created = make_pool(ping_interval=60)
+    with pool.connection() as conn:
+        conn.server_status = SERVER_STATUS.SERVER_STATUS_IN_TRANS  # SELECT tanpa commit
+    assert created[0].rollbacks == 1
+    with pool.connection():
+        pass
+    assert created[0].rollbacks == 1  # Tidak ada transaksi: tanpa round trip
+
+    try:
+        with pool.connection() as conn:
+            conn.alive = False
+            raise ConnectionError("query gagal")
+    except ConnectionError:
+        pass
+    assert created[0].closed
+    stats = pool.stats()
+    assert stats["discarded"] == 1 and stats["size"] == 0
+
+
+def test_prefill_and_fork_reset():
+    pool, created = make_pool(min_size=3, max_size=5)
+    pool.prefill()
+    assert len(created) == 3 and pool.stats()["idle"] == 3
+    pool._pid = -1  # Seolah-olah proses ini hasil fork
+    with pool.connection() as conn:
+        assert conn is created[3]
+    assert pool.stats()["size"] == 1
+    assert not any(conn.closed for conn in created[:3])  # Socket master tidak ditutup anak
+
+
+if __name__ == "__main__":
+    tests = [
+        test_connection_reused,
+        test_max_size_and_checkout_timeout,
+        test_recycle_and_ping_failure,
+        test_open_transaction_rolled_back_and_broken_discarded,
+        test_prefill_and_fork_reset,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 50)
+    print("✅ Semua test connection pool lolos" if not failed else f"❌ {failed} test gagal")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,190 @@
+"""
+Test inference engine (src/engines.py) dengan checkpoint REPO_NAME dari cache
+Hugging Face lokal: ukuran model dari metadata tensor (fp32 & int8), export ONNX +
+parity check logits, dan pemilihan engine lewat INFERENCE_ENGINE / MODEL_PRECISION
+
+Jalankan:
+    HF_HUB_OFFLINE=1 python test_engines.py
+    HF_HUB_OFFLINE=1 python -m pytest test_engines.py
+"""
+import io
+import os
+import tempfile
+import functools
+import warnings
+
+import torch
+from transformers import AutoModelForImageClassification
+
+from src.config import REPO_NAME
+from src import engines, inference
+from src.engines import (
+    PyTorchEngine, OnnxRuntimeEngine, PRECISION_FP32, PRECISION_INT8, ENGINE_PYTORCH, ENGINE_ONNXRUNTIME,
+    model_size_mb, quantize_dynamic_int8, export_onnx, check_parity
+)
+
+try:
+    import onnx  # noqa: F401
+    import onnxruntime  # noqa: F401
+    ONNX_AVAILABLE = True
+except ImportError:  # pragma: no cover - tergantung environment
+    ONNX_AVAILABLE = False
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+warnings.filterwarnings("ignore", category=UserWarning)
+
+
+@functools.lru_cache(maxsize=1)
+def load_checkpoint():
+    return AutoModelForImageClassification.from_pretrained(REPO_NAME).eval()
+
+
+def fresh_model():
+    model = AutoModelForImageClassification.from_config(load_checkpoint().config).eval()
+    model.load_state_dict(load_checkpoint().state_dict())
+    return model
+
+
+@functools.lru_cache(maxsize=1)
+def exported_onnx():
+    path = os.path.join(tempfile.mkdtemp(prefix="onnx-"), "model.onnx")
+    return export_onnx(fresh_model(), path)
+
+
+def serialized_mb(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def test_model_size_from_tensor_metadata():
+    model = load_checkpoint()
+    expected = sum(p.numel() * p.element_size() for p in model.parameters()) / (1024 * 1024)
+    assert model_size_mb(model) == round(expected, 2)
+    # Serialisasi hanya menambah overhead kecil (nama key, header pickle)
+    assert model_size_mb(model) <= serialized_mb(model)
+
+
+def test_int8_size_counts_packed_weights():
+    fp32 = fresh_model()
+    int8 = quantize_dynamic_int8(fresh_model())
+    size = model_size_mb(int8)
+    assert 0 < size < model_size_mb(fp32)
+    assert abs(size - serialized_mb(int8)) < 0.1 + 0.05 * size
+
+
+def test_size_computed_lazily():
+    calls = []
+    original = engines.model_size_mb
+    engines.model_size_mb = lambda model: calls.append(1) or original(model)
+    try:
+        engine = PyTorchEngine(fresh_model(), precision=PRECISION_INT8)
+        assert calls == []
+        first = engine.info()["model_size_mb"]
+        assert engine.info()["model_size_mb"] == first and calls == [1]
+    finally:
+        engines.model_size_mb = original
+
+
+def test_onnx_export_matches_pytorch():
+    if not ONNX_AVAILABLE:
+        print("⏭️ onnx / onnxruntime tidak terpasang")
+        return
+    report = check_parity(fresh_model(), exported_onnx(), batch_sizes=(1, 3))
+    assert report["passed"], report
+    assert [batch["batch_size"] for batch in report["batches"]] == [1, 3]
+    engine = OnnxRuntimeEngine(exported_onnx())
+    assert engine.forward(torch.zeros((2, 3, 224, 224))).shape == (2, load_checkpoint().config.num_labels)
+    assert engine.info()["engine"] == ENGINE_ONNXRUNTIME and engine.info()["precision"] == PRECISION_FP32
+
+
+def test_parity_detects_different_weights():
+    if not ONNX_AVAILABLE:
+        print("⏭️ onnx / onnxruntime tidak terpasang")
+        return
+    changed = fresh_model()
+    with torch.no_grad():
+        changed.classifier.weight.add_(1.0)
+        changed.classifier.bias.add_(torch.arange(changed.config.num_labels, dtype=torch.float32))
+    report = check_parity(changed, exported_onnx(), batch_sizes=(2,))
+    assert not report["passed"] and report["batches"][0]["max_abs_diff"] > report["atol"]
+
+
+def test_missing_onnx_file_rejected():
+    if not ONNX_AVAILABLE:
+        print("⏭️ onnx / onnxruntime tidak terpasang")
+        return
+    try:
+        OnnxRuntimeEngine(os.path.join(tempfile.mkdtemp(), "tidak-ada.onnx"))
+        raise AssertionError("file ONNX yang tidak ada harus ditolak")
+    except FileNotFoundError:
+        pass
+
+
+def with_engine_config(engine_name, precision, fn):
+    """Jalankan inference._load_weights dengan INFERENCE_ENGINE / MODEL_PRECISION tertentu"""
+    saved = (inference.INFERENCE_ENGINE, inference.MODEL_PRECISION, inference.ONNX_MODEL_PATH,
+             inference.MODEL_WEIGHTS_MMAP)
+    inference.INFERENCE_ENGINE, inference.MODEL_PRECISION = engine_name, precision
+    inference.ONNX_MODEL_PATH, inference.MODEL_WEIGHTS_MMAP = exported_onnx(), False
+    try:
+        return fn()
+    finally:
+        (inference.INFERENCE_ENGINE, inference.MODEL_PRECISION, inference.ONNX_MODEL_PATH,
+         inference.MODEL_WEIGHTS_MMAP) = saved
+
+
+def test_engine_selection():
+    if not ONNX_AVAILABLE:
+        print("⏭️ onnx / onnxruntime tidak terpasang")
+        return
+    _, loaded, active = with_engine_config(ENGINE_PYTORCH, PRECISION_INT8, inference._load_weights)
+    assert isinstance(active, PyTorchEngine) and active.precision == PRECISION_INT8 and loaded is active.model
+    _, loaded, active = with_engine_config(ENGINE_ONNXRUNTIME, PRECISION_FP32, inference._load_weights)
+    assert isinstance(active, OnnxRuntimeEngine) and loaded is None
+    assert active.onnx_path == exported_onnx()
+    for engine_name, precision in ((ENGINE_ONNXRUNTIME, PRECISION_INT8), ("tensorrt", PRECISION_FP32)):
+        try:
+            with_engine_config(engine_name, precision, inference._load_weights)
+            raise AssertionError(f"{engine_name}/{precision} harus ditolak")
+        except ValueError:
+            pass
+    try:
+        PyTorchEngine(fresh_model(), precision="fp16")
+        raise AssertionError("presisi tidak dikenal harus ditolak")
+    except ValueError:
+        pass
+
+
+def test_fingerprint_depends_on_weights_and_precision():
+    base = PyTorchEngine(fresh_model())
+    assert base.fingerprint() == PyTorchEngine(fresh_model()).fingerprint()
+    assert base.fingerprint() != PyTorchEngine(fresh_model(), precision=PRECISION_INT8).fingerprint()
+    changed = fresh_model()
+    with torch.no_grad():
+        changed.classifier.bias.add_(0.5)
+    assert base.fingerprint() != PyTorchEngine(changed).fingerprint()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_model_size_from_tensor_metadata,
+        test_int8_size_counts_packed_weights,
+        test_size_computed_lazily,
+        test_onnx_export_matches_pytorch,
+        test_parity_detects_different_weights,
+        test_missing_onnx_file_rejected,
+        test_engine_selection,
+        test_fingerprint_depends_on_weights_and_precision,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 50)
+    print("✅ Semua test engine lolos" if not failed else f"❌ {failed} test gagal")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,127 @@
+"""
+Test format compact diagnosis_history (src/database.py) tanpa server MySQL:
+encode/decode top-3 (pasangan '<HH' class_id + skor 0,1%), pemetaan nama kelas ->
+class_id, normalisasi severity, dan render baris compact maupun baris lama
+
+Jalankan:
+    python test_history_compact.py
+    python -m pytest test_history_compact.py
+"""
+import json
+import struct
+import datetime
+
+from src import database
+from src.config import CLASS_NAMES, DEFAULT_DISEASE_INFO
+
+
+def top_3(*pairs):
+    return [{"label": CLASS_NAMES[class_id], "confidence": confidence} for class_id, confidence in pairs]
+
+
+def test_pack_layout_and_round_trip():
+    packed = database._pack_top_3(top_3((4, 87.66), (0, 10.0), (30, 2.34)))
+    assert len(packed) == 12
+    assert struct.unpack('<HHHHHH', packed) == (4, 877, 0, 100, 30, 23)
+    assert database._unpack_top_3(packed) == top_3((4, 87.7), (0, 10.0), (30, 2.3))
+
+
+def test_pack_clamps_truncates_and_skips_unknown():
+    packed = database._pack_top_3(
+        top_3((1, 120.0), (2, -5.0)) + [{"label": "Kelas Tidak Ada", "confidence": 50.0}] + top_3((3, 1.0)))
+    # Label tidak dikenal dilewati; hanya tiga entry pertama yang dibaca
+    assert database._unpack_top_3(packed) == top_3((1, 100.0), (2, 0.0))
+    assert database._unpack_top_3(database._pack_top_3(top_3((5, 60.0)))) == top_3((5, 60.0))
+    assert database._pack_top_3(None) is None and database._pack_top_3([]) is None
+    assert database._unpack_top_3(None) == [] and database._unpack_top_3(b"") == []
+
+
+def test_unpack_unknown_class_id():
+    # Baris dari model lama dengan kelas lebih banyak: id ditampilkan apa adanya
+    packed = struct.pack('<HHHHHH', 2, 500, len(CLASS_NAMES), 300, 1, 200)
+    assert database._unpack_top_3(packed) == [
+        {"label": CLASS_NAMES[2], "confidence": 50.0},
+        {"label": str(len(CLASS_NAMES)), "confidence": 30.0},
+        {"label": CLASS_NAMES[1], "confidence": 20.0},
+    ]
+    assert database._unpack_top_3(bytearray(struct.pack('<HH', 7, 999))) == top_3((7, 99.9))
+
+
+def test_class_id_mapping():
+    assert database.CLASS_IDS == {name: index for index, name in enumerate(CLASS_NAMES)}
+    assert database._class_id({"condition": CLASS_NAMES[6]}) == 6
+    # class_index dari hasil prediksi diutamakan
+    assert database._class_id({"condition": CLASS_NAMES[6], "class_index": 2}) == 2
+    assert database._class_id({"condition": "apa saja", "class_index": 0}) == 0
+    for diagnosis in ({"condition": "Kelas Tidak Ada"}, {"condition": None},
+                      {"condition": CLASS_NAMES[0], "class_index": len(CLASS_NAMES)},
+                      {"class_index": -1}):
+        try:
+            database._class_id(diagnosis)
+            raise AssertionError(f"{diagnosis} harus ditolak")
+        except ValueError:
+            pass
+
+
+def test_normalize_severity():
+    for severity in database.SEVERITY_LEVELS:
+        assert database._normalize_severity(severity) == severity
+    for severity in (None, "", "HIGH", "kritis"):
+        assert database._normalize_severity(severity) is None
+
+
+def history_row(**columns):
+    return {"id": 1, "user_id": 9, "confidence": 0.87, "severity": "high", "image_filename": "a.jpg",
+            "created_at": datetime.datetime(2024, 5, 1, 8, 30), "class_id": None, "top_3": None, **columns}
+
+
+def test_history_item_compact_row():
+    item = database._history_item(history_row(class_id=4, top_3=database._pack_top_3(top_3((4, 87.0)))))
+    info = database.CLASS_INFO[4]
+    assert item["condition"] == CLASS_NAMES[4] and item["class_id"] == 4
+    assert item["description"] == info["description"] and item["recommendation"] == info["recommendation"]
+    assert list(item["recommendations"]) == database._split_recommendations(info["recommendation"])
+    assert item["top_3_predictions"] == top_3((4, 87.0))
+    assert item["created_at"] == "2024-05-01T08:30:00"
+    assert database._history_item(history_row(class_id=4, created_at="2024-05-01 08:30:00"))["created_at"] \
+        == "2024-05-01 08:30:00"
+
+
+def test_history_item_legacy_rows():
+    legacy = history_row(condition_name="Eksim Lama", description="Deskripsi lama",
+                         recommendation="Gunakan pelembap setiap hari. Hindari sabun keras.",
+                         top_3_predictions=json.dumps(top_3((1, 70.0))))
+    item = database._history_item(legacy)
+    assert item["condition"] == "Eksim Lama" and item["description"] == "Deskripsi lama"
+    assert item["recommendations"] == ["Gunakan pelembap setiap hari", "Hindari sabun keras"]
+    assert item["top_3_predictions"] == top_3((1, 70.0))
+    assert database._history_item({**legacy, "top_3_predictions": "{rusak"})["top_3_predictions"] == []
+
+    unknown = database._history_item(history_row(class_id=len(CLASS_NAMES),
+                                                 top_3=struct.pack('<HH', len(CLASS_NAMES), 900)))
+    assert unknown["condition"] == str(len(CLASS_NAMES))
+    assert unknown["description"] == DEFAULT_DISEASE_INFO["description"] and unknown["recommendations"] == ()
+    assert unknown["top_3_predictions"] == [{"label": str(len(CLASS_NAMES)), "confidence": 90.0}]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_pack_layout_and_round_trip,
+        test_pack_clamps_truncates_and_skips_unknown,
+        test_unpack_unknown_class_id,
+        test_class_id_mapping,
+        test_normalize_severity,
+        test_history_item_compact_row,
+        test_history_item_legacy_rows,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 50)
+    print("✅ Semua test history compact lolos" if not failed else f"❌ {failed} test gagal")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,116 @@
+"""
+Test export riwayat (src/history_export.py): NDJSON, CSV (top-3 diratakan jadi kolom),
+gzip streaming, dan chunk diminta satu per satu (memori konstan)
+
+Jalankan:
+    python test_history_export.py
+    python -m pytest test_history_export.py
+"""
+import io
+import csv
+import json
+import gzip
+import zlib
+import decimal
+
+from src.history_export import encode_export
+
+
+def history_item(diagnosis_id):
+    return {
+        "id": diagnosis_id,
+        "user_id": 7,
+        "class_id": 3,
+        "condition": "Melanoma",
+        "confidence": decimal.Decimal("0.9312"),
+        "severity": "high",
+        "description": "Kanker kulit – paling serius",
+        "recommendation": "Segera ke dokter",
+        "recommendations": ("Segera ke dokter",),
+        "image_filename": f"img_{diagnosis_id}.jpg",
+        "top_3_predictions": [{"label": "Melanoma", "confidence": 93.1}, {"label": "Nevus", "confidence": 4.2}],
+        "created_at": "2026-01-01T08:00:00",
+    }
+
+
+def chunks(*sizes):
+    next_id = 1
+    for size in sizes:
+        yield [history_item(next_id + i) for i in range(size)]
+        next_id += size
+
+
+def test_ndjson_one_line_per_item():
+    body = b"".join(encode_export(chunks(3, 2), "ndjson", json.dumps)).decode("utf-8")
+    rows = [json.loads(line) for line in body.splitlines()]
+    assert [row["id"] for row in rows] == [1, 2, 3, 4, 5]
+    assert rows[0]["confidence"] == 0.9312 and rows[0]["condition"] == "Melanoma"
+    assert "description" not in rows[0] and "user_id" not in rows[0]
+    assert rows[0]["top_3_predictions"][1] == {"label": "Nevus", "confidence": 4.2}
+
+
+def test_csv_header_once_and_top_3_columns():
+    body = b"".join(encode_export(chunks(2, 2), "csv", json.dumps)).decode("utf-8")
+    rows = list(csv.reader(io.StringIO(body)))
+    assert rows[0][:3] == ["id", "created_at", "condition"] and rows[0][-1] == "top_3_confidence"
+    assert len(rows) == 5 and rows.count(rows[0]) == 1
+    assert rows[1][-6:] == ["Melanoma", "93.1", "Nevus", "4.2", "", ""]
+    # Riwayat kosong tetap menghasilkan header
+    empty = b"".join(encode_export(iter(()), "csv", json.dumps)).decode("utf-8")
+    assert empty.splitlines() == [",".join(rows[0])]
+
+
+def test_gzip_stream_roundtrip():
+    plain = b"".join(encode_export(chunks(50, 50, 1), "ndjson", json.dumps))
+    parts = list(encode_export(chunks(50, 50, 1), "ndjson", json.dumps, compress=True))
+    assert len(parts) == 4  # Satu bagian per chunk + penutup gzip
+    assert gzip.decompress(b"".join(parts)) == plain
+    # Bagian yang sudah dikirim sudah bisa didekompresi tanpa menunggu akhir stream
+    first_chunk = b"".join(encode_export(chunks(50), "ndjson", json.dumps))
+    assert zlib.decompressobj(31).decompress(parts[0]) == first_chunk
+    empty = b"".join(encode_export(iter(()), "csv", json.dumps, compress=True))
+    assert gzip.decompress(empty).startswith(b"id,created_at,")
+
+
+def test_chunks_pulled_lazily():
+    pulled = []
+
+    def source():
+        for chunk in chunks(2, 2, 2):
+            pulled.append(chunk[0]["id"])
+            yield chunk
+
+    stream = encode_export(source(), "ndjson", json.dumps)
+    next(stream)
+    assert pulled == [1]
+    next(stream)
+    assert pulled == [1, 3]
+
+
+def test_unknown_format_rejected():
+    try:
+        next(encode_export(chunks(1), "xml", json.dumps))
+        raise AssertionError("format tidak dikenal harus ditolak")
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    tests = [
+        test_ndjson_one_line_per_item,
+        test_csv_header_once_and_top_3_columns,
+        test_gzip_stream_roundtrip,
+        test_chunks_pulled_lazily,
+        test_unknown_format_rejected,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 50)
+    print("✅ Semua test export riwayat lolos" if not failed else f"❌ {failed} test gagal")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,147 @@
+"""
+Test InferencePool (src/inference_pool.py) dengan checkpoint REPO_NAME dari cache
+Hugging Face lokal: hasil worker sama dengan forward pass in-process, penolakan
+InferencePoolBusy saat semua slot terpakai, dan penggantian worker yang mati
+(task yang sedang dikerjakannya digagalkan, bukan menggantung), termasuk worker
+macet yang melewati task_timeout
+
+Jalankan:
+    HF_HUB_OFFLINE=1 python test_inference_pool.py
+    HF_HUB_OFFLINE=1 python -m pytest test_inference_pool.py
+"""
+import os
+import time
+import signal
+import warnings
+from contextlib import contextmanager
+
+import numpy as np
+import torch
+
+from src import inference
+from src.preprocessing import ImagePreprocessor
+from src.inference_pool import InferencePool, InferencePoolBusy
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+warnings.filterwarnings("ignore", category=UserWarning)
+
+# Dibaca src.config di proses worker (spawn): tanpa warm-up dan tanpa file mmap
+WORKER_ENV = {"WARMUP_ENABLED": "false", "MODEL_WEIGHTS_MMAP": "false", "INFERENCE_ENGINE": "pytorch"}
+INPUT_SIZE = (224, 224)
+
+
+@contextmanager
+def started_pool(**kwargs):
+    saved = {name: os.environ.get(name) for name in WORKER_ENV}
+    os.environ.update(WORKER_ENV)
+    pool = InferencePool(INPUT_SIZE, **{"num_workers": 1, "max_queue": 1, "slot_batch_size": 2, **kwargs})
+    try:
+        yield pool.start(timeout=120)
+    finally:
+        pool.close()
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def wait_until(condition, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def sample_pixels(count):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (*INPUT_SIZE, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def test_results_match_in_process_forward():
+    pixels = sample_pixels(3)  # > slot_batch_size: dipecah jadi dua task
+    with started_pool() as pool:
+        probabilities = pool.infer(pixels)
+        assert pool.stats()["tasks_done"] == 2
+        assert pool.engine.info()["process_pool"] is True
+    saved, inference.MODEL_WEIGHTS_MMAP = inference.MODEL_WEIGHTS_MMAP, False
+    try:
+        processor, model, _ = inference._load_weights()
+    finally:
+        inference.MODEL_WEIGHTS_MMAP = saved
+    with torch.no_grad():
+        logits = model(pixel_values=ImagePreprocessor.from_processor(processor).to_tensor(pixels)).logits
+    expected = torch.softmax(logits, dim=1).numpy()
+    assert len(probabilities) == 3
+    assert np.allclose(np.stack(probabilities), expected, atol=1e-5)
+
+
+def test_busy_when_all_slots_taken():
+    with started_pool(queue_timeout=0.05) as pool:
+        slot = pool._free_slots.get()  # Satu-satunya slot dipakai request lain
+        try:
+            pool.infer(sample_pixels(1))
+            raise AssertionError("infer harus ditolak saat antrian penuh")
+        except InferencePoolBusy:
+            pass
+        assert pool.stats()["rejected"] == 1
+        pool._free_slots.put(slot)
+        assert len(pool.infer(sample_pixels(1))) == 1
+
+
+def test_dead_worker_fails_task_and_is_replaced():
+    with started_pool(task_timeout=30) as pool:
+        old_pid = pool.stats()["workers"][0]["pid"]
+        # Worker dihentikan dulu agar task pasti masih in-flight saat worker mati
+        os.kill(old_pid, signal.SIGSTOP)
+        future = pool._submit(sample_pixels(1))
+        os.kill(old_pid, signal.SIGKILL)
+        try:
+            future.result(timeout=30)
+            raise AssertionError("task di worker yang mati harus gagal")
+        except RuntimeError as e:
+            assert "berhenti" in str(e)
+        assert wait_until(lambda: any(w["ready"] and w["pid"] != old_pid for w in pool.stats()["workers"]))
+        stats = pool.stats()
+        assert stats["worker_restarts"] == 1 and stats["tasks_failed"] == 1
+        assert stats["slots_free"] == 1 and stats["in_flight"] == 0
+        assert len(pool.infer(sample_pixels(2))) == 2
+
+
+def test_stuck_worker_killed_after_task_timeout():
+    with started_pool(task_timeout=1) as pool:
+        old_pid = pool.stats()["workers"][0]["pid"]
+        os.kill(old_pid, signal.SIGSTOP)  # Worker macet: task tidak pernah dijawab
+        try:
+            pool.infer(sample_pixels(1))
+            raise AssertionError("infer harus timeout saat worker macet")
+        except TimeoutError:
+            pass
+        # Worker dihentikan paksa sehingga slot task tidak bocor
+        assert wait_until(lambda: any(w["ready"] and w["pid"] != old_pid for w in pool.stats()["workers"]))
+        stats = pool.stats()
+        assert stats["worker_restarts"] == 1 and stats["tasks_failed"] == 1
+        assert stats["slots_free"] == 1 and stats["in_flight"] == 0
+        assert len(pool.infer(sample_pixels(1))) == 1
+
+
+if __name__ == "__main__":
+    tests = [
+        test_results_match_in_process_forward,
+        test_busy_when_all_slots_taken,
+        test_dead_worker_fails_task_and_is_replaced,
+        test_stuck_worker_killed_after_task_timeout,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 50)
+    print("✅ Semua test inference pool lolos" if not failed else f"❌ {failed} test gagal")
+    raise SystemExit(1 if failed else 0)
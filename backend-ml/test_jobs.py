@@ -0,0 +1,103 @@
+"""
+Test JobManager (src/jobs.py): antrian terbatas, tahap job, kepemilikan, TTL
+
+Jalankan:
+    python test_jobs.py
+    python -m pytest test_jobs.py
+"""
+import time
+import threading
+
+from src.jobs import JobManager, JobQueueFull, JOB_SUCCEEDED, JOB_FAILED
+
+
+def wait_finished(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    version = -1
+    while not job.finished and time.monotonic() < deadline:
+        version = job.wait_for_update(version, timeout=0.1)
+    return job.snapshot()
+
+
+def test_job_reports_stages_and_result():
+    manager = JobManager(workers=1, max_queue=4)
+
+    def handler(job):
+        job.advance("decoded")
+        job.advance("decoded")  # Duplikat diabaikan
+        job.advance("inferred")
+        return {"status": "success"}, 200
+
+    snapshot = wait_finished(manager.submit(handler))
+    assert snapshot["state"] == JOB_SUCCEEDED
+    assert [entry["stage"] for entry in snapshot["stages"]] == ["queued", "decoded", "inferred"]
+    assert snapshot["result"] == {"status": "success"} and snapshot["http_status"] == 200
+
+
+def test_error_status_and_exception_mark_job_failed():
+    manager = JobManager(workers=1, max_queue=4)
+    rejected = wait_finished(manager.submit(lambda job: ({"status": "error"}, 400)))
+    assert rejected["state"] == JOB_FAILED and rejected["http_status"] == 400
+
+    def broken(job):
+        raise RuntimeError("boom")
+
+    crashed = wait_finished(manager.submit(broken))
+    assert crashed["state"] == JOB_FAILED and crashed["http_status"] == 500
+
+
+def test_full_queue_rejects_submit():
+    manager = JobManager(workers=1, max_queue=1)
+    release = threading.Event()
+    running = threading.Event()
+
+    def blocking(job):
+        running.set()
+        release.wait(5)
+        return {}, 200
+
+    first = manager.submit(blocking)
+    assert running.wait(5)
+    manager.submit(blocking)  # Mengisi satu-satunya slot antrian
+    try:
+        manager.submit(blocking)
+        raise AssertionError("submit ke antrian penuh harus ditolak")
+    except JobQueueFull:
+        pass
+    finally:
+        release.set()
+    wait_finished(first)
+    assert manager.stats()["rejected"] == 1
+
+
+def test_owner_and_ttl():
+    manager = JobManager(workers=1, max_queue=4, ttl_seconds=0.2)
+    job = manager.submit(lambda job: ({}, 200), owner="7")
+    wait_finished(job)
+    assert manager.get(job.id, owner="7") is job
+    assert manager.get(job.id) is None
+    assert manager.get(job.id, owner="8") is None
+
+    time.sleep(0.3)
+    assert manager.get(job.id, owner="7") is None
+    assert manager.stats()["stored_jobs"] == 0
+
+
+if __name__ == "__main__":
+    tests = [
+        test_job_reports_stages_and_result,
+        test_error_status_and_exception_mark_job_failed,
+        test_full_queue_rejects_submit,
+        test_owner_and_ttl,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 50)
+    print("✅ Semua test job lolos" if not failed else f"❌ {failed} test gagal")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,81 @@
+"""
+Test OrjsonProvider (src/json_provider.py): respons sama dengan provider bawaan
+Flask (urutan key, Decimal, datetime, tuple, unicode) untuk payload /history
+
+Jalankan:
+    python test_json_provider.py
+    python -m pytest test_json_provider.py
+"""
+import json
+import decimal
+import datetime
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from src.json_provider import OrjsonProvider, orjson_available
+
+
+def history_payload():
+    return {
+        "status": "success",
+        "data": [{
+            "id": 42,
+            "condition": "Melanoma",
+            "confidence": decimal.Decimal("0.9312"),
+            "severity": None,
+            "description": "Kanker kulit – paling serius",
+            "recommendations": ("Gunakan tabir surya setiap hari",),
+            "top_3_predictions": [{"label": "Melanoma", "confidence": 93.1}],
+            "created_at": "2026-01-01T08:00:00",
+            "reviewed_at": datetime.datetime(2026, 1, 2, 9, 30, tzinfo=datetime.timezone.utc),
+        }],
+        "has_more": False,
+        "next_cursor": None,
+    }
+
+
+def test_response_matches_default_provider():
+    if not orjson_available():
+        print("⏭️ orjson tidak terpasang")
+        return
+    app = Flask(__name__)
+    with app.app_context():
+        expected = DefaultJSONProvider(app).response(history_payload())
+        actual = OrjsonProvider(app).response(history_payload())
+    assert actual.mimetype == expected.mimetype
+    expected_body, actual_body = expected.get_data(as_text=True), actual.get_data(as_text=True)
+    # Provider bawaan meng-escape non-ASCII (ensure_ascii); isi & urutan key harus sama
+    assert json.loads(actual_body) == json.loads(expected_body)
+    assert list(json.loads(actual_body)) == list(json.loads(expected_body))
+    assert '"confidence":"0.9312"' in actual_body
+    assert '"reviewed_at":"Fri, 02 Jan 2026 09:30:00 GMT"' in actual_body
+
+
+def test_dumps_loads_roundtrip():
+    if not orjson_available():
+        return
+    app = Flask(__name__)
+    provider = OrjsonProvider(app)
+    text = provider.dumps({"b": 1, "a": [1, 2.5, "x"]})
+    assert text == '{"a":[1,2.5,"x"],"b":1}'
+    assert provider.loads(text) == {"a": [1, 2.5, "x"], "b": 1}
+    assert provider.loads(text.encode("utf-8")) == {"a": [1, 2.5, "x"], "b": 1}
+
+
+if __name__ == "__main__":
+    tests = [
+        test_response_matches_default_provider,
+        test_dumps_loads_roundtrip,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 50)
+    print("✅ Semua test JSON provider lolos" if not failed else f"❌ {failed} test gagal")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,92 @@
+"""
+Parity test untuk pra-pemrosesan native (src/preprocessing.py)
+Membandingkan tensor hasil ImagePreprocessor dengan image processor transformers
+(backend PIL) memakai config DINOv2 yang sama dengan model.
+
+Jalankan:
+    python test_preprocessing.py
+    python -m pytest test_preprocessing.py
+"""
+import numpy as np
+import torch
+from PIL import Image
+
+try:
+    from transformers import BitImageProcessorPil as BitImageProcessor
+except ImportError:  # transformers < 5: BitImageProcessor sudah berbasis PIL/NumPy
+    from transformers import BitImageProcessor
+
+from src.preprocessing import ImagePreprocessor
+
+# preprocessor_config.json model DINOv2 (REPO_NAME)
+DINOV2_PROCESSOR_CONFIG = {
+    "crop_size": {"height": 224, "width": 224},
+    "do_center_crop": True,
+    "do_convert_rgb": True,
+    "do_normalize": True,
+    "do_rescale": True,
+    "do_resize": True,
+    "image_mean": [0.485, 0.456, 0.406],
+    "image_std": [0.229, 0.224, 0.225],
+    "resample": 3,
+    "rescale_factor": 0.00392156862745098,
+    "size": {"shortest_edge": 256},
+}
+
+
+def synthetic_images():
+    """Berbagai ukuran/rasio (termasuk lebih kecil dari crop) dan mode non-RGB"""
+    rng = np.random.default_rng(0)
+    images = [
+        Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+        for height, width in [(300, 400), (500, 375), (256, 256), (224, 224), (100, 90),
+                              (1000, 750), (257, 999), (31, 500)]
+    ]
+    images.append(Image.new('L', (300, 300), 128))
+    images.append(Image.new('RGBA', (320, 300), (200, 120, 90, 255)))
+    images.append(Image.new('RGB', (300, 300), (210, 150, 120)).convert('P'))
+    return images
+
+
+def test_single_matches_processor():
+    processor = BitImageProcessor(**DINOV2_PROCESSOR_CONFIG)
+    preprocessor = ImagePreprocessor.from_processor(processor)
+    for image in synthetic_images():
+        expected = processor(image, return_tensors="pt")["pixel_values"]
+        actual = preprocessor([image])
+        assert actual.shape == expected.shape, (image.size, actual.shape, expected.shape)
+        assert torch.equal(actual, expected), (image.size, image.mode, (actual - expected).abs().max().item())
+
+
+def test_batch_matches_processor_and_reuses_buffer():
+    processor = BitImageProcessor(**DINOV2_PROCESSOR_CONFIG)
+    preprocessor = ImagePreprocessor.from_processor(processor)
+    images = [image.convert('RGB') for image in synthetic_images()]
+    expected = processor(images, return_tensors="pt")["pixel_values"]
+
+    arrays = [preprocessor.prepare(image) for image in images]
+    first = preprocessor.to_tensor(arrays)
+    assert torch.equal(first, expected)
+
+    # Batch yang lebih kecil memakai buffer yang sama (tanpa alokasi ulang)
+    second = preprocessor.to_tensor(arrays[:3])
+    assert second.data_ptr() == first.data_ptr()
+    assert torch.equal(second, expected[:3])
+
+
+if __name__ == "__main__":
+    tests = [
+        test_single_matches_processor,
+        test_batch_matches_processor_and_reuses_buffer,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 50)
+    print("✅ Semua parity test lolos" if not failed else f"❌ {failed} test gagal")
+    raise SystemExit(1 if failed else 0)
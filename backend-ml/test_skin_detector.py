@@ -0,0 +1,120 @@
+"""
+Parity test untuk detektor kulit vektor (src/skin_detector.py)
+Membandingkan keputusan dengan implementasi lama berbasis ImageStat + Pillow HSV.
+
+Jalankan:
+    python test_skin_detector.py
+    python -m pytest test_skin_detector.py
+"""
+import numpy as np
+from PIL import Image, ImageStat
+
+from src.skin_detector import (
+    skin_mask, pillow_hsv_skin_mask, is_likely_skin, is_likely_skin_batch, prepare_skin_pixels
+)
+
+
+def reference_is_likely_skin_image(image):
+    """Implementasi lama is_likely_skin_image (sebelum versi vektor)"""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    img_small = image.resize((200, 200))
+    stat = ImageStat.Stat(img_small)
+    r, g, b = stat.mean[:3]
+    in_skin_range = (95 <= r <= 255) and (40 <= g <= 200) and (20 <= b <= 170)
+    proper_ratio = r > g > b
+    brightness = (r + g + b) / 3
+    proper_brightness = 60 <= brightness <= 220
+    hsv_array = np.array(img_small.convert('HSV'))
+    h, s, v = hsv_array[:, :, 0], hsv_array[:, :, 1], hsv_array[:, :, 2]
+    mask = (
+        ((h >= 0) & (h <= 50)) &
+        ((s >= 58) & (s <= 173)) &
+        ((v >= 89) & (v <= 255))
+    )
+    skin_percentage = np.sum(mask) / mask.size
+    if skin_percentage > 0.15:
+        return {"is_skin": True, "confidence": min(skin_percentage * 2, 0.95),
+                "reason": f"Terdeteksi {skin_percentage*100:.1f}% area kulit",
+                "skin_percentage": skin_percentage}
+    elif in_skin_range and proper_ratio and proper_brightness:
+        return {"is_skin": True, "confidence": 0.6,
+                "reason": "Warna rata-rata konsisten dengan kulit",
+                "skin_percentage": skin_percentage}
+    return {"is_skin": False, "confidence": 0.0,
+            "reason": f"Warna tidak konsisten dengan kulit (RGB: {r:.0f},{g:.0f},{b:.0f}, Skin%: {skin_percentage*100:.1f}%)",
+            "skin_percentage": skin_percentage}
+
+
+def synthetic_images():
+    """Kumpulan gambar uji: warna solid, noise, gradien, mode non-RGB, berbagai ukuran"""
+    rng = np.random.default_rng(42)
+    images = []
+    for color in [(224, 172, 105), (141, 85, 36), (255, 219, 172), (198, 134, 66),
+                  (0, 0, 255), (30, 200, 30), (128, 128, 128), (0, 0, 0), (255, 255, 255),
+                  (120, 90, 60), (96, 41, 21), (230, 60, 40)]:
+        images.append(Image.new('RGB', (320, 240), color))
+    for size in [(200, 200), (640, 480), (37, 91), (1024, 768)]:
+        images.append(Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)))
+    for low, high in [(90, 240), (20, 120), (150, 255)]:
+        noise = rng.integers(low, high, (300, 400, 3), dtype=np.uint8)
+        noise[..., 1] = (noise[..., 1] * 0.7).astype(np.uint8)
+        noise[..., 2] = (noise[..., 2] * 0.5).astype(np.uint8)
+        images.append(Image.fromarray(noise))
+    x = np.linspace(0, 255, 500, dtype=np.float64)
+    gradient = np.stack(np.broadcast_arrays(x[None, :], x[:, None] * 0.6, x[None, :] * 0.3), -1)
+    images.append(Image.fromarray(gradient.astype(np.uint8)))
+    images.append(Image.new('RGBA', (300, 300), (210, 150, 120, 128)))
+    images.append(Image.new('L', (300, 300), 180))
+    images.append(Image.new('RGB', (300, 300), (210, 150, 120)).convert('P'))
+    return images
+
+
+def assert_same_decision(expected, actual):
+    assert actual["is_skin"] == expected["is_skin"], (expected, actual)
+    assert actual["reason"] == expected["reason"], (expected, actual)
+    assert abs(actual["confidence"] - expected["confidence"]) < 1e-12, (expected, actual)
+    assert abs(actual["skin_percentage"] - expected["skin_percentage"]) < 1e-12, (expected, actual)
+
+
+def test_hsv_mask_matches_pillow_for_every_color():
+    """Mask kulit harus identik dengan Pillow HSV untuk seluruh 16.7 juta warna RGB"""
+    v = np.arange(1 << 24, dtype=np.uint32)
+    rgb = np.stack([(v >> 16) & 255, (v >> 8) & 255, v & 255], -1).astype(np.uint8).reshape(4096, 4096, 3)
+    hsv = np.asarray(Image.fromarray(rgb).convert('HSV')).astype(np.int32)
+    expected = (hsv[..., 0] <= 50) & (hsv[..., 1] >= 58) & (hsv[..., 1] <= 173) & (hsv[..., 2] >= 89)
+    mismatches = int((pillow_hsv_skin_mask(rgb) != expected).sum())
+    assert mismatches == 0, f"{mismatches} warna berbeda (perhitungan langsung)"
+    mismatches = int((skin_mask(rgb) != expected).sum())
+    assert mismatches == 0, f"{mismatches} warna berbeda (lookup table)"
+
+
+def test_decisions_match_reference():
+    for image in synthetic_images():
+        assert_same_decision(reference_is_likely_skin_image(image), is_likely_skin(image))
+
+
+def test_batch_matches_single():
+    images = synthetic_images()
+    batch = np.stack([prepare_skin_pixels(image) for image in images])
+    for image, actual in zip(images, is_likely_skin_batch(batch)):
+        assert_same_decision(reference_is_likely_skin_image(image), actual)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_hsv_mask_matches_pillow_for_every_color,
+        test_decisions_match_reference,
+        test_batch_matches_single,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 50)
+    print("✅ Semua parity test lolos" if not failed else f"❌ {failed} test gagal")
+    raise SystemExit(1 if failed else 0)
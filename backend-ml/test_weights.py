@@ -0,0 +1,140 @@
+"""
+Test pemuatan bobot mmap (src/weights.py) dengan checkpoint REPO_NAME dari cache
+Hugging Face lokal: round-trip file serving, validasi sumber checkpoint, penolakan
+checkpoint yang tidak cocok persis dengan arsitektur, dan fallback
+load_pytorch_model ke salinan privat
+
+Jalankan:
+    HF_HUB_OFFLINE=1 python test_weights.py
+    HF_HUB_OFFLINE=1 python -m pytest test_weights.py
+"""
+import io
+import os
+import tempfile
+import functools
+import warnings
+from contextlib import redirect_stdout
+
+import torch
+from safetensors.torch import save_file
+from transformers import AutoModelForImageClassification
+
+from src import inference
+from src.config import REPO_NAME
+from src.weights import (
+    checkpoint_source_id, serving_weights_valid, save_serving_weights, load_model_mmap,
+    read_safetensors_header, mmap_weight_fraction
+)
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+warnings.filterwarnings("ignore", category=UserWarning)
+
+
+@functools.lru_cache(maxsize=1)
+def load_checkpoint():
+    return AutoModelForImageClassification.from_pretrained(REPO_NAME).eval()
+
+
+def temp_weights_path():
+    return os.path.join(tempfile.mkdtemp(prefix="weights-"), "model.mmap.safetensors")
+
+
+def logits(model):
+    torch.manual_seed(0)
+    with torch.no_grad():
+        return model(pixel_values=torch.randn(2, 3, 224, 224)).logits
+
+
+def save_state_dict(state_dict, path, source_id):
+    save_file({name: tensor.contiguous() for name, tensor in state_dict.items()}, path,
+              metadata={"source": source_id})
+
+
+def with_mmap_path(path, fn):
+    """Jalankan fn dengan MODEL_WEIGHTS_MMAP aktif dan MODEL_MMAP_PATH = `path`"""
+    saved = inference.MODEL_WEIGHTS_MMAP, inference.MODEL_MMAP_PATH
+    inference.MODEL_WEIGHTS_MMAP, inference.MODEL_MMAP_PATH = True, path
+    try:
+        return fn()
+    finally:
+        inference.MODEL_WEIGHTS_MMAP, inference.MODEL_MMAP_PATH = saved
+
+
+def test_round_trip_is_mmapped_and_identical():
+    path = temp_weights_path()
+    source_id = checkpoint_source_id(REPO_NAME)
+    assert source_id.startswith(f"{REPO_NAME}@") and not source_id.endswith("@unknown")
+    assert not serving_weights_valid(path, source_id)
+    save_serving_weights(load_checkpoint(), path, source_id)
+    assert serving_weights_valid(path, source_id)
+    assert not serving_weights_valid(path, f"{REPO_NAME}@blob-lain")
+
+    model = load_model_mmap(AutoModelForImageClassification, load_checkpoint().config, path)
+    assert mmap_weight_fraction(model, path) == 1.0
+    assert torch.equal(logits(model), logits(load_checkpoint()))
+
+
+def test_corrupt_file_not_valid():
+    path = temp_weights_path()
+    with open(path, "wb") as f:
+        f.write(b"\x10\x00\x00\x00\x00\x00\x00\x00bukan json")
+    assert not serving_weights_valid(path, checkpoint_source_id(REPO_NAME))
+
+
+def test_mismatched_checkpoint_rejected():
+    config = load_checkpoint().config
+    state_dict = load_checkpoint().state_dict()
+    missing = {name: tensor for name, tensor in state_dict.items() if name != "classifier.bias"}
+    unexpected = {**state_dict, "classifier.extra": torch.zeros(3)}
+    for case, tensors in (("missing", missing), ("unexpected", unexpected)):
+        path = temp_weights_path()
+        save_state_dict(tensors, path, "sumber")
+        try:
+            load_model_mmap(AutoModelForImageClassification, config, path)
+            raise AssertionError(f"checkpoint dengan key {case} harus ditolak")
+        except ValueError as e:
+            assert "classifier" in str(e)
+
+
+def test_load_pytorch_model_falls_back_to_private_copy():
+    path = temp_weights_path()
+    # Sumber cocok sehingga file tidak dibuat ulang, tapi isinya kurang satu tensor
+    state_dict = {name: tensor for name, tensor in load_checkpoint().state_dict().items()
+                  if name != "classifier.weight"}
+    save_state_dict(state_dict, path, checkpoint_source_id(REPO_NAME))
+    output = io.StringIO()
+    with redirect_stdout(output):
+        model = with_mmap_path(path, inference.load_pytorch_model)
+    assert "Bobot mmap tidak bisa dipakai" in output.getvalue()
+    assert mmap_weight_fraction(model, path) == 0.0
+    assert torch.equal(logits(model), logits(load_checkpoint()))
+
+
+def test_stale_source_rewritten():
+    path = temp_weights_path()
+    save_serving_weights(load_checkpoint(), path, f"{REPO_NAME}@checkpoint-lama")
+    with redirect_stdout(io.StringIO()):
+        model = with_mmap_path(path, inference.load_pytorch_model)
+    assert read_safetensors_header(path)[2]["source"] == checkpoint_source_id(REPO_NAME)
+    assert mmap_weight_fraction(model, path) == 1.0
+
+
+if __name__ == "__main__":
+    tests = [
+        test_round_trip_is_mmapped_and_identical,
+        test_corrupt_file_not_valid,
+        test_mismatched_checkpoint_rejected,
+        test_load_pytorch_model_falls_back_to_private_copy,
+        test_stale_source_rewritten,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 50)
+    print("✅ Semua test bobot mmap lolos" if not failed else f"❌ {failed} test gagal")
+    raise SystemExit(1 if failed else 0)
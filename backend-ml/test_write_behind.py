@@ -0,0 +1,263 @@
+"""
+Test WriteBehindQueue (src/write_behind.py): batching, retry dengan backoff saat
+MySQL mati (juga saat error berganti antara permanen dan sementara), replay spool
+setelah crash (spool sendiri & milik proses mati), dead-letter untuk error
+permanen, kompaksi spool, dan group commit fsync di luar lock antrian
+
+Jalankan:
+    python test_write_behind.py
+    python -m pytest test_write_behind.py
+"""
+import os
+import json
+import time
+import tempfile
+import threading
+
+from src.write_behind import WriteBehindQueue, WriteBehindFull, DEAD_LETTER_FILE
+
+
+class FakeStore:
+    """flush_fn tiruan: menyimpan batch, bisa dibuat gagal sementara atau per record"""
+
+    def __init__(self):
+        self.batches = []
+        self.down = False
+        self.reject = set()  # Nilai record["n"] yang selalu ditolak (error permanen)
+        self.lock = threading.Lock()
+
+    def __call__(self, records):
+        if self.down:
+            raise ConnectionError("MySQL mati")
+        if any(record["n"] in self.reject for record in records):
+            raise ValueError("foreign key gagal")
+        with self.lock:
+            self.batches.append([record["n"] for record in records])
+
+    @property
+    def saved(self):
+        with self.lock:
+            return [n for batch in self.batches for n in batch]
+
+
+def make_queue(store, spool_dir=None, **kwargs):
+    kwargs.setdefault("batch_size", 10)
+    kwargs.setdefault("flush_interval", 0.05)
+    kwargs.setdefault("fsync", False)
+    kwargs.setdefault("backoff_base", 0.02)
+    queue = WriteBehindQueue(store, spool_dir or tempfile.mkdtemp(prefix="spool-"), **kwargs)
+    return queue
+
+
+def spool_lines(queue):
+    with open(queue._spool_path, "rb") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_batches_by_size_and_interval():
+    store = FakeStore()
+    queue = make_queue(store, flush_interval=0.3)
+    for n in range(25):
+        queue.submit({"n": n})
+    assert queue.flush(timeout=5)
+    assert store.saved == list(range(25))
+    # Dua batch penuh langsung; sisa 5 menunggu flush_interval
+    assert store.batches[:2] == [list(range(10)), list(range(10, 20))]
+    stats = queue.stats()
+    assert stats["pending"] == 0 and stats["flushed"] == 25 and stats["spool_bytes"] == 0
+
+
+def test_retry_with_backoff_until_mysql_back():
+    store = FakeStore()
+    store.down = True
+    queue = make_queue(store)
+    for n in range(3):
+        queue.submit({"n": n})
+    time.sleep(0.2)
+    stats = queue.stats()
+    assert store.saved == [] and stats["pending"] == 3 and stats["failures"] >= 2
+    assert stats["last_error"].startswith("ConnectionError")
+    store.down = False
+    assert queue.flush(timeout=5)
+    assert store.saved == [0, 1, 2] and queue.stats()["last_error"] is None
+
+
+def test_caller_pending_id_and_is_pending():
+    store = FakeStore()
+    store.down = True
+    queue = make_queue(store, backoff_base=10)
+    assert queue.submit({"n": 0}, pending_id="abc") == "abc"
+    assert queue.is_pending("abc") and not queue.is_pending("xyz")
+    assert spool_lines(queue)[0]["id"] == "abc"
+
+
+def test_full_queue_rejected():
+    store = FakeStore()
+    store.down = True
+    queue = make_queue(store, batch_size=2, max_pending=2, backoff_base=10)
+    queue.submit({"n": 0})
+    queue.submit({"n": 1})
+    try:
+        queue.submit({"n": 2})
+        raise AssertionError("antrian penuh harus ditolak")
+    except WriteBehindFull:
+        pass
+
+
+def test_replay_own_and_orphan_spool_after_crash():
+    spool_dir = tempfile.mkdtemp(prefix="spool-")
+    # Spool proses ini dari run sebelumnya (pid dipakai ulang) dan spool proses mati
+    own = os.path.join(spool_dir, f"diagnosis-{os.getpid()}.spool")
+    orphan = os.path.join(spool_dir, "diagnosis-999999.spool")
+    with open(own, "w") as f:
+        f.write('{"op":"add","id":"a","record":{"n":1}}\n')
+        f.write('{"op":"add","id":"b","record":{"n":2}}\n')
+        f.write('{"op":"ack","ids":["a"]}\n')
+    with open(orphan, "w") as f:
+        f.write('{"op":"add","id":"c","record":{"n":3}}\n')
+        f.write('{"op":"add","id":"d","rec')  # Baris terpotong saat crash
+
+    store = FakeStore()
+    queue = make_queue(store, spool_dir, name="diagnosis")
+    queue.start()
+    assert queue.flush(timeout=5)
+    assert store.saved == [2, 3]
+    assert queue.stats()["recovered"] == 2
+    assert not os.path.exists(orphan)
+
+
+def test_permanent_error_dead_lettered():
+    store = FakeStore()
+    store.reject = {1}
+    queue = make_queue(store, is_permanent=lambda exc: isinstance(exc, ValueError))
+    for n in range(3):
+        queue.submit({"n": n})
+    assert queue.flush(timeout=5)
+    assert store.saved == [0, 2]
+    with open(os.path.join(queue.spool_dir, DEAD_LETTER_FILE)) as f:
+        dead = [json.loads(line) for line in f]
+    assert [item["record"]["n"] for item in dead] == [1]
+    assert queue.stats()["dead_lettered"] == 1
+
+
+def test_spool_compacted_when_queue_never_empties():
+    store = FakeStore()
+    gate = threading.Event()
+
+    def slow_store(records):
+        if records[0]["n"] > 0:
+            gate.wait(5)  # Tahan flush berikutnya agar antrian tidak pernah kosong
+        store(records)
+
+    queue = make_queue(slow_store, batch_size=1, compact_bytes=1)
+    store.down = True
+    for n in range(4):
+        queue.submit({"n": n})
+    store.down = False
+    deadline = time.monotonic() + 5
+    while not store.saved and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    # Record 0 tersimpan: spool ditulis ulang hanya berisi yang tertunda, tanpa baris ack
+    with queue._cond:
+        lines = spool_lines(queue)
+    assert [line["op"] for line in lines] == ["add"] * 3
+    assert [line["record"]["n"] for line in lines] == [1, 2, 3]
+    gate.set()
+    assert queue.flush(timeout=5)
+    assert store.saved == [0, 1, 2, 3]
+    assert spool_lines(queue) == [] and queue.stats()["spool_bytes"] == 0
+    queue.submit({"n": 4})
+    assert queue.flush(timeout=5)
+    assert store.saved[-1] == 4
+
+
+def test_backoff_when_row_flush_hits_transient_error():
+    calls = []
+    healthy = threading.Event()
+
+    def flaky_store(records):
+        calls.append(len(records))
+        if healthy.is_set():
+            return
+        # Batch: error permanen -> flush per baris, yang lalu kena error sementara
+        if len(records) > 1:
+            raise ValueError("data tidak valid")
+        raise ConnectionError("MySQL mati")
+
+    queue = make_queue(flaky_store, backoff_base=0.1, is_permanent=lambda exc: isinstance(exc, ValueError))
+    for n in range(3):
+        queue.submit({"n": n})
+    time.sleep(0.4)
+    # Tanpa backoff loop ini memanggil flush_fn ribuan kali
+    assert len(calls) <= 8, len(calls)
+    stats = queue.stats()
+    assert stats["failures"] >= 1 and stats["last_error"].startswith("ConnectionError")
+    assert stats["pending"] == 3 and stats["dead_lettered"] == 0
+    healthy.set()
+    assert queue.flush(timeout=5)
+
+
+def test_fsync_group_commit_outside_queue_lock():
+    store = FakeStore()
+    queue = make_queue(store, fsync=True, flush_interval=0.01)
+    queue.start()
+    entered, release = threading.Event(), threading.Event()
+    fsyncs = []
+    original = os.fsync
+
+    def slow_fsync(fd):
+        fsyncs.append(fd)
+        entered.set()
+        release.wait(5)
+
+    os.fsync = slow_fsync
+    try:
+        threads = [threading.Thread(target=queue.submit, args=({"n": 0},))]
+        threads[0].start()
+        assert entered.wait(5)
+        # fsync sedang berjalan: flusher tetap bisa menyimpan & ack, submit lain tetap masuk spool
+        deadline = time.monotonic() + 5
+        while store.saved != [0] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert store.saved == [0]
+        threads += [threading.Thread(target=queue.submit, args=({"n": n},)) for n in range(1, 11)]
+        for thread in threads[1:]:
+            thread.start()
+        while queue.stats()["submitted"] < 11 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert queue.stats()["submitted"] == 11 and all(thread.is_alive() for thread in threads)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        # Satu fsync untuk record pertama, satu fsync bersama untuk 10 record berikutnya
+        assert len(fsyncs) == 2 and queue.stats()["spool_fsyncs"] == 2
+    finally:
+        release.set()
+        os.fsync = original
+    assert queue.flush(timeout=5) and sorted(store.saved) == list(range(11))
+
+
+if __name__ == "__main__":
+    tests = [
+        test_batches_by_size_and_interval,
+        test_retry_with_backoff_until_mysql_back,
+        test_caller_pending_id_and_is_pending,
+        test_full_queue_rejected,
+        test_replay_own_and_orphan_spool_after_crash,
+        test_permanent_error_dead_lettered,
+        test_spool_compacted_when_queue_never_empties,
+        test_backoff_when_row_flush_hits_transient_error,
+        test_fsync_group_commit_outside_queue_lock,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print("=" * 50)
+    print("✅ Semua test write-behind lolos" if not failed else f"❌ {failed} test gagal")
+    raise SystemExit(1 if failed else 0)
@@ -110,6 +110,17 @@ export const predictImage = async (imageFile) => {
   return response.data
 }
 
+// Kirim banyak foto sekaligus dalam satu request (satu forward pass di backend).
+// Hasil per gambar ada di `results`, urut sesuai `imageFiles`.
+export const predictImagesBatch = async (imageFiles) => {
+  const formData = new FormData()
+  for (const file of imageFiles) {
+    formData.append('files', file)
+  }
+  const response = await mlApi.post('/predict/batch', formData)
+  return response.data
+}
+
 // =============================================================================
 // HISTORY API
 // =============================================================================